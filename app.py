@@ -1,8 +1,21 @@
-from flask import Flask, render_template, request, send_file, jsonify
-from celery import Celery, current_task
+from flask import Flask, Response, render_template, request, send_file, jsonify
+from celery import Celery, chord, states
+from celery.exceptions import Ignore, Retry
 import os
+import json
+import threading
+import time
+import uuid
+import redis
 from datetime import datetime
-from scrape import scrape_website, list_all_urls, list_all_urls_with_stats  # 既存のスクレイピング関数をインポート
+from scrape import scrape_website, list_all_urls_with_stats  # 既存のスクレイピング関数をインポート
+from scrape import start_distributed_crawl, crawl_distributed, reduce_distributed
+from distributed import RedisFrontier
+from discovery import DISCOVERY_MODES
+from metrics import prometheus_text
+from text_stream import OUTPUT_FORMATS, OUTPUT_EXTENSIONS, STREAMABLE_FORMATS
+from job_registry import (JobRegistry, cleanup_outputs, DEFAULT_RESULT_TTL, DEFAULT_MAX_JOBS,
+                          DEFAULT_MAX_JOBS_PER_HOST)
 from urllib.parse import urlparse
 
 app = Flask(__name__)
@@ -28,20 +41,269 @@ UPLOAD_FOLDER = 'outputs'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# 再クロール用のレスポンスキャッシュ（空文字ならキャッシュしない）
+CACHE_FOLDER = os.environ.get('SCRAPE_CACHE_DIR', 'cache')
+
+# 分散クロールで1つのジョブを分担するワーカータスクの数
+DISTRIBUTED_WORKERS = int(os.environ.get('DISTRIBUTED_WORKERS', 4))
+
+_redis = None
+
+def redis_client():
+    # 分散クロールのフロンティア・計測値は Celery のブローカーと同じ Redis に置く
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(redis_url)
+    return _redis
+
+# --- 計測値（/status/<task_id> と /metrics） ---
+# 各タスクは進捗と一緒に計測値（metrics.CrawlMetrics.snapshot()）を Redis に書き、
+# /metrics はそれをまとめて Prometheus のテキスト形式で返す（ワーカーと Flask は別プロセスのため）
+METRICS_TTL = 24 * 60 * 60
+METRICS_PUBLISH_INTERVAL = 1.0  # 秒
+
+def metrics_key(task_id):
+    return f'scrape:metrics:{task_id}'
+
+def publish_metrics(task_id, snapshot):
+    try:
+        redis_client().set(metrics_key(task_id), json.dumps(snapshot), ex=METRICS_TTL)
+    except Exception as e:
+        print(f"計測値を保存できません: {e}")
+
+# --- 途中経過のストリーミング（/events/<task_id> と /stream/<task_id>） ---
+# タスクは進捗（progress）・書き込んだページ（page）・ページ一覧の行（row）・完了（done）を
+# Redis Stream に追記し、/events/<task_id> がそれを Server-Sent Events で流す（id は Stream のID）。
+# 長いクロールでは古いイベントから捨てる（EVENTS_MAXLEN 件まで）ので、全ページは出力ファイルから読む
+EVENTS_MAXLEN = 10000
+EVENTS_BLOCK_MS = 15000  # 新しいイベントを待つ時間（過ぎたらコメント行を送って接続を保つ）
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_POLL_INTERVAL = 0.5  # 秒
+
+def events_key(task_id):
+    return f'scrape:events:{task_id}'
+
+def output_key(task_id):
+    return f'scrape:output:{task_id}'
+
+def publish_event(task_id, event, data):
+    try:
+        pipe = redis_client().pipeline(transaction=False)
+        pipe.xadd(events_key(task_id), {'event': event, 'data': json.dumps(data, ensure_ascii=False)},
+                  maxlen=EVENTS_MAXLEN, approximate=True)
+        pipe.expire(events_key(task_id), METRICS_TTL)
+        pipe.execute()
+    except Exception as e:
+        print(f"イベントを保存できません: {e}")
+
+def publish_output(task_id, file_path, output_format):
+    # /stream/<task_id> で読み出す出力ファイル
+    try:
+        redis_client().set(output_key(task_id), json.dumps({'file_path': file_path, 'format': output_format}),
+                           ex=METRICS_TTL)
+    except Exception as e:
+        print(f"出力ファイルを記録できません: {e}")
+
+def make_progress_callback(task):
+    # 進捗（/status/<task_id>）を更新してイベントを流し、計測値を1秒に1回まで Redis に書く
+    last_published = [0.0]
+    def progress_callback(done, total, **stats):
+        # stats: OCR・PDF抽出の処理時間・スキップ数・キャッシュヒット数、計測値など
+        task.update_state(state='PROGRESS', meta={'done': done, 'total': total, **stats})
+        publish_event(task.request.id, 'progress', {'done': done, 'total': total})
+        now = time.monotonic()
+        if 'metrics' in stats and now - last_published[0] >= METRICS_PUBLISH_INTERVAL:
+            last_published[0] = now
+            publish_metrics(task.request.id, stats['metrics'])
+    return progress_callback
+
+def event_callback(task_id, event):
+    return lambda data: publish_event(task_id, event, data)
+
+# --- 途中で止まったジョブの再開（/resume/<task_id>） ---
+# scrape_task / list_urls_task は最初の実行時に引数と出力先をジョブとして Redis に記録し、
+# 同じタスクIDで再び実行されたら（ワーカーが落ちて acks_late で再配信された・/resume で再投入された）
+# 同じ出力先のチェックポイント（scrape.run_crawl）の続きからクロールする。
+# 実行中は TaskLock で同じジョブが2つ同時に動かないようにする
+JOB_TTL = 7 * 24 * 60 * 60
+LOCK_TTL = 90  # 秒（ワーカーが落ちてからこの時間が過ぎると再開できる）
+
+def job_key(task_id):
+    return f'scrape:job:{task_id}'
+
+def lock_key(task_id):
+    return f'scrape:lock:{task_id}'
+
+def load_job(task_id):
+    data = redis_client().get(job_key(task_id))
+    return json.loads(data) if data else None
+
+def save_job(task_id, job):
+    redis_client().set(job_key(task_id), json.dumps(job), ex=JOB_TTL)
+
+class TaskLock:
+    # 実行中は LOCK_TTL / 3 秒ごとに期限（と job_registry の実行枠の期限）を延ばす
+    # （ワーカーのプロセスごと止まれば延長も止まる）
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self.key = lock_key(task_id)
+        self.stopped = threading.Event()
+
+    def acquire(self):
+        if not redis_client().set(self.key, os.getpid(), nx=True, ex=LOCK_TTL):
+            return False
+        threading.Thread(target=self.heartbeat, daemon=True).start()
+        return True
+
+    def heartbeat(self):
+        while not self.stopped.wait(LOCK_TTL / 3):
+            try:
+                redis_client().expire(self.key, LOCK_TTL)
+                job_registry().touch(self.task_id)
+            except Exception as e:
+                print(f"ロックを延長できません: {e}")
+
+    def release(self):
+        self.stopped.set()
+        redis_client().delete(self.key)
+
+def is_completed(job):
+    return job.get('result', {}).get('status') == 'completed'
+
+def start_job(task, kind, args, make_paths):
+    # ジョブ（引数と出力先の辞書）と、前回の続きから実行するかどうかを返す
+    task_id = task.request.id
+    job = load_job(task_id)
+    if job is None:
+        job = {'task': kind, 'args': args, **make_paths()}
+        save_job(task_id, job)
+        return job, False
+    if not is_completed(job):
+        print(f"ジョブ {task_id} を再開します")
+    return job, True
+
+# --- 同じリクエストのまとめと同時実行数の制御（job_registry.JobRegistry） ---
+# /scrape・/list_urls は同じ内容のジョブが実行中・実行待ちならそのタスクIDを、JOB_RESULT_TTL 秒以内に
+# 完了していればその結果のタスクIDを返す（no_cache=on なら完了済みの結果は使わない）。
+# タスクは実行の枠（全体 MAX_JOBS 件・同じホスト MAX_JOBS_PER_HOST 件）が空くまで ADMISSION_RETRY_SECONDS 秒ごとに
+# 再試行し、その間 /status は実行待ちの順番（position）を返す。
+# ジョブが終わるたびに outputs/ の合計が OUTPUTS_MAX_BYTES を超えていれば古いファイルから消す
+JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', DEFAULT_RESULT_TTL))
+MAX_JOBS = int(os.environ.get('MAX_JOBS', DEFAULT_MAX_JOBS))
+MAX_JOBS_PER_HOST = int(os.environ.get('MAX_JOBS_PER_HOST', DEFAULT_MAX_JOBS_PER_HOST))
+ADMISSION_RETRY_SECONDS = 5
+OUTPUTS_MAX_BYTES = int(os.environ.get('OUTPUTS_MAX_BYTES', 5 * 1024 ** 3))
+
+_job_registry = None
+
+def job_registry():
+    global _job_registry
+    if _job_registry is None:
+        _job_registry = JobRegistry(redis_client(), result_ttl=JOB_RESULT_TTL, max_jobs=MAX_JOBS,
+                                    max_jobs_per_host=MAX_JOBS_PER_HOST, slot_ttl=LOCK_TTL, job_ttl=JOB_TTL)
+    return _job_registry
+
+def outputs_exist(result):
+    return all(os.path.exists(result[name]) for name in ('file_path', 'csv_path') if result.get(name))
+
+def task_alive(task_id):
+    # Celery 上でまだ終わっていないタスクか（finish_task まで届かずに終わったタスクをまとめ先にしない）
+    return celery.AsyncResult(task_id).state not in states.READY_STATES
+
+def submit_job(kind, task, args, url, reuse=True):
+    # (タスクID, 'queued' / 'coalesced' / 'cached') を返す
+    # 登録は request のキーが変わっていないときだけ行うので、同時に来た同じリクエストは1つのタスクにまとまる
+    registry = job_registry()
+    while True:
+        existing = registry.find(kind, args)
+        if existing is not None:
+            if registry.is_active(existing) and task_alive(existing):
+                return existing, 'coalesced'
+            job = load_job(existing)
+            if reuse and job is not None and is_completed(job) and outputs_exist(job['result']):
+                return existing, 'cached'
+        task_id = str(uuid.uuid4())
+        if registry.register(kind, args, task_id, urlparse(url).netloc, replace=existing):
+            if existing is not None:
+                registry.release(existing)  # 失われた・終わったタスクを実行待ちから外す
+            task.apply_async(args=args, task_id=task_id)
+            return task_id, 'queued'
+
+def submit_response(task_id, status):
+    response = {'task_id': task_id, 'status': status}
+    position = job_registry().position(task_id)
+    if position is not None:
+        response['position'] = position
+        publish_event(task_id, 'queued', {'position': position})
+    return jsonify(response)
+
+def admit_task(task, url):
+    # 実行の枠が空いていなければ再試行する（Celery の retry は Retry 例外を送出する。ロックはタスクの finally で返す）
+    task_id = task.request.id
+    if not job_registry().admit(task_id, urlparse(url).netloc):
+        publish_event(task_id, 'queued', {'position': job_registry().position(task_id)})
+        raise task.retry(countdown=ADMISSION_RETRY_SECONDS, max_retries=None)
+
+def cleanup_old_outputs(keep=()):
+    # 実行中・実行待ちのジョブの出力先と keep 以外の古い出力ファイルを消す
+    try:
+        in_use = list(keep)
+        for task_id in job_registry().active_tasks():
+            job = load_job(task_id) or {}
+            in_use += [job.get('output_file'), job.get('csv_file')]
+        removed = cleanup_outputs(UPLOAD_FOLDER, OUTPUTS_MAX_BYTES, in_use)
+        if removed:
+            print(f"出力ファイルの容量の上限を超えたため {len(removed)} 件を削除しました")
+    except Exception as e:
+        print(f"出力ファイルを整理できません: {e}")
+
+def finish_task(task_id, response):
+    # 完了（失敗を含む）を計測値・イベント・ジョブの記録として残し、実行の枠を返す
+    metrics = response.get('stats', {}).get('metrics')
+    if metrics:
+        publish_metrics(task_id, metrics)
+    publish_event(task_id, 'done', response)
+    job = load_job(task_id)
+    if job is not None:
+        save_job(task_id, {**job, 'result': response})
+    job_registry().finish(task_id, response.get('status') == 'completed')
+    cleanup_old_outputs(keep=[response.get('file_path'), response.get('csv_path')])
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@celery.task(bind=True)
-def scrape_task(self, url, exclude_paths, enable_ocr, enable_pdf, include_only_prefix):
+# acks_late: ワーカーが途中で落ちたらタスクはキューに戻り、別のワーカーがチェックポイントから再開する
+@celery.task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def scrape_task(self, url, exclude_paths, enable_ocr, enable_pdf, include_only_prefix, with_url_list=False, incremental=False,
+                output_format='docx'):
+    task_id = self.request.id
+    lock = TaskLock(task_id)
+    if not lock.acquire():
+        # 同じジョブが実行中か、落ちたワーカーのロックが残っている（再配信されたタスク）。
+        # 捨てずにロックの期限が切れる頃に再試行する（実行中のジョブが完了していれば、再試行ではその結果を返す）
+        raise self.retry(countdown=LOCK_TTL, max_retries=None)
+    waiting = False
     try:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_file = os.path.join(UPLOAD_FOLDER, f'scraped_{timestamp}.docx')
-        
-        def progress_callback(done, total):
-            self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+        admit_task(self, url)
+        def make_paths():
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            return {
+                'output_file': os.path.join(UPLOAD_FOLDER, f'scraped_{timestamp}.{OUTPUT_EXTENSIONS[output_format]}'),
+                # ページ一覧CSVも同じクロールから作成する（サイトを2回クロールしない）
+                'csv_file': os.path.join(UPLOAD_FOLDER, f'all_urls_{timestamp}.csv') if with_url_list else None,
+            }
+        job, resume = start_job(self, 'scrape', [url, exclude_paths, enable_ocr, enable_pdf, include_only_prefix,
+                                                 with_url_list, incremental, output_format], make_paths)
+        if is_completed(job):
+            return job['result']  # 完了後に再配信されたタスク
+        output_file, csv_file = job['output_file'], job['csv_file']
+        progress_callback = make_progress_callback(self)
+        publish_output(task_id, output_file, output_format)
         
         # スクレイピング実行
+        report = {}
         result = scrape_website(
             url,
             output_file,
@@ -49,11 +311,137 @@ def scrape_task(self, url, exclude_paths, enable_ocr, enable_pdf, include_only_p
             enable_ocr=enable_ocr,
             enable_pdf=enable_pdf,
             include_only_prefix=include_only_prefix,
-            progress_callback=progress_callback
+            progress_callback=progress_callback,
+            stats_output_file=csv_file,
+            cache_dir=CACHE_FOLDER,
+            report=report,
+            incremental=incremental,
+            output_format=output_format,
+            on_page_written=event_callback(task_id, 'page'),
+            on_row=event_callback(task_id, 'row'),
+            resume=resume
         )
-        return {'status': 'completed', 'file_path': result}
+        response = {'status': 'completed', 'file_path': result, 'stats': report}
+        if csv_file:
+            response['csv_path'] = csv_file
+        return finish_task(task_id, response)
+    except Retry:
+        waiting = True  # 実行待ちのまま再試行する（実行待ちの順番は残す）
+        raise
     except Exception as e:
-        return {'status': 'failed', 'error': str(e)}
+        return finish_task(task_id, {'status': 'failed', 'error': str(e)})
+    finally:
+        lock.release()
+        if not waiting:
+            job_registry().release(task_id)
+
+# --- 分散クロール ---
+# /scrape で distributed=on のとき、ほかのジョブと同じく submit_job でまとめ・結果の再利用・実行待ちを行い、
+# distributed_scrape_task が実行の枠を取ってから、crawl_worker_task を DISTRIBUTED_WORKERS 個並べて実行し
+# 全部終わったら reduce_scrape_task が Word/CSV にまとめる Celery の chord に置き換わる。
+# ワーカータスクが1つでも失敗すると reduce_scrape_task は実行されないので、fail_distributed_task がジョブを終える。
+# ジョブID は distributed_scrape_task と（それを引き継ぐ）reduce_scrape_task のタスクIDと同じにし、
+# /status/<task_id> ではその間の進捗を Redis から集計して返す。
+# 実行の枠はワーカータスク・まとめのタスクの実行中に延長する（キューで待っている間も切れないよう DISTRIBUTED_SLOT_TTL 秒）
+DISTRIBUTED_SLOT_TTL = 600
+
+class SlotHeartbeat:
+    # with の間、分散クロールのジョブの実行枠の期限を DISTRIBUTED_SLOT_TTL / 3 秒ごとに延ばす
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.stopped = threading.Event()
+
+    def __enter__(self):
+        threading.Thread(target=self.heartbeat, daemon=True).start()
+        return self
+
+    def heartbeat(self):
+        while True:
+            try:
+                job_registry().touch(self.job_id, DISTRIBUTED_SLOT_TTL)
+            except Exception as e:
+                print(f"実行の枠を延長できません: {e}")
+            if self.stopped.wait(DISTRIBUTED_SLOT_TTL / 3):
+                return
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+
+@celery.task
+def crawl_worker_task(job_id):
+    with SlotHeartbeat(job_id):
+        return crawl_distributed(redis_client(), job_id, cache_dir=CACHE_FOLDER)
+
+@celery.task(bind=True)
+def reduce_scrape_task(self, worker_pages, job_id, output_file, enable_ocr, enable_pdf, csv_file=None, output_format='docx'):
+    client = redis_client()
+    try:
+        report = {}
+        with SlotHeartbeat(job_id):
+            result = reduce_distributed(
+                client,
+                job_id,
+                output_file,
+                enable_ocr=enable_ocr,
+                enable_pdf=enable_pdf,
+                stats_output_file=csv_file,
+                cache_dir=CACHE_FOLDER,
+                report=report,
+                output_format=output_format
+            )
+        report['distributed']['worker_pages'] = worker_pages
+        response = {'status': 'completed', 'file_path': result, 'stats': report}
+        if csv_file:
+            response['csv_path'] = csv_file
+        return finish_task(job_id, response)
+    except Exception as e:
+        return finish_task(job_id, {'status': 'failed', 'error': str(e)})
+    finally:
+        RedisFrontier(client, job_id).delete()
+
+@celery.task
+def fail_distributed_task(request, exc, traceback):
+    # ワーカータスクが失敗して chord が reduce_scrape_task を実行しなかったときに呼ばれる（request.id はジョブID）
+    # reduce_scrape_task の代わりにジョブを失敗として終え、フロンティアを消す
+    job_id = request.id
+    try:
+        finish_task(job_id, {'status': 'failed', 'error': str(exc)})
+    finally:
+        RedisFrontier(redis_client(), job_id).delete()
+
+def distributed_chord(job_id, job, enable_ocr, enable_pdf, output_format):
+    # ワーカータスクと、ジョブIDをタスクIDにしたまとめのタスク（失敗時は fail_distributed_task）の chord
+    workers = [crawl_worker_task.s(job_id) for _ in range(DISTRIBUTED_WORKERS)]
+    reduce = reduce_scrape_task.s(job_id, job['output_file'], enable_ocr, enable_pdf, job['csv_file'],
+                                  output_format).set(task_id=job_id)
+    reduce.on_error(fail_distributed_task.s())
+    return chord(workers, reduce)
+
+@celery.task(bind=True)
+def distributed_scrape_task(self, url, exclude_paths, enable_ocr, enable_pdf, include_only_prefix, with_url_list=False,
+                            output_format='docx'):
+    # 実行の枠が空くまで待ってからフロンティアを作り、chord に置き換わる（枠は reduce_scrape_task などの finish_task で返す）
+    # 分散クロールでは出力ファイルを最後にまとめて作るので、途中経過は progress / done のイベントだけ
+    job_id = self.request.id
+    try:
+        admit_task(self, url)
+        job_registry().touch(job_id, DISTRIBUTED_SLOT_TTL)
+        # ジョブとして記録しておくと、完了後に同じリクエストへ結果を返せる（再開はできない）
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        job = {
+            'task': 'distributed',
+            'args': [url, exclude_paths, enable_ocr, enable_pdf, include_only_prefix, with_url_list, output_format],
+            'output_file': os.path.join(UPLOAD_FOLDER, f'scraped_{timestamp}.{OUTPUT_EXTENSIONS[output_format]}'),
+            'csv_file': os.path.join(UPLOAD_FOLDER, f'all_urls_{timestamp}.csv') if with_url_list else None,
+        }
+        save_job(job_id, job)
+        start_distributed_crawl(redis_client(), job_id, url, exclude_paths, include_only_prefix, with_url_list=with_url_list)
+        return self.replace(distributed_chord(job_id, job, enable_ocr, enable_pdf, output_format))
+    except (Retry, Ignore):
+        raise  # 実行待ちのまま再試行する・chord に置き換わった
+    except Exception as e:
+        RedisFrontier(redis_client(), job_id).delete()
+        return finish_task(job_id, {'status': 'failed', 'error': str(e)})
 
 @app.route('/scrape', methods=['POST', 'OPTIONS'])
 def start_scrape():
@@ -64,18 +452,41 @@ def start_scrape():
         exclude_paths = request.form.get('exclude_paths', '')
         enable_ocr = request.form.get('enable_ocr', 'off') == 'on'
         enable_pdf = request.form.get('enable_pdf', 'off') == 'on'
+        with_url_list = request.form.get('with_url_list', 'off') == 'on'
+        incremental = request.form.get('incremental', 'off') == 'on'
+        distributed = request.form.get('distributed', 'off') == 'on'
+        no_cache = request.form.get('no_cache', 'off') == 'on'
+        output_format = request.form.get('output_format', 'docx')
         if not url:
             return jsonify({'error': 'URLが指定されていません'}), 400
+        if output_format not in OUTPUT_FORMATS:
+            return jsonify({'error': f'不明な出力形式です: {output_format}'}), 400
+        if distributed and incremental:
+            return jsonify({'error': '分散クロールでは差分のみの出力は使えません'}), 400
         exclude_paths_list = [p.strip() for p in exclude_paths.split(',') if p.strip()]
         # URLのパス部分を自動的にinclude_only_prefixに
         parsed = urlparse(url)
         path = parsed.path.rstrip('/')
         include_only_prefix = [path] if path else []
-        task = scrape_task.delay(url, exclude_paths_list, enable_ocr, enable_pdf, include_only_prefix)
-        return jsonify({'task_id': task.id})
+        if distributed:
+            task_id, status = submit_job('distributed', distributed_scrape_task,
+                                         [url, exclude_paths_list, enable_ocr, enable_pdf, include_only_prefix,
+                                          with_url_list, output_format], url, reuse=not no_cache)
+            return submit_response(task_id, status)
+        task_id, status = submit_job('scrape', scrape_task, [url, exclude_paths_list, enable_ocr, enable_pdf, include_only_prefix,
+                                                             with_url_list, incremental, output_format], url,
+                                     reuse=not no_cache)
+        return submit_response(task_id, status)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def task_result(task):
+    # 終了したタスクの結果（/status/<task_id> と done イベントの形）
+    if task.successful():
+        result = task.result
+        return result if isinstance(result, dict) else {'status': 'completed', 'file_path': result}
+    return {'status': 'failed', 'error': str(task.result)}
+
 @app.route('/status/<task_id>', methods=['GET', 'OPTIONS'])
 def get_status(task_id):
     if request.method == 'OPTIONS':
@@ -83,20 +494,99 @@ def get_status(task_id):
     try:
         task = celery.AsyncResult(task_id)
         if task.ready():
-            if task.successful():
-                result = task.result
-                return jsonify(result) if isinstance(result, dict) else jsonify({'status': 'completed', 'file_path': result})
-            else:
-                return jsonify({
-                    'status': 'failed',
-                    'error': str(task.result)
-                })
-        # 進捗情報を返す
-        meta = task.info if task.info else {}
+            return jsonify(task_result(task))
+        # 実行の枠を待っているタスクは順番を返す
+        position = job_registry().position(task_id)
+        if position is not None:
+            return jsonify({'status': 'queued', 'position': position, 'jobs': job_registry().snapshot()})
+        # 進捗情報を返す（分散クロールのジョブなら全ワーカーの合計）
+        meta = task.info if isinstance(task.info, dict) else {}
+        if not meta:
+            meta = RedisFrontier(redis_client(), task_id).progress() or {}
         return jsonify({'status': 'processing', **meta})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def sse_message(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id else []
+    lines.append(f'event: {event}')
+    lines.extend(f'data: {line}' for line in data.split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+@app.route('/events/<task_id>', methods=['GET'])
+def stream_events(task_id):
+    # タスクのイベントを Server-Sent Events で流す（done を送ったら終わる）
+    # 再接続時はブラウザが送る Last-Event-ID（または ?last_id=）の続きから送る
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_id', '0')
+    def generate():
+        nonlocal last_id
+        client = redis_client()
+        key = events_key(task_id)
+        while True:
+            entries = client.xread({key: last_id}, count=100, block=EVENTS_BLOCK_MS)
+            if not entries:
+                # イベントがないまま終わっているタスク（期限切れ・イベント導入前のタスク）は結果だけ送る
+                task = celery.AsyncResult(task_id)
+                if task.ready():
+                    yield sse_message('done', json.dumps(task_result(task), ensure_ascii=False))
+                    return
+                yield ': keep-alive\n\n'
+                continue
+            for entry_id, fields in entries[0][1]:
+                last_id = entry_id.decode('utf-8')
+                event = fields[b'event'].decode('utf-8')
+                yield sse_message(event, fields[b'data'].decode('utf-8'), last_id)
+                if event == 'done':
+                    return
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/stream/<task_id>', methods=['GET'])
+def stream_output(task_id):
+    # JSONL / Markdown の出力ファイルを、クロール中でも書き込まれた分から順に送る（終わるまで接続を保つ）
+    data = redis_client().get(output_key(task_id))
+    if not data:
+        return jsonify({'error': '出力ファイルが見つかりません'}), 404
+    output = json.loads(data)
+    if output['format'] not in STREAMABLE_FORMATS:
+        return jsonify({'error': 'Word 形式はストリーミングできません。完了後に /download から取得してください'}), 400
+    file_path = output['file_path']
+    def generate():
+        task = celery.AsyncResult(task_id)
+        while not os.path.exists(file_path):
+            if task.ready():
+                return
+            time.sleep(STREAM_POLL_INTERVAL)
+        with open(file_path, 'rb') as f:
+            finished = False
+            while True:
+                chunk = f.read(STREAM_CHUNK_SIZE)
+                if chunk:
+                    yield chunk
+                elif finished:
+                    return
+                else:
+                    # 終わっていたら、もう一度最後まで読んでから閉じる
+                    finished = task.ready()
+                    if not finished:
+                        time.sleep(STREAM_POLL_INTERVAL)
+    mimetype = 'application/x-ndjson' if output['format'] == 'jsonl' else 'text/markdown'
+    return Response(generate(), mimetype=mimetype, headers={'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    # 直近（METRICS_TTL 秒以内）のタスクの計測値。task ラベルがタスクID
+    try:
+        client = redis_client()
+        snapshots = {}
+        for key in client.scan_iter(match=metrics_key('*')):
+            data = client.get(key)
+            if data:
+                snapshots[key.decode('utf-8').rsplit(':', 1)[1]] = json.loads(data)
+        return Response(prometheus_text(snapshots), mimetype='text/plain; version=0.0.4')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/download/<path:filename>', methods=['GET', 'OPTIONS'])
 def download_file(filename):
     if request.method == 'OPTIONS':
@@ -107,23 +597,78 @@ def download_file(filename):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@celery.task(bind=True)
-def list_urls_task(self, url, exclude_paths, include_only_prefix):
+@celery.task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def list_urls_task(self, url, exclude_paths, include_only_prefix, incremental=False, discovery='crawl'):
+    task_id = self.request.id
+    lock = TaskLock(task_id)
+    if not lock.acquire():
+        # 同じジョブが実行中か、落ちたワーカーのロックが残っている（再配信されたタスク）。
+        # 捨てずにロックの期限が切れる頃に再試行する（実行中のジョブが完了していれば、再試行ではその結果を返す）
+        raise self.retry(countdown=LOCK_TTL, max_retries=None)
+    waiting = False
     try:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_file = os.path.join(UPLOAD_FOLDER, f'all_urls_{timestamp}.csv')
-        def progress_callback(done, total):
-            self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+        admit_task(self, url)
+        def make_paths():
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            return {'output_file': os.path.join(UPLOAD_FOLDER, f'all_urls_{timestamp}.csv')}
+        job, resume = start_job(self, 'list_urls', [url, exclude_paths, include_only_prefix, incremental, discovery],
+                                make_paths)
+        if is_completed(job):
+            return job['result']  # 完了後に再配信されたタスク
+        output_file = job['output_file']
+        progress_callback = make_progress_callback(self)
+        report = {}
         result = list_all_urls_with_stats(
             url,
             output_file,
             exclude_paths=exclude_paths,
             include_only_prefix=include_only_prefix,
-            progress_callback=progress_callback
+            progress_callback=progress_callback,
+            cache_dir=CACHE_FOLDER,
+            report=report,
+            incremental=incremental,
+            discovery=discovery,
+            on_row=event_callback(task_id, 'row'),
+            resume=resume
         )
-        return output_file
+        return finish_task(task_id, {'status': 'completed', 'file_path': result, 'stats': report})
+    except Retry:
+        waiting = True  # 実行待ちのまま再試行する（実行待ちの順番は残す）
+        raise
+    except Exception as e:
+        return finish_task(task_id, {'status': 'failed', 'error': str(e)})
+    finally:
+        lock.release()
+        if not waiting:
+            job_registry().release(task_id)
+
+# /resume/<task_id> で再投入できるタスク（ジョブの 'task'）
+RESUMABLE_TASKS = {'scrape': scrape_task, 'list_urls': list_urls_task}
+
+@app.route('/resume/<task_id>', methods=['POST', 'OPTIONS'])
+def resume_job(task_id):
+    # 途中で止まった（失敗した・ワーカーが落ちた）ジョブを同じタスクIDで再投入し、チェックポイントの続きから実行する
+    if request.method == 'OPTIONS':
+        return '', 200
+    try:
+        job = load_job(task_id)
+        if job is None:
+            return jsonify({'error': '再開できるジョブが見つかりません'}), 404
+        if job['task'] not in RESUMABLE_TASKS:
+            return jsonify({'error': '分散クロールのジョブは再開できません'}), 400
+        if is_completed(job):
+            return jsonify({'error': 'このジョブは完了しています'}), 409
+        if redis_client().exists(lock_key(task_id)):
+            return jsonify({'error': 'このジョブは実行中です'}), 409
+        # 前回の結果とイベントを消し、/status・/events が再開後の状態を返すようにする
+        celery.AsyncResult(task_id).forget()
+        redis_client().delete(events_key(task_id))
+        save_job(task_id, {key: value for key, value in job.items() if key != 'result'})
+        job_registry().wait(task_id, urlparse(job['args'][0]).netloc)
+        RESUMABLE_TASKS[job['task']].apply_async(args=job['args'], task_id=task_id)
+        return jsonify({'task_id': task_id})
     except Exception as e:
-        return None
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/list_urls', methods=['POST', 'OPTIONS'])
 def list_urls():
@@ -132,14 +677,21 @@ def list_urls():
     try:
         url = request.form.get('url')
         exclude_paths = request.form.get('exclude_paths', '')
+        incremental = request.form.get('incremental', 'off') == 'on'
+        discovery = request.form.get('discovery', 'crawl')
+        no_cache = request.form.get('no_cache', 'off') == 'on'
         if not url:
             return jsonify({'error': 'URLが指定されていません'}), 400
+        if discovery not in DISCOVERY_MODES:
+            return jsonify({'error': f'不明なページ一覧の作り方です: {discovery}'}), 400
         exclude_paths_list = [p.strip() for p in exclude_paths.split(',') if p.strip()]
         parsed = urlparse(url)
         path = parsed.path.rstrip('/')
         include_only_prefix = [path] if path else []
-        task = list_urls_task.apply_async(args=[url, exclude_paths_list, include_only_prefix])
-        return jsonify({'task_id': task.id})
+        task_id, status = submit_job('list_urls', list_urls_task,
+                                     [url, exclude_paths_list, include_only_prefix, incremental, discovery], url,
+                                     reuse=not no_cache)
+        return submit_response(task_id, status)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -0,0 +1,84 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scrape  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+# チェックポイントの負荷と再開の効果を、ページ一覧CSVの作成（軽量取得）で確認する
+# - チェックポイントなし / あり でのクロール時間、ログの大きさ（1ページあたり）
+# - 途中（--stop-at の割合）で止めてから resume=True で再開したときの、再開後にかかる時間
+# 使い方: python benchmarks/bench_checkpoint.py --pages 50000
+
+
+class Stop(Exception):
+    pass
+
+
+def run(base_url, output_file, concurrency, stop_at=None, resume=False):
+    def progress_callback(done, total, **stats):
+        if stop_at is not None and done >= stop_at:
+            # 止める直前のチェックポイントの大きさ
+            sizes['log'] = os.path.getsize(output_file + '.checkpoint')
+            raise Stop()
+
+    sizes = {}
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            scrape.list_all_urls_with_stats(
+                base_url + '/page/0',
+                output_file,
+                progress_callback=progress_callback,
+                crawl_mode='async',
+                concurrency=concurrency,
+                per_host_concurrency=concurrency,
+                min_delay=0,
+                resume=resume,
+            )
+    except Stop:
+        pass
+    return time.perf_counter() - start, sizes.get('log')
+
+
+def count_rows(csv_file):
+    with open(csv_file, encoding='utf-8') as f:
+        return sum(1 for line in f.read().split('\n\n')[0].splitlines()) - 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=50000)
+    parser.add_argument('--fanout', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--stop-at', type=float, default=0.9, help='止める位置（全ページに対する割合）')
+    args = parser.parse_args()
+
+    with StubServer(args.pages, args.fanout, latency=0) as server, tempfile.TemporaryDirectory() as tmp:
+        every = scrape.CHECKPOINT_PAGES
+        scrape.CHECKPOINT_PAGES = 0
+        off_elapsed, _ = run(server.base_url, os.path.join(tmp, 'off.csv'), args.concurrency)
+        scrape.CHECKPOINT_PAGES = every
+        on_elapsed, _ = run(server.base_url, os.path.join(tmp, 'on.csv'), args.concurrency)
+        print(f"checkpoint off: {off_elapsed:.2f}s")
+        print(f"checkpoint  on: {on_elapsed:.2f}s ({(on_elapsed / off_elapsed - 1) * 100:+.1f}%, every {every} pages)")
+
+        output_file = os.path.join(tmp, 'resume.csv')
+        stop_at = int(args.pages * args.stop_at)
+        first_elapsed, log_size = run(server.base_url, output_file, args.concurrency, stop_at=stop_at)
+        resume_elapsed, _ = run(server.base_url, output_file, args.concurrency, resume=True)
+        rows = count_rows(output_file)
+        print(f"stopped at {stop_at} pages after {first_elapsed:.2f}s "
+              f"(log {log_size / 1024 / 1024:.1f}MB, {log_size / stop_at:.0f} bytes/page)")
+        print(f"resumed: {resume_elapsed:.2f}s for the remaining pages, {rows} rows "
+              f"({'OK' if rows == args.pages else f'NG: expected {args.pages}'})")
+
+
+if __name__ == '__main__':
+    main()
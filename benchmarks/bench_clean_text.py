@@ -0,0 +1,81 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract import clean_text
+
+# clean_text（XMLで使えない文字の除去）の新旧実装の日本語テキストでのスループット（MB/s）を計測する
+# 旧実装と出力が一致することは tests/test_clean_text.py で確認する
+# 使い方: python benchmarks/bench_clean_text.py --size-mb 8
+
+
+def legacy_clean_text(text):
+    # 比較用：変更前の実装
+    if not text:
+        return ''
+    text = text.replace('\x00', '')
+    text = text.encode('utf-8', 'ignore').decode('utf-8', 'ignore')
+
+    def is_valid_xml_char(c):
+        codepoint = ord(c)
+        return (
+            codepoint == 0x9 or
+            codepoint == 0xA or
+            codepoint == 0xD or
+            (0x20 <= codepoint <= 0xD7FF) or
+            (0xE000 <= codepoint <= 0xFFFD) or
+            (0x10000 <= codepoint <= 0x10FFFF)
+        )
+
+    text = ''.join(c for c in text if is_valid_xml_char(c))
+    return text
+
+
+def sample_text(size_mb, seed):
+    # PDFから抽出したような日本語テキスト。ところどころに制御文字が混ざる
+    rng = random.Random(seed)
+    words = ['当社は', 'お客様の', 'サービスを', '提供しています。', 'Annual Report 2024 ', '売上高', '\n', '（単位：百万円）\t',
+             '環境への取り組み', '\x0c']
+    pieces = []
+    size = 0
+    while size < size_mb * 1024 * 1024:
+        word = rng.choice(words)
+        pieces.append(word)
+        size += len(word.encode('utf-8'))
+    return ''.join(pieces)
+
+
+def throughput(fn, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    elapsed = (time.perf_counter() - start) / repeat
+    return len(text.encode('utf-8')) / 1024 / 1024 / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=float, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    text = sample_text(args.size_mb, args.seed)
+    fragments = text.split('\n')
+    results = [
+        ('legacy', throughput(legacy_clean_text, text, args.repeat)),
+        ('clean_text', throughput(clean_text, text, args.repeat)),
+        # 段落ごとに呼んだ場合（ページ処理での使われ方）
+        ('legacy/frag', throughput(lambda _: [legacy_clean_text(f) for f in fragments], text, args.repeat)),
+        ('clean_text/frag', throughput(lambda _: [clean_text(f) for f in fragments], text, args.repeat)),
+    ]
+    for name, mb_per_sec in results:
+        print(f'{name:>15}: {mb_per_sec:8.1f} MB/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrape import scrape_website  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+# serial / async のクロール速度（pages/sec）を比較する
+# 使い方: python benchmarks/bench_crawl.py --pages 200 --latency 0.05
+
+
+def run(base_url, mode, concurrency, min_delay):
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'bench.docx')
+        pages = {'done': 0}
+
+        def progress_callback(done, total, **stats):
+            pages['done'] = done
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scrape_website(
+                base_url + '/page/0',
+                output_file,
+                progress_callback=progress_callback,
+                crawl_mode=mode,
+                concurrency=concurrency,
+                per_host_concurrency=concurrency,
+                min_delay=min_delay,
+            )
+        elapsed = time.perf_counter() - start
+    return pages['done'], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--min-delay', type=float, default=0.0)
+    args = parser.parse_args()
+
+    with StubServer(args.pages, args.fanout, args.latency) as server:
+        for mode in ('serial', 'async'):
+            pages, elapsed = run(server.base_url, mode, args.concurrency, args.min_delay)
+            print(f"{mode:>6}: {pages} pages in {elapsed:.2f}s ({pages / elapsed:.1f} pages/sec)")
+
+
+if __name__ == '__main__':
+    main()
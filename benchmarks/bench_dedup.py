@@ -0,0 +1,95 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scrape  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+# タグページなどで同じ本文が何度も出るサイトで、重複ページの判定（SCRAPE_DEDUP）の効果を比較する
+# - 書き込んだページ数・スキップしたページ数・出力の大きさ・クロール時間
+# - 判定にかかった時間（1ページあたり）
+# - 重複ばかりのURLパターンを後回しにした（SCRAPE_DEDUP_DEPRIORITIZE=1）とき、固有のページを書き終えるまでに取得したページ数
+# 使い方: python benchmarks/bench_dedup.py --pages 500 --duplicates 3
+
+
+def run(base_url, unique_pages, mode, deprioritize, concurrency):
+    scrape.DEDUP_DEPRIORITIZE = deprioritize
+    written = []
+    fetched = {'done': 0, 'all_unique': None}
+
+    def on_page_written(record):
+        if record['url'] and '/page/' in record['url']:
+            written.append(record['url'])
+            if len(written) == unique_pages:
+                fetched['all_unique'] = fetched['done']
+
+    def progress_callback(done, total, **stats):
+        fetched['done'] = done
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'bench.jsonl')
+        report = {}
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scrape.scrape_website(
+                base_url + '/page/0',
+                output_file,
+                progress_callback=progress_callback,
+                crawl_mode='async',
+                concurrency=concurrency,
+                per_host_concurrency=concurrency,
+                min_delay=0,
+                report=report,
+                output_format='jsonl',
+                on_page_written=on_page_written,
+                dedup=mode,
+            )
+        elapsed = time.perf_counter() - start
+        with open(output_file, encoding='utf-8') as f:
+            pages = sum(1 for _ in f)
+        size = os.path.getsize(output_file)
+    duplicates = report.get('duplicates', {})
+    dedup_stage = report.get('metrics', {}).get('stages', {}).get('dedup', {'seconds': 0, 'count': 0})
+    per_page = dedup_stage['seconds'] / dedup_stage['count'] * 1e6 if dedup_stage['count'] else 0
+    return {
+        'elapsed': elapsed,
+        'pages': pages,
+        'size': size,
+        'skipped': duplicates.get('skipped', 0),
+        'exact': duplicates.get('exact', 0),
+        'near': duplicates.get('near', 0),
+        'us_per_page': per_page,
+        'all_unique': fetched['all_unique'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--duplicates', type=int, default=3, help='1ページあたりのタグページ（重複）の数')
+    parser.add_argument('--words', type=int, default=300, help='1ページの本文の語数')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    with StubServer(args.pages, args.fanout, args.latency) as server:
+        server.duplicates = args.duplicates
+        server.article_words = args.words
+        for mode, deprioritize in (('off', False), ('exact', False), ('near', False), ('near', True)):
+            result = run(server.base_url, args.pages, mode, deprioritize, args.concurrency)
+            label = mode + (' +deprioritize' if deprioritize else '')
+            print(f"{label:>20}: {result['pages']} pages written, {result['skipped']} skipped "
+                  f"(exact {result['exact']}, near {result['near']}), {result['size'] / 1024:.0f} KiB, "
+                  f"{result['elapsed']:.2f}s, dedup {result['us_per_page']:.0f}us/page, "
+                  f"all unique pages after {result['all_unique']} fetches")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import contextlib
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrape import list_all_urls_with_stats  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+# URL一覧CSVを作る時間を discovery（crawl / sitemap / sitemap_only）ごとに比較し、一覧のURLが一致するか確認する
+# スタブサーバーは robots.txt とサイトマップ（gzip・インデックス）を返す
+# 使い方: python benchmarks/bench_discovery.py --pages 2000 --latency 0.02
+
+
+def read_urls(csv_file):
+    with open(csv_file, encoding='utf-8') as f:
+        rows = []
+        for row in csv.reader(f):
+            if not row:
+                break
+            rows.append(row[0])
+    return set(rows[1:])
+
+
+def run(base_url, discovery, concurrency):
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'urls.csv')
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            list_all_urls_with_stats(
+                base_url + '/page/0',
+                output_file,
+                crawl_mode='async',
+                concurrency=concurrency,
+                per_host_concurrency=concurrency,
+                min_delay=0,
+                discovery=discovery,
+            )
+        elapsed = time.perf_counter() - start
+        return read_urls(output_file), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--sitemap-size', type=int, default=500, help='サイトマップ1ファイルあたりのURL数')
+    args = parser.parse_args()
+
+    with StubServer(args.pages, args.fanout, args.latency) as server:
+        server.robots = f'User-agent: *\nAllow: /\nSitemap: {server.base_url}/sitemap.xml\n'
+        server.sitemap_size = args.sitemap_size
+        expected = None
+        for discovery in ('crawl', 'sitemap', 'sitemap_only'):
+            urls, elapsed = run(server.base_url, discovery, args.concurrency)
+            expected = expected if expected is not None else urls
+            match = 'OK' if urls == expected else f'NG（crawl との差 {len(urls ^ expected)} 件）'
+            print(f"{discovery:>12}: {len(urls)} URLs in {elapsed:.2f}s  {match}")
+
+
+if __name__ == '__main__':
+    main()
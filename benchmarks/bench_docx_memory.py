@@ -0,0 +1,79 @@
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# python-docx の Document（全ページをメモリに保持）と StreamingDocx（ページごとにディスクへ書き出し）で
+# 合成した大量ページを書き出したときのピークメモリ（RSS）と時間を比較する
+# 計測はそれぞれ別プロセスで行う
+# python-docx は段落追加のたびに本文末尾を探すためページ数に対して2乗で遅くなる（1000ページで数十秒）。
+# そのため python-docx 側は --baseline-pages（既定 1000）ページで計測する
+# 使い方: python benchmarks/bench_docx_memory.py --pages 10000
+
+
+def write_pages(doc, pages, commit=None):
+    for n in range(pages):
+        if n:
+            doc.add_page_break()
+        doc.add_heading(f'ページ {n} のタイトル', level=1)
+        doc.add_paragraph(f'【ディスクリプション】\nページ {n} の説明文です。')
+        for section in range(3):
+            doc.add_heading(f'見出し {n}-{section}', level=2)
+            for line in range(5):
+                doc.add_paragraph(f'本文 {n}-{section}-{line}：' + 'サンプルテキスト。' * 8)
+            for item in range(3):
+                doc.add_paragraph(f'リスト項目 {n}-{section}-{item}', style='List Bullet')
+        if commit:
+            commit(f'page-{n}')
+
+
+def run_child(writer, pages, output_file):
+    start = time.perf_counter()
+    if writer == 'python-docx':
+        from docx import Document
+        doc = Document()
+        write_pages(doc, pages)
+        doc.save(output_file)
+    else:
+        from docx_stream import StreamingDocx
+        doc = StreamingDocx(output_file)
+        write_pages(doc, pages, commit=doc.commit)
+        doc.save()
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux は KB 単位
+    print(f'{elapsed:.3f} {peak_mb:.1f} {os.path.getsize(output_file)}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=10000)
+    parser.add_argument('--baseline-pages', type=int, default=1000)
+    parser.add_argument('--child', choices=['python-docx', 'streaming'])
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.pages, args.output)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_pages = min(args.pages, args.baseline_pages)
+        runs = [('python-docx', baseline_pages), ('streaming', baseline_pages), ('streaming', args.pages)]
+        for writer, pages in runs:
+            output_file = os.path.join(tmp, f'{writer}.docx')
+            result = subprocess.run(
+                [sys.executable, __file__, '--child', writer, '--pages', str(pages), '--output', output_file],
+                capture_output=True, text=True, check=True,
+            )
+            elapsed, peak_mb, size = result.stdout.split()
+            print(f"{writer:>11}: {pages} pages in {float(elapsed):.1f}s, "
+                  f"peak RSS {float(peak_mb):.0f} MB, docx {int(size) / 1024 / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
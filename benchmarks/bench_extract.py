@@ -0,0 +1,112 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup, Comment
+
+from extract import DEFAULT_PARSER, clean_text, extract_page_content, sanitize_text
+
+# 保存済みHTML（benchmarks/fixtures/*.html）について、1ページあたりの抽出時間（解析を含む）を比較する
+# - legacy : 以前の抽出処理（find_all を何度も繰り返す）＋ html.parser
+# - extract.extract_page_content ＋ html.parser / lxml
+# 使い方: python benchmarks/bench_extract.py --repeat 50
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def legacy_extract_page_content(soup):
+    # 比較用：変更前の scrape.extract_page_content
+    for header_tag in soup.find_all('header'):
+        header_tag.decompose()
+    header_selectors = [
+        {'class_': ['header', 'site-header', 'main-header', 'global-header']},
+        {'id': ['header', 'site-header', 'main-header', 'global-header']},
+        {'role': 'banner'},
+        {'class_': ['header-nav', 'header-menu', 'header-wrapper']},
+        {'id': ['header-nav', 'header-menu', 'header-wrapper']}
+    ]
+    for selector in header_selectors:
+        for tag in soup.find_all(attrs=selector):
+            tag.decompose()
+    for nav in soup.find_all('nav'):
+        nav.decompose()
+    unwanted_selectors = [
+        {'id': 'global-nav'}, {'id': 'gnav'}, {'class': 'global-nav'}, {'class': 'header-nav'},
+        {'class': 'menu'}, {'class': 'nav'}, {'id': 'header'}, {'id': 'footer'},
+    ]
+    for selector in unwanted_selectors:
+        for tag in soup.find_all(attrs=selector):
+            tag.decompose()
+    description_text = None
+    description_tag = soup.find('meta', attrs={'name': 'description'})
+    if description_tag and description_tag.get('content'):
+        description_text = description_tag.get('content').strip()
+    for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+        comment.extract()
+    for tag in soup(['meta', 'script', 'style', 'noscript', 'iframe', 'link', 'svg']):
+        tag.decompose()
+    title_tag = soup.find('title')
+    title = title_tag.get_text(strip=True) if title_tag else "no_title"
+    content_source = soup.find('main') or soup
+    blocks = []
+    for element in content_source.descendants:
+        if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
+            text = element.get_text(strip=True)
+            if text:
+                blocks.append(['heading', clean_text(text), int(element.name[1])])
+        elif element.name == 'li':
+            text = element.get_text(strip=True)
+            if text:
+                blocks.append(['bullet', clean_text(text), 0])
+        elif element.name is None:
+            text = element.strip()
+            if text:
+                blocks.append(['text', clean_text(text), 0])
+    images = [img_tag.get('src') for img_tag in soup.find_all('img') if img_tag.get('src')]
+    pdf_links = [link_tag['href'] for link_tag in soup.find_all('a', href=True)
+                 if link_tag['href'].lower().endswith('.pdf')]
+    return {'title': sanitize_text(title), 'description': description_text, 'blocks': blocks,
+            'images': images, 'pdf_links': pdf_links}
+
+
+def measure(markup, extract, parser, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        content = extract(BeautifulSoup(markup, parser))
+    return (time.perf_counter() - start) / repeat, content
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    variants = [('legacy', legacy_extract_page_content, 'html.parser'),
+                ('html.parser', extract_page_content, 'html.parser')]
+    if DEFAULT_PARSER == 'lxml':
+        variants.append(('lxml', extract_page_content, 'lxml'))
+    else:
+        print('lxml がインストールされていないため lxml での計測は省略します')
+
+    totals = dict.fromkeys([name for name, _, _ in variants], 0.0)
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            markup = f.read()
+        results = []
+        for name, extract, html_parser in variants:
+            elapsed, content = measure(markup, extract, html_parser, args.repeat)
+            totals[name] += elapsed
+            results.append(f"{name} {elapsed * 1000:.1f} ms ({len(content['blocks'])} blocks)")
+        print(f"{os.path.basename(path):>14} {len(markup.encode('utf-8')) // 1024:>4} KB: " + ', '.join(results))
+
+    baseline = totals['legacy']
+    for name, total in totals.items():
+        print(f'{name:>11}: total {total * 1000:.1f} ms, {baseline / total:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
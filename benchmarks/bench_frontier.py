@@ -0,0 +1,98 @@
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frontier import Frontier, make_seen_set, SEEN_MODES, DEFAULT_BLOOM_ERROR_RATE  # noqa: E402
+
+# 訪問済みURL・フロンティアの1URLあたりのメモリ（tracemalloc）と追加速度を比較する
+#   queued  : 全URLがキューに入っている状態（訪問済み判定 + キュー）
+#   visited : 全URLを取り出し終えた状態（訪問済み判定のみ）
+# bloom は未訪問のURLを訪問済みと誤判定した割合も表示する
+# 使い方: python benchmarks/bench_frontier.py --urls 1000000
+
+
+def make_urls(count, offset=0):
+    for i in range(offset, offset + count):
+        yield f'https://www.example.com/dir{i % 1000}/page{i}.html?id={i}'
+
+
+class LegacyFrontier:
+    # 従来の実装（URL文字列の set と、文字列をそのまま積むキュー）
+    def __init__(self):
+        self.seen = set()
+        self.queue = deque()
+
+    def add(self, url):
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        self.queue.append(url)
+        return True
+
+    def pop(self):
+        return self.queue.popleft()
+
+    def __contains__(self, url):
+        return url in self.seen
+
+    def __len__(self):
+        return len(self.queue)
+
+
+def measure(make_frontier, count):
+    # 追加速度は tracemalloc なしで測る
+    start = time.perf_counter()
+    frontier = make_frontier()
+    for url in make_urls(count):
+        frontier.add(url)
+    elapsed = time.perf_counter() - start
+    del frontier
+
+    gc.collect()
+    tracemalloc.start()
+    frontier = make_frontier()
+    for url in make_urls(count):
+        frontier.add(url)
+    queued = tracemalloc.get_traced_memory()[0]
+    while len(frontier):
+        frontier.pop()
+    gc.collect()
+    visited = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return frontier, queued / count, visited / count, count / elapsed
+
+
+def false_positive_rate(frontier, count):
+    return sum(url in frontier for url in make_urls(count, offset=10 ** 9)) / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--urls', type=int, default=1000000)
+    parser.add_argument('--error-rate', type=float, default=DEFAULT_BLOOM_ERROR_RATE)
+    parser.add_argument('--probe', type=int, default=100000, help='誤判定率を調べる未訪問URLの数')
+    args = parser.parse_args()
+
+    candidates = [('legacy', LegacyFrontier)] + [
+        (mode, lambda mode=mode: Frontier(seen=make_seen_set(mode, bloom_error_rate=args.error_rate)))
+        for mode in SEEN_MODES
+    ]
+    print(f"{args.urls} URLs")
+    for name, make_frontier in candidates:
+        frontier, queued, visited, rate = measure(make_frontier, args.urls)
+        line = (f"{name:>11}: queued {queued:6.1f} B/URL, visited {visited:6.1f} B/URL, "
+                f"{rate / 1000:.0f}k adds/sec")
+        if name == 'bloom':
+            line += f", false positives {false_positive_rate(frontier, args.probe):.4%}"
+        print(line)
+        del frontier
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import contextlib
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrape import DirectoryStats, run_crawl  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+# URL一覧CSV（list_all_urls_with_stats）の作成時間を、従来の取得（全URLを GET・soup で解析）と
+# 軽量取得（HTML以外は本文を読まない・PDFは HEAD・<a href> だけを拾う）で比較する
+# 使い方: python benchmarks/bench_list_urls.py --pages 300 --nav-links 200 --asset-kb 128
+
+
+class FullDirectoryStats(DirectoryStats):
+    # 従来どおりの取得をさせるため、本文が必要なハンドラとして振る舞う
+    needs_page_content = True
+
+
+def read_rows(csv_file):
+    with open(csv_file, encoding='utf-8') as f:
+        rows = []
+        for row in csv.reader(f):
+            if not row:
+                break
+            rows.append(row)
+    return rows
+
+
+def run(base_url, handler_class, concurrency):
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'urls.csv')
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_crawl(
+                base_url + '/page/0',
+                [handler_class(output_file)],
+                crawl_mode='async',
+                concurrency=concurrency,
+                per_host_concurrency=concurrency,
+                min_delay=0,
+            )
+        elapsed = time.perf_counter() - start
+        return read_rows(output_file), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--nav-links', type=int, default=200, help='全ページ共通のナビゲーションのリンク数')
+    parser.add_argument('--asset-kb', type=int, default=128, help='各ページからリンクする zip / pdf の大きさ')
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    with StubServer(args.pages, args.fanout, latency=0) as server:
+        server.nav_links = args.nav_links
+        server.asset_bytes = args.asset_kb * 1024
+        full_rows, full_elapsed = run(server.base_url, FullDirectoryStats, args.concurrency)
+        light_rows, light_elapsed = run(server.base_url, DirectoryStats, args.concurrency)
+
+    same = sorted(row[0] for row in full_rows) == sorted(row[0] for row in light_rows)
+    print(f"{len(light_rows) - 1} URLs: {'URLは一致' if same else 'NG: URLが一致しません'}")
+    print(f" full: {full_elapsed:.2f}s")
+    print(f"light: {light_elapsed:.2f}s ({full_elapsed / light_elapsed:.1f}x)")
+    print("列:", light_rows[0])
+    for row in light_rows[1:4] + [row for row in light_rows if row[2] == '1'][:1]:
+        print("    ", row)
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
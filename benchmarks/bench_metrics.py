@@ -0,0 +1,71 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import make_metrics, prometheus_text  # noqa: E402
+from scrape import scrape_website  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+# 計測（metrics.CrawlMetrics）のオーバーヘッドを、timer 1回あたりの時間と、
+# SCRAPE_METRICS のオン・オフでのクロール時間で確認し、集計結果と /metrics の出力例を表示する
+# 使い方: python benchmarks/bench_metrics.py --pages 300 --latency 0
+
+
+def timer_overhead(metrics, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        with metrics.timer('parse'):
+            pass
+    return (time.perf_counter() - start) / calls
+
+
+def run(base_url, enabled, concurrency):
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'bench.docx')
+        report = {}
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scrape_website(
+                base_url + '/page/0',
+                output_file,
+                crawl_mode='async',
+                concurrency=concurrency,
+                per_host_concurrency=concurrency,
+                min_delay=0,
+                report=report,
+                metrics=make_metrics(enabled),
+            )
+        return time.perf_counter() - start, report.get('metrics')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--calls', type=int, default=200000)
+    args = parser.parse_args()
+
+    for enabled in (False, True):
+        per_call = timer_overhead(make_metrics(enabled), args.calls)
+        print(f"timer ({'on' if enabled else 'off'}): {per_call * 1e6:.2f}us/call")
+
+    with StubServer(args.pages, args.fanout, args.latency) as server:
+        off_elapsed, _ = run(server.base_url, False, args.concurrency)
+        on_elapsed, snapshot = run(server.base_url, True, args.concurrency)
+    print(f"crawl (off): {off_elapsed:.2f}s")
+    print(f"crawl  (on): {on_elapsed:.2f}s ({(on_elapsed / off_elapsed - 1) * 100:+.1f}%)")
+    print(json.dumps(snapshot, ensure_ascii=False, indent=2))
+    print(prometheus_text({'bench': snapshot}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scrape  # noqa: E402
+from scheduler import CrawlBudget, parse_priority_patterns  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+# 深いアーカイブ（/archive/ 配下に archive_pages ページ、1ページから archive_fanout ページへリンク）を持つサイトで、
+# ページ数の予算（--budget）内に通常のページ（/page/）をどれだけ取得できるかをクロール順序ごとに比較する
+# あわせて深さ・秒数の予算で打ち切ったときのページ数と時間も表示する
+# 使い方: python benchmarks/bench_scheduler.py --pages 300 --archive 5000 --budget 400
+
+
+def run(base_url, order, budget, concurrency):
+    report = {}
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        urls = scrape.list_all_urls(
+            base_url + '/page/0',
+            crawl_mode='async',
+            concurrency=concurrency,
+            per_host_concurrency=concurrency,
+            min_delay=0,
+            report=report,
+            order=order,
+            budget=budget,
+        )
+    return urls, time.perf_counter() - start, report.get('budget')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--archive', type=int, default=5000, help='/archive/ 配下のページ数')
+    parser.add_argument('--budget', type=int, default=400, help='取得するページ数の上限')
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--priority', default='/archive=10', help="'priority' の重み（CRAWL_PRIORITY と同じ書き方）")
+    args = parser.parse_args()
+    scrape.CRAWL_PRIORITY = parse_priority_patterns(args.priority)
+
+    with StubServer(args.pages, args.fanout, args.latency) as server:
+        server.archive_pages = args.archive
+        for order in ('dfs', 'bfs', 'priority', 'fair'):
+            urls, elapsed, stopped = run(server.base_url, order, CrawlBudget(max_pages=args.budget), args.concurrency)
+            pages = sum(1 for url in urls if '/page/' in url)
+            print(f"{order:>8}: {len(urls)} urls in {elapsed:.2f}s, /page/ {pages}/{args.pages} "
+                  f"({pages / args.pages:.0%}), stopped: {stopped}")
+        for label, budget in (('depth<=3', CrawlBudget(max_depth=3)), ('1 second', CrawlBudget(max_seconds=1))):
+            urls, elapsed, stopped = run(server.base_url, 'bfs', budget, args.concurrency)
+            print(f"{label:>8}: {len(urls)} urls in {elapsed:.2f}s, stopped: {stopped}")
+
+
+if __name__ == '__main__':
+    main()
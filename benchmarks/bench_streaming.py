@@ -0,0 +1,83 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrape import scrape_website  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+# 出力形式ごとに、最初のページを受け取れるまでの時間とクロール全体の時間を比較する
+# docx は完了後にしか読めない。jsonl / markdown は出力ファイルを追いかけて読む（/stream/<task_id> と同じ読み方）
+# 使い方: python benchmarks/bench_streaming.py --pages 200 --latency 0.02
+
+
+def run(base_url, output_format, concurrency):
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, f'bench.{output_format}')
+        finished = threading.Event()
+
+        def crawl():
+            with contextlib.redirect_stdout(io.StringIO()):
+                scrape_website(
+                    base_url + '/page/0',
+                    output_file,
+                    crawl_mode='async',
+                    concurrency=concurrency,
+                    per_host_concurrency=concurrency,
+                    min_delay=0,
+                    output_format=output_format,
+                )
+            finished.set()
+
+        start = time.perf_counter()
+        thread = threading.Thread(target=crawl)
+        thread.start()
+        first_byte = None
+        received = 0
+        if output_format != 'docx':
+            while not os.path.exists(output_file):
+                time.sleep(0.001)
+            with open(output_file, 'rb') as f:
+                done = False
+                while True:
+                    chunk = f.read(64 * 1024)
+                    if chunk:
+                        if first_byte is None:
+                            first_byte = time.perf_counter() - start
+                        received += len(chunk)
+                    elif done:
+                        break
+                    else:
+                        done = finished.is_set()
+                        if not done:
+                            time.sleep(0.005)
+        thread.join()
+        elapsed = time.perf_counter() - start
+        if first_byte is None:
+            first_byte = elapsed
+            received = os.path.getsize(output_file)
+        return first_byte, elapsed, received
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    with StubServer(args.pages, args.fanout, args.latency) as server:
+        for output_format in ('docx', 'jsonl', 'markdown'):
+            first_byte, elapsed, received = run(server.base_url, output_format, args.concurrency)
+            print(f"{output_format:>8}: first page after {first_byte:.2f}s, done in {elapsed:.2f}s ({received} bytes)")
+
+
+if __name__ == '__main__':
+    main()
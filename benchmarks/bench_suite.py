@@ -0,0 +1,247 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_server import StubServer, tree_size  # noqa: E402
+
+# 実際のサイトにアクセスせずにクローラー全体の性能を測るベンチマーク
+# スタブサーバー（stub_server.StubServer）で合成したサイト（ページ数・リンク数・深さ・HTMLの大きさ・画像・PDF・
+# 重複ページ・遅延・エラー）に対して scrape_website / list_all_urls / list_all_urls_with_stats を実行し、
+# pages/sec・ピークメモリ（RSS）・段階ごとの処理時間を JSON のレポートに書く
+# ピークメモリを実行ごとに測るため、1回の実行ごとに別プロセスで動かす（サーバーは親プロセスで動かす）
+# レポートにはコミットとサイト・実行の設定を含めるので、--compare で別のコミットのレポートと比べられる
+# 使い方:
+#   python benchmarks/bench_suite.py --preset heavy --output before.json
+#   python benchmarks/bench_suite.py --preset heavy --output after.json --compare before.json
+
+WORKLOADS = ('scrape', 'list_urls', 'list_urls_with_stats')
+
+# サイトの設定のまとまり（コマンドラインで個別に上書きできる）
+PRESETS = {
+    'basic': {},
+    'heavy': {'html_kb': 64, 'words': 300, 'images': 3, 'pdfs': 1},
+    'duplicates': {'words': 300, 'duplicates': 3},
+    'flaky': {'latency': 0.02, 'jitter': 0.05, 'error_rate': 0.05},
+    'deep': {'pages': 2000, 'fanout': 2, 'depth': 9},
+}
+
+
+def git_revision():
+    # (コミット, 作業ツリーに変更があるか)。git がなければ (None, None)
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True)
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit.stdout.strip(), bool(status.stdout.strip())
+
+
+def run_child(workload, base_url, settings):
+    # 子プロセス：1回実行して結果を JSON で標準出力の最後の行に書く
+    import scrape
+    scrape.CACHE_DIR = ''  # 前回の実行のキャッシュで結果が変わらないようにする
+    common = {
+        'crawl_mode': settings['mode'],
+        'concurrency': settings['concurrency'],
+        'per_host_concurrency': settings['concurrency'],
+        'min_delay': 0,
+    }
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'output.' + ('csv' if workload == 'list_urls_with_stats' else settings['format']))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if workload == 'scrape':
+                scrape.scrape_website(base_url + '/page/0', output_file, enable_ocr=settings['ocr'],
+                                      enable_pdf=settings['pdf'], report=report,
+                                      output_format=settings['format'], **common)
+            elif workload == 'list_urls':
+                scrape.list_all_urls(base_url + '/page/0', report=report, **common)
+            else:
+                scrape.list_all_urls_with_stats(base_url + '/page/0', output_file, report=report, **common)
+        elapsed = time.perf_counter() - start
+        output_bytes = os.path.getsize(output_file) if os.path.exists(output_file) else 0
+    metrics = report.get('metrics') or {}
+    pages = metrics.get('pages', 0)
+    result = {
+        'elapsed': round(elapsed, 3),
+        'pages': pages,
+        'pages_per_sec': round(pages / elapsed, 2) if elapsed > 0 else 0.0,
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),  # Linux は KB 単位
+        'bytes_downloaded': metrics.get('bytes_downloaded', 0),
+        'output_bytes': output_bytes,
+        'retries': metrics.get('retries', 0),
+        'status_codes': metrics.get('status_codes', {}),
+        'stages': {stage: value['seconds'] for stage, value in metrics.get('stages', {}).items()},
+    }
+    if 'duplicates' in report:
+        result['duplicates'] = report['duplicates']['skipped']
+    print(json.dumps(result))
+
+
+def run_workload(workload, base_url, settings):
+    result = subprocess.run(
+        [sys.executable, __file__, '--child', workload, '--base-url', base_url, '--settings', json.dumps(settings)],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{workload} の実行に失敗しました:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def median_result(runs):
+    # 数値の項目ごとの中央値（段階ごとの時間も）
+    summary = {}
+    for name in ('elapsed', 'pages', 'pages_per_sec', 'peak_rss_mb', 'bytes_downloaded', 'output_bytes', 'retries'):
+        summary[name] = statistics.median(run[name] for run in runs)
+    stages = sorted({stage for run in runs for stage in run['stages']})
+    summary['stages'] = {stage: round(statistics.median(run['stages'].get(stage, 0) for run in runs), 3)
+                         for stage in stages}
+    return summary
+
+
+def start_server(site):
+    server = StubServer(site['pages'], site['fanout'], site['latency'])
+    server.article_words = site['words']
+    server.page_bytes = site['html_kb'] * 1024
+    server.images = site['images']
+    server.image_size = site['image_size']
+    server.pdfs = site['pdfs']
+    server.duplicates = site['duplicates']
+    server.latency_jitter = site['jitter']
+    server.error_rate = site['error_rate']
+    return server
+
+
+def compare(report, baseline):
+    # 同じワークロードの中央値を baseline と比べて表示する（比は今回 / baseline）
+    print(f"compare with {baseline.get('commit') or '?'} ({baseline.get('created')})")
+    if baseline.get('site') != report['site'] or baseline.get('settings') != report['settings']:
+        print("  注意: サイトまたは実行の設定が異なります")
+    for workload, current in report['results'].items():
+        previous = baseline.get('results', {}).get(workload)
+        if not previous:
+            continue
+        current, previous = current['median'], previous['median']
+        line = [f"{workload:>21}:"]
+        for name in ('pages_per_sec', 'peak_rss_mb'):
+            if previous[name]:
+                line.append(f"{name} {previous[name]} -> {current[name]} ({current[name] / previous[name]:.2f}x)")
+        print(' '.join(line))
+        for stage, seconds in current['stages'].items():
+            before = previous['stages'].get(stage, 0)
+            if seconds or before:
+                print(f"{'':>23}{stage}: {before:.3f}s -> {seconds:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='basic', help='サイトの設定のまとまり')
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--depth', type=int, default=None, help='/page/0 からの深さの上限（ページ数をその深さまでに減らす）')
+    parser.add_argument('--words', type=int, default=0, help='1ページの本文の語数')
+    parser.add_argument('--html-kb', type=int, default=0, help='1ページのHTMLの大きさ（KB。インラインスクリプトで水増し）')
+    parser.add_argument('--images', type=int, default=0, help='1ページの画像の数')
+    parser.add_argument('--image-size', type=int, default=16, help='画像の一辺（ピクセル。OCR_MIN_SIZE 未満ならOCRしない）')
+    parser.add_argument('--pdfs', type=int, default=0, help='1ページからリンクするPDFの数')
+    parser.add_argument('--duplicates', type=int, default=0, help='1ページあたりのタグページ（重複）の数')
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--jitter', type=float, default=0.0, help='遅延に足すランダムな秒数の上限')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='503 を返すリクエストの割合')
+    parser.add_argument('--mode', choices=['serial', 'async'], default='async')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--format', choices=['docx', 'jsonl', 'markdown'], default='docx', help='scrape の出力形式')
+    parser.add_argument('--ocr', action='store_true', help='scrape で画像OCRも行う（tesseract が必要）')
+    parser.add_argument('--workloads', default=','.join(WORKLOADS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='レポート（JSON）の書き出し先')
+    parser.add_argument('--compare', help='比べるレポート（JSON）')
+    parser.add_argument('--child', choices=WORKLOADS)
+    parser.add_argument('--base-url')
+    parser.add_argument('--settings')
+    preset = parser.parse_known_args()[0].preset
+    parser.set_defaults(**PRESETS[preset])
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.base_url, json.loads(args.settings))
+        return
+
+    pages = args.pages if args.depth is None else min(args.pages, tree_size(args.fanout, args.depth))
+    site = {
+        'preset': preset,
+        'pages': pages,
+        'fanout': args.fanout,
+        'depth': args.depth,
+        'words': args.words,
+        'html_kb': args.html_kb,
+        'images': args.images,
+        'image_size': args.image_size,
+        'pdfs': args.pdfs,
+        'duplicates': args.duplicates,
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'error_rate': args.error_rate,
+    }
+    settings = {
+        'mode': args.mode,
+        'concurrency': args.concurrency,
+        'format': args.format,
+        'ocr': args.ocr,
+        'pdf': args.pdfs > 0,
+        'repeat': args.repeat,
+    }
+    workloads = [workload.strip() for workload in args.workloads.split(',') if workload.strip()]
+    for workload in workloads:
+        if workload not in WORKLOADS:
+            parser.error(f"不明なワークロード: {workload}（{', '.join(WORKLOADS)}）")
+
+    commit, dirty = git_revision()
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'site': site,
+        'settings': settings,
+        'results': {},
+    }
+    with start_server(site) as server:
+        for workload in workloads:
+            runs = [run_workload(workload, server.base_url, settings) for _ in range(args.repeat)]
+            report['results'][workload] = {'runs': runs, 'median': median_result(runs)}
+            median = report['results'][workload]['median']
+            stages = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in median['stages'].items() if seconds)
+            print(f"{workload:>21}: {median['pages']} pages in {median['elapsed']:.2f}s "
+                  f"({median['pages_per_sec']:.0f} pages/sec), peak RSS {median['peak_rss_mb']:.0f} MB, "
+                  f"retries {median['retries']}; {stages}")
+        report['server'] = {'responses': {str(status): count for status, count in sorted(server.responses.items())}}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"レポート: {args.output}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import os
+import random
+import sys
+import time
+from urllib.parse import urljoin, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler import normalize_url  # noqa: E402
+from url_filter import UrlFilter  # noqa: E402
+
+# ページ内リンクの正規化・対象判定（1秒あたりのリンク数）を従来の実装と比較し、結果が一致するか確認する
+# 1ページあたり --links 件のリンク（共通ナビゲーション・ページ固有・相対パス・外部サイト・PDF）を --pages ページ分処理する
+# 使い方: python benchmarks/bench_url_filter.py --pages 200 --links 300 --excludes 40
+
+DOMAIN = 'www.example.com'
+
+
+def legacy_links(base_url, hrefs, exclude_paths, include_only_prefix):
+    # 従来の Crawler.extract_links / should_visit
+    def should_visit(url):
+        path = urlparse(url).path
+        for exclude in exclude_paths:
+            if path.startswith(exclude):
+                return False
+        if include_only_prefix:
+            return any(path.startswith(prefix) for prefix in include_only_prefix)
+        return True
+
+    links = []
+    for href in hrefs:
+        normalized_url = normalize_url(urljoin(base_url, href))
+        if urlparse(normalized_url).netloc == DOMAIN and should_visit(normalized_url):
+            links.append(normalized_url)
+    return links
+
+
+def filter_links(url_filter, base_url, hrefs):
+    links = []
+    for href in hrefs:
+        normalized_url = url_filter.resolve(base_url, href)
+        if normalized_url is not None:
+            links.append(normalized_url)
+    return links
+
+
+def make_site(pages, links, seed):
+    rnd = random.Random(seed)
+    sections = [f'/section{i}' for i in range(20)]
+    nav = [f'{section}/' for section in sections] + [f'https://{DOMAIN}{section}/index.html' for section in sections]
+    nav += ['/', '#top', 'https://twitter.com/example', 'mailto:info@example.com', '/files/catalog.pdf']
+    site = []
+    for page in range(pages):
+        base_url = f'https://{DOMAIN}{rnd.choice(sections)}/page{page}/'
+        hrefs = list(nav)
+        while len(hrefs) < links:
+            kind = rnd.random()
+            target = f'{rnd.choice(sections)}/page{rnd.randrange(pages * 10)}'
+            if kind < 0.4:
+                hrefs.append(target + '/')
+            elif kind < 0.6:
+                hrefs.append(f'https://{DOMAIN}{target}?utm_source=x#frag')
+            elif kind < 0.8:
+                hrefs.append(f'../page{rnd.randrange(pages * 10)}/detail.html')
+            else:
+                hrefs.append(f'https://other{rnd.randrange(50)}.example.net{target}')
+        site.append((base_url, hrefs))
+    return site
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--links', type=int, default=300)
+    parser.add_argument('--excludes', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    site = make_site(args.pages, args.links, seed=1)
+    exclude_paths = [f'/section{i}/page{j}' for i in range(0, 20, 2) for j in range(args.excludes // 10)]
+    exclude_paths = exclude_paths[:args.excludes]
+    include_only_prefix = ['/section']
+    total = sum(len(hrefs) for _, hrefs in site) * args.repeat
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        expected = [legacy_links(base_url, hrefs, exclude_paths, include_only_prefix) for base_url, hrefs in site]
+    legacy_elapsed = time.perf_counter() - start
+
+    url_filter = UrlFilter(DOMAIN, exclude_paths, include_only_prefix)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        actual = [filter_links(url_filter, base_url, hrefs) for base_url, hrefs in site]
+    filter_elapsed = time.perf_counter() - start
+
+    if actual != expected:
+        print("NG: 従来の実装と結果が一致しません")
+        sys.exit(1)
+    print(f"{total} links, {len(exclude_paths)} exclude rules: 結果は一致")
+    print(f"   legacy: {total / legacy_elapsed / 1000:.0f}k links/sec")
+    print(f"UrlFilter: {total / filter_elapsed / 1000:.0f}k links/sec ({legacy_elapsed / filter_elapsed:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+import gzip
+import hashlib
+import random
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ベンチマーク用のローカルHTTPサーバー
+# /page/<n> が n*fanout+1 〜 n*fanout+fanout へのリンクを持つ木構造のサイトを返す
+# site.page_count / site.revisions（{n: 版番号}）を書き換えると、ページの追加・削除・更新を再現できる
+# site.robots（robots.txt の本文）と site.sitemap_size（1ファイルあたりのURL数。0 ならサイトマップなし）を設定すると、
+# /robots.txt と /sitemap.xml（gzip のサイトマップを並べたインデックス）も返す
+# site.nav_links（全ページ共通のナビゲーションのリンク数）と site.asset_bytes（0 より大きければ各ページから
+# /files/<n>.zip と /files/<n>.pdf にリンクし、そのバイト数のファイルを返す。HEAD にも対応）でページを重くできる
+# site.article_words（各ページの本文に足す疑似文章の語数）と site.duplicates（0 より大きければ各ページから
+# /tag/<n>/<k>（k < duplicates）にリンクし、k=0 は同じ本文、それ以外は「タグ k」の1行だけ違う本文を返す）で
+# 重複・ほぼ重複ページの多いサイトを再現できる
+# site.archive_pages（0 より大きければ各ページから /archive/0 にリンクし、/archive/<k> は
+# k*archive_fanout+1 〜 k*archive_fanout+archive_fanout へリンクする）でカレンダーのような深いディレクトリを足せる
+# site.images（各ページの <img> の数。/images/<n>/<k>.png は一辺 image_size ピクセルのPNG）、
+# site.pdfs（各ページからリンクするPDFの数。/docs/<n>/<k>.pdf は本文に article_words 語を含む1ページのPDF）、
+# site.page_bytes（ページのHTMLがこのバイト数になるまでインラインの <script> で水増しする）でページを重くできる
+# site.latency_jitter（latency に 0〜この秒数をランダムに足す）と site.error_rate（この割合のリクエストに
+# error_status を返す。再試行すれば成功することがある）で遅い・不安定なサーバーを再現できる
+# 返したステータスコードの数は site.responses（Counter）に数える
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+WORDS = ('crawl', 'page', 'office', 'report', 'city', 'notice', 'service', 'event', 'guide', 'support',
+         'application', 'schedule', 'resident', 'public', 'health', 'school', 'library', 'park', 'road', 'tax')
+
+
+def article(n, words):
+    rng = random.Random(n)
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def tree_size(fanout, depth):
+    # /page/0 から depth 階層までのページ数（fanout 分木）
+    return sum(fanout ** level for level in range(depth + 1))
+
+
+def png(size):
+    # 一辺 size ピクセルの白いPNG（PIL を使わずに作る）
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+    raw = (b'\0' + b'\xff' * size * 3) * size
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)) +
+            chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+def pdf(text):
+    # text（ASCII）を1行で書いた1ページのPDF
+    text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    content = f'BT /F1 10 Tf 36 760 Td ({text}) Tj ET'.encode('latin-1')
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R '
+        b'/Resources << /Font << /F1 5 0 R >> >> >>',
+        b'<< /Length %d >>\nstream\n%s\nendstream' % (len(content), content),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    body = b'%PDF-1.4\n'
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(body))
+        body += b'%d 0 obj\n%s\nendobj\n' % (number, obj)
+    xref = len(body)
+    body += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    body += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    body += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return body
+
+
+def sitemap_index(site):
+    files = ''.join(
+        f'<sitemap><loc>{site.base_url}/sitemap-{i}.xml.gz</loc></sitemap>'
+        for i in range((site.page_count + site.sitemap_size - 1) // site.sitemap_size)
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="{SITEMAP_NS}">{files}</sitemapindex>'.encode('utf-8')
+
+
+def sitemap_file(site, i):
+    start = i * site.sitemap_size
+    urls = ''.join(
+        f'<url><loc>{site.base_url}/page/{n}</loc></url>'
+        for n in range(start, min(start + site.sitemap_size, site.page_count))
+    )
+    body = f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{SITEMAP_NS}">{urls}</urlset>'.encode('utf-8')
+    return gzip.compress(body)
+
+
+def make_handler(site):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def send_response(self, code, message=None):
+            site.count(code)
+            super().send_response(code, message)
+
+        def send_body(self, body, content_type):
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_asset(self, path, head):
+            content_type = 'application/pdf' if path.endswith('.pdf') else 'application/zip'
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(site.asset_bytes))
+            self.end_headers()
+            if head:
+                return
+            chunk = b'\0' * 65536
+            try:
+                for start in range(0, site.asset_bytes, len(chunk)):
+                    self.wfile.write(chunk[:site.asset_bytes - start])
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # 本文を読まずに閉じるクライアント
+
+        def send_archive(self, path):
+            try:
+                k = int(path[len('/archive/'):])
+            except ValueError:
+                k = -1
+            if not 0 <= k < site.archive_pages:
+                self.send_error(404)
+                return
+            site.wait()
+            fanout = site.archive_fanout
+            links = ''.join(
+                f'<li><a href="/archive/{child}">archive {child}</a></li>'
+                for child in range(k * fanout + 1, k * fanout + fanout + 1)
+                if child < site.archive_pages
+            )
+            body = (
+                f'<html><head><title>archive {k}</title></head><body><main>'
+                f'<h1>archive {k}</h1><p>過去の記事 {k}</p><ul>{links}</ul></main></body></html>'
+            ).encode('utf-8')
+            self.send_body(body, 'text/html; charset=utf-8')
+
+        def send_document(self, path):
+            # /images/<n>/<k>.png と /docs/<n>/<k>.pdf
+            kind, rest = path[1:].split('/', 1)
+            try:
+                n, k = (int(part) for part in rest.rsplit('.', 1)[0].split('/'))
+            except ValueError:
+                n = k = -1
+            count = site.images if kind == 'images' else site.pdfs
+            if not (0 <= n < site.page_count and 0 <= k < count):
+                self.send_error(404)
+                return
+            site.wait()
+            if kind == 'images':
+                self.send_body(png(site.image_size), 'image/png')
+            else:
+                self.send_body(pdf(f'document {n} {k} ' + article(n * 1000 + k, site.article_words)), 'application/pdf')
+
+        def do_HEAD(self):
+            if self.path.startswith('/files/') and site.asset_bytes:
+                self.send_asset(self.path, head=True)
+            else:
+                self.send_error(405)
+
+        def do_GET(self):
+            path = self.path.rstrip('/')
+            if site.error_rate and path != '/robots.txt' and site.rng.random() < site.error_rate:
+                self.send_error(site.error_status)
+                return
+            if path.startswith('/files/') and site.asset_bytes:
+                self.send_asset(path, head=False)
+                return
+            if path == '/robots.txt' and site.robots is not None:
+                self.send_body(site.robots.encode('utf-8'), 'text/plain')
+                return
+            if path == '/sitemap.xml' and site.sitemap_size:
+                self.send_body(sitemap_index(site), 'application/xml')
+                return
+            if path.startswith('/sitemap-') and site.sitemap_size:
+                self.send_body(sitemap_file(site, int(path[len('/sitemap-'):].split('.')[0])), 'application/x-gzip')
+                return
+            if path.startswith('/archive/') and site.archive_pages:
+                self.send_archive(path)
+                return
+            if path.startswith(('/images/', '/docs/')):
+                self.send_document(path)
+                return
+            if path in ('', '/page'):
+                path = '/page/0'
+            tag = None
+            try:
+                if path.startswith('/tag/') and site.duplicates:
+                    n, tag = (int(part) for part in path[len('/tag/'):].split('/'))
+                    if not 0 <= tag < site.duplicates:
+                        n = -1
+                else:
+                    n = int(path.rsplit('/', 1)[1])
+            except ValueError:
+                n = -1
+            page_count, fanout = site.page_count, site.fanout
+            if not 0 <= n < page_count:
+                self.send_error(404)
+                return
+            site.wait()
+            links = ''.join(
+                f'<li><a href="/page/{child}">page {child}</a></li>'
+                for child in range(n * fanout + 1, n * fanout + fanout + 1)
+                if child < page_count
+            )
+            links += ''.join(f'<li><a href="/page/{k}">nav {k}</a></li>' for k in range(min(site.nav_links, page_count)))
+            if site.archive_pages:
+                links += '<li><a href="/archive/0">archive</a></li>'
+            if site.asset_bytes:
+                links += f'<li><a href="/files/{n}.zip">zip</a></li><li><a href="/files/{n}.pdf">pdf</a></li>'
+            links += ''.join(f'<li><a href="/tag/{n}/{k}">tag {k}</a></li>' for k in range(site.duplicates))
+            links += ''.join(f'<li><a href="/docs/{n}/{k}.pdf">pdf {k}</a></li>' for k in range(site.pdfs))
+            text = f'<p>{article(n, site.article_words)}</p>' if site.article_words else ''
+            if tag:
+                text += f'<p>タグ {tag}</p>'
+            text += ''.join(f'<p><img src="/images/{n}/{k}.png" alt="image {k}"></p>' for k in range(site.images))
+            body = (
+                f'<html><head><title>page {n}</title>'
+                f'<meta name="description" content="stub page {n}"></head>'
+                f'<body><header>header</header><nav>nav</nav><main>'
+                f'<h1>page {n}</h1><p>本文 {n} 版 {site.revisions.get(n, 0)}</p>{text}<ul>{links}</ul>'
+                f'</main></body></html>'
+            ).encode('utf-8')
+            if len(body) < site.page_bytes:
+                padding = site.page_bytes - len(body) - len('<script>var pad = "";</script>')
+                body = body.replace(b'</body>', f'<script>var pad = "{"x" * max(padding, 0)}";</script></body>'.encode('utf-8'))
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+class QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # 本文を読まずに接続を閉じるクライアントによる切断は表示しない
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    def __init__(self, page_count=200, fanout=5, latency=0.05):
+        self.page_count = page_count
+        self.fanout = fanout
+        self.latency = latency
+        self.revisions = {}
+        self.robots = None
+        self.sitemap_size = 0
+        self.nav_links = 0
+        self.asset_bytes = 0
+        self.article_words = 0
+        self.duplicates = 0
+        self.archive_pages = 0
+        self.archive_fanout = 10
+        self.images = 0
+        self.image_size = 16
+        self.pdfs = 0
+        self.page_bytes = 0
+        self.latency_jitter = 0
+        self.error_rate = 0
+        self.error_status = 503
+        self.rng = random.Random(0)
+        self.responses = Counter()
+        self.lock = threading.Lock()
+        self.server = QuietServer(('127.0.0.1', 0), make_handler(self))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def wait(self):
+        delay = self.latency + (self.rng.uniform(0, self.latency_jitter) if self.latency_jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+    def count(self, status):
+        with self.lock:
+            self.responses[status] += 1
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
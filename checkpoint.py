@@ -0,0 +1,87 @@
+import os
+import time
+
+# === クロールのチェックポイント（途中で止まったクロールを続きから再開する） ===
+# フロンティアに入れたURL（a）と処理を終えたURL（d）を追記専用のログに記録する。
+# 状態全体を書き直さないので、書き込み量はクロールしたページ数に比例するだけ（5万ページでも数MB）。
+# 1行: 'a\t<URL>[\t<重複判定のキー>[\t<深さ>]]' / 'd\t<URL>[\t<本文ハッシュ>]'（キーがURLと同じなら空）
+# ログは every ページごと（または interval 秒ごと）にまとめて書く。その直前に各ハンドラの checkpoint() を
+# 呼ぶので、ログに d と書かれたページはハンドラの出力（Word・CSV の行）にも必ず残っている。
+# 再開時は a の順にURLを並べ、d のないものをフロンティアに戻す（書きかけだった最後の行は捨てる）
+
+DEFAULT_EVERY = 100       # ページ
+DEFAULT_INTERVAL = 30.0   # 秒
+
+
+class CrawlCheckpoint:
+    def __init__(self, path, resume=False, every=DEFAULT_EVERY, interval=DEFAULT_INTERVAL):
+        self.path = path
+        self.every = every
+        self.interval = interval
+        self.buffer = []
+        self.pending_pages = 0
+        self.last_flush = time.monotonic()
+        self.added_entries = []  # 再開時に読み込んだ [(URL, キー, 深さ)]（restore() で使ったら捨てる）
+        self.done_entries = {}   # 再開時に読み込んだ {URL: 本文ハッシュ}
+        self.resumed = False
+
+        committed = 0
+        if resume and os.path.exists(path):
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # 書き込み途中の行
+                    committed += len(line)
+                    kind, url, *rest = line.decode('utf-8').rstrip('\n').split('\t')
+                    if kind == 'a':
+                        self.added_entries.append((url, rest[0] if rest and rest[0] else None,
+                                                   int(rest[1]) if len(rest) > 1 else 0))
+                    else:
+                        self.done_entries[url] = rest[0] if rest else None
+            self.resumed = bool(self.added_entries)
+        self.file = open(path, 'ab' if resume else 'wb')
+        self.file.truncate(committed)
+
+    def restore(self, frontier, current_pages):
+        # 前回の状態をフロンティアと current_pages（{URL: 本文ハッシュ}）に戻し、処理済みのページ数を返す
+        for url, key, depth in self.added_entries:
+            if url in self.done_entries:
+                frontier.mark_seen(key or url)
+            else:
+                frontier.add(url, key, depth)
+        for url, digest in self.done_entries.items():
+            if digest:
+                current_pages[url] = digest
+        done = len(self.done_entries)
+        self.added_entries = []
+        self.done_entries = {}
+        return done
+
+    def added(self, url, key=None, depth=0):
+        fields = ['a', url, key if key and key != url else '', str(depth) if depth else '']
+        self.buffer.append('\t'.join(fields).rstrip('\t') + '\n')
+
+    def done(self, url, digest=None):
+        self.buffer.append(f'd\t{url}\t{digest}\n' if digest else f'd\t{url}\n')
+        self.pending_pages += 1
+
+    def due(self):
+        # 書き出す時期か（ページ数か経過時間のどちらかが閾値を超えた）
+        if not self.pending_pages:
+            return False
+        return self.pending_pages >= self.every or time.monotonic() - self.last_flush >= self.interval
+
+    def flush(self):
+        # 1回の write でまとめて書く
+        if self.buffer:
+            self.file.write(''.join(self.buffer).encode('utf-8'))
+            self.file.flush()
+            self.buffer = []
+        self.pending_pages = 0
+        self.last_flush = time.monotonic()
+
+    def close(self, remove=False):
+        # remove=True（クロールが最後まで終わった）ならログを消す
+        self.file.close()
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
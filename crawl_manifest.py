@@ -0,0 +1,41 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+# === 前回クロールの記録（増分クロール用） ===
+# サイト（開始URL＋除外・対象パス）とクロールの種類ごとに {URL: 本文のSHA-256} を JSON で保存する
+# PDFなど取得しないURLは値が None になる
+# クロールの種類（PDFへのリンクも記録するか・軽量取得か）が違うと記録の中身も違う
+# （URL一覧はPDFも記録し、HTML以外のハッシュは本文ではなく ETag などから作る）ので、種類ごとに別の記録にする
+
+
+def manifest_key(start_url, exclude_paths=None, include_only_prefix=None, follow_pdf=False, lightweight=False):
+    source = json.dumps([start_url, sorted(exclude_paths or []), sorted(include_only_prefix or []),
+                         bool(follow_pdf), bool(lightweight)])
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+def manifest_path(directory, key):
+    return os.path.join(directory, f'{key}.json')
+
+
+def load_manifest(directory, key):
+    try:
+        with open(manifest_path(directory, key), encoding='utf-8') as f:
+            return json.load(f)['pages']
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+
+
+def save_manifest(directory, key, start_url, pages):
+    os.makedirs(directory, exist_ok=True)
+    path = manifest_path(directory, key)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'start_url': start_url,
+            'crawled_at': datetime.now().isoformat(timespec='seconds'),
+            'pages': pages,
+        }, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
@@ -0,0 +1,552 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urlunparse
+
+from extract import make_soup, response_text, extract_hrefs
+from frontier import Frontier, make_seen_set, SEEN_MODES, DEFAULT_BLOOM_ERROR_RATE
+from http_client import HttpClient, response_size
+from response_cache import cached_extract
+from url_filter import UrlFilter, get_directory
+from metrics import NULL_METRICS
+from scheduler import CRAWL_ORDERS, UNLIMITED
+
+# === クロールエンジン ===
+# 'serial' : 1ページずつ取得（従来の動作）
+# 'async'  : asyncioで複数ページを並列取得し、処理は発見順に1ページずつ行う
+CRAWL_MODES = ('serial', 'async')
+
+DEFAULT_CONCURRENCY = 8           # 同時に取得するページ数（全体）
+DEFAULT_PER_HOST_CONCURRENCY = 4  # 同一ホストへの同時接続数の上限
+DEFAULT_MIN_DELAY = 1.0           # serial: 同一ホストへのリクエスト開始間隔（秒、従来の sleep(1) 相当）
+DEFAULT_ASYNC_MIN_DELAY = 0.5     # async: 同一ホストへのリクエスト開始間隔（秒）
+
+
+def normalize_url(url):
+    parsed = urlparse(url)
+    path = parsed.path.rstrip('/')
+    normalized = urlunparse((parsed.scheme, parsed.netloc, path, '', '', ''))
+    return normalized
+
+
+def is_pdf_url(url):
+    return url.lower().endswith('.pdf')
+
+
+# ホストごとのリクエスト間隔を守る（serialモード用）
+class HostThrottle:
+    def __init__(self, min_delay):
+        self.min_delay = min_delay
+        self.last_start = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        if self.min_delay <= 0:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.last_start.get(host, 0) + self.min_delay)
+            self.last_start[host] = start
+        if start > now:
+            time.sleep(start - now)
+
+
+# ホストごとの同時接続数とリクエスト間隔を守る（asyncモード用）
+class AsyncHostLimiter:
+    def __init__(self, per_host_concurrency, min_delay):
+        self.per_host_concurrency = per_host_concurrency
+        self.min_delay = min_delay
+        self.semaphores = {}
+        self.last_start = {}
+
+    async def acquire(self, url):
+        host = urlparse(url).netloc
+        semaphore = self.semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_concurrency)
+            self.semaphores[host] = semaphore
+        await semaphore.acquire()
+        if self.min_delay > 0:
+            # 開始時刻を先に予約してから待つので、並列でも間隔が守られる
+            now = time.monotonic()
+            start = max(now, self.last_start.get(host, 0) + self.min_delay)
+            self.last_start[host] = start
+            if start > now:
+                await asyncio.sleep(start - now)
+        return semaphore
+
+    def release(self, semaphore):
+        semaphore.release()
+
+
+def _safe_fetch(fetch, url, metrics=NULL_METRICS):
+    try:
+        with metrics.timer('fetch'):
+            return fetch(url), None
+    except Exception as e:
+        return None, e
+
+
+def response_digest(response):
+    # 本文のハッシュ（本文を読んでいない軽量取得では ETag・Last-Modified・サイズから作る）
+    digest = getattr(response, 'content_digest', None)
+    if digest:
+        return digest
+    if getattr(response, 'body_skipped', False):
+        validators = [response.headers.get(name, '') for name in ('ETag', 'Last-Modified', 'Content-Length')]
+        return hashlib.sha256('\n'.join(validators).encode('utf-8')).hexdigest()
+    return hashlib.sha256(response.content).hexdigest()
+
+
+def fetch_info(response=None, error=None):
+    # ステータス・Content-Type・バイト数（エラーならエラーのレスポンスから分かるものだけ）
+    if response is None:
+        response = getattr(error, 'response', None)
+        if response is None:
+            return {'status': None, 'content_type': None, 'bytes': None}
+        size = None
+    else:
+        size = response_size(response)
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip() or None
+    return {'status': response.status_code, 'content_type': content_type, 'bytes': size}
+
+
+def downloaded_bytes(response):
+    # 実際に受信した本文のバイト数（304 でキャッシュから返したもの・本文を読まなかったものは 0）
+    if response is None or getattr(response, 'from_cache', False) or getattr(response, 'body_skipped', False):
+        return 0
+    return len(response.content)
+
+
+def retry_count(response):
+    retries = getattr(getattr(response, 'raw', None), 'retries', None)
+    return len(getattr(retries, 'history', None) or ())
+
+
+# 取得に成功したHTMLページ（soupはハンドラ間で共有される。ハンドラが要素を削除してよい）
+# soup は最初に参照されたときに解析する（キャッシュ済みの抽出結果だけで済む場合は解析しない）
+class Page:
+    def __init__(self, url, response, cache=None, metrics=NULL_METRICS):
+        self.url = url
+        self.response = response
+        self.cache = cache
+        self.metrics = metrics
+        self._soup = None
+
+    @property
+    def soup(self):
+        if self._soup is None:
+            with self.metrics.timer('parse'):
+                self._soup = make_soup(response_text(self.response))
+        return self._soup
+
+    def extract(self, kind, extract):
+        # 本文が前回のクロールと同じならキャッシュ済みの抽出結果を使う
+        return cached_extract(self.cache, self.response, kind, extract)
+
+
+# ページごとの処理を差し込むためのハンドラ
+#   on_visit(url)          : 訪問したURLごと（正規化済み）に呼ばれる
+#   on_page(page)          : HTMLの取得に成功したページごとに呼ばれる
+#   on_change(url, change) : 増分クロールのとき、'new' / 'changed' / 'removed' のURLごとに呼ばれる
+#                            （変更のないURLは on_visit / on_page も呼ばれない）
+#   finish()               : クロール終了時に呼ばれ、戻り値がそのハンドラの結果になる
+#   on_fetched(url, info)  : 取得したURL（エラーを含む）ごとに on_visit の後で呼ばれる
+#                            info は {'status', 'content_type', 'bytes'}（分からない値は None）
+#   progress_stats()       : 進捗の通知に添える集計（辞書）を返す。progress_callback にキーワード引数で渡される
+#   checkpoint()           : チェックポイント（checkpoint.CrawlCheckpoint）を書く直前に呼ばれる。
+#                            ここまでに渡されたページの結果を、再開時に読み戻せるようディスクに書いておく
+#   close()                : クロールの終了時に、途中で例外が起きた場合も含めて必ず呼ばれる（finish の後にも呼ばれる）。
+#                            プールや開いているファイルを閉じる（再開に使うファイルは消さない）
+# wants_pdf_urls が True のハンドラがいる場合、PDFへのリンクも訪問対象になる（PDF自体は取得しない）
+# needs_page_content が False のハンドラだけの場合（URL一覧）は軽量取得になる
+#   HTML以外は本文を読まず（PDFは HEAD のみ）、リンクは soup を作らずに <a href> だけを拾う
+class CrawlHandler:
+    wants_pdf_urls = False
+    needs_page_content = True
+
+    def on_visit(self, url):
+        pass
+
+    def on_fetched(self, url, info):
+        pass
+
+    def on_change(self, url, change):
+        pass
+
+    def on_page(self, page):
+        pass
+
+    def finish(self):
+        return None
+
+    def progress_stats(self):
+        return None
+
+    def checkpoint(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def close_handlers(handlers):
+    # すべてのハンドラの close() を呼ぶ（close の例外で元の例外や残りのハンドラの close を妨げない）
+    for handler in handlers:
+        try:
+            handler.close()
+        except Exception as e:
+            print(f"ハンドラを閉じられません: {e}")
+
+
+def crawl_kind(handlers):
+    # ハンドラの組み合わせで決まるクロールの種類 (PDFへのリンクも訪問するか, 軽量取得か)
+    follow_pdf = any(handler.wants_pdf_urls for handler in handlers)
+    lightweight = not any(handler.needs_page_content for handler in handlers)
+    return follow_pdf, lightweight
+
+
+# 3種類のクロール（Word出力・URL一覧・ディレクトリ統計）で共通のクロール処理
+# 1回のクロールで複数のハンドラに同じページを渡せる
+class Crawler:
+    def __init__(self, start_url, handlers, exclude_paths=None, include_only_prefix=None,
+                 mode='serial', concurrency=DEFAULT_CONCURRENCY,
+                 per_host_concurrency=DEFAULT_PER_HOST_CONCURRENCY, min_delay=None,
+                 http=None, fetch=None, progress_callback=None, previous_pages=None, record_pages=False,
+                 seen_mode='exact', bloom_error_rate=DEFAULT_BLOOM_ERROR_RATE, url_filter=None,
+                 robots=None, listed_urls=None, follow_links=True, metrics=NULL_METRICS, checkpoint=None,
+                 deprioritize=None, order=None, priority_patterns=None, budget=UNLIMITED):
+        if mode not in CRAWL_MODES:
+            raise ValueError(f"不明なクロールモード: {mode}")
+        if order is not None and order not in CRAWL_ORDERS:
+            raise ValueError(f"不明なクロール順序: {order}")
+        if seen_mode not in SEEN_MODES:
+            raise ValueError(f"不明な訪問済み判定の方式: {seen_mode}")
+        if min_delay is None:
+            min_delay = DEFAULT_MIN_DELAY if mode == 'serial' else DEFAULT_ASYNC_MIN_DELAY
+        self.start_url = start_url
+        self.handlers = list(handlers)
+        self.exclude_paths = exclude_paths or []
+        self.include_only_prefix = include_only_prefix or []
+        self.mode = mode
+        self.concurrency = concurrency
+        self.per_host_concurrency = per_host_concurrency
+        # robots（discovery.RobotsRules）の Crawl-delay がこれより長ければそちらに従う
+        if robots is not None and robots.crawl_delay:
+            min_delay = max(min_delay, robots.crawl_delay)
+        self.min_delay = min_delay
+        # 訪問済みURLの保持方法（frontier.SEEN_MODES。大規模サイトでは 'fingerprint' / 'bloom' で省メモリ）
+        self.seen_mode = seen_mode
+        self.bloom_error_rate = bloom_error_rate
+        # http を渡さない場合は並列数に合わせた接続プールを作り、終了時に閉じる
+        self.owns_http = http is None
+        self.http = http or HttpClient(pool_size=max(concurrency, per_host_concurrency))
+        self.fetch = fetch or self.fetch_page
+        self.progress_callback = progress_callback
+        # 段階ごとの処理時間などの計測（metrics.CrawlMetrics。既定は計測しない）
+        self.metrics = metrics
+        # checkpoint（checkpoint.CrawlCheckpoint）を渡すと、フロンティアと処理済みのURLを記録し、
+        # 前回のログがあればその続きからクロールする（最後まで終わったらログを消す）
+        self.checkpoint = checkpoint
+        # deprioritize（URL -> bool）が True を返すURLはほかのURLがなくなるまで後回しにする（frontier.Frontier）
+        self.deprioritize = deprioritize
+        # URLを取り出す順序（scheduler.CRAWL_ORDERS。既定は serial なら 'dfs'、async なら 'bfs'）と、
+        # 'priority' のときのURLパターンごとの重み [(パターン, 重み)]
+        self.order = order or ('dfs' if mode == 'serial' else 'bfs')
+        self.priority_patterns = priority_patterns
+        # budget（scheduler.CrawlBudget）の上限に達したら、新しいページを取得せずにそこまでの結果で終える
+        # stop_reason に使い切った上限の名前、remaining にその時点で残っていたURLの数が入る
+        self.budget = budget
+        self.stop_reason = None
+        self.remaining = 0
+        self.bytes_downloaded = 0
+        self.domain = urlparse(start_url).netloc
+        # url_filter を渡さない場合は exclude_paths / include_only_prefix から作る（複数のクローラーで共有できる）
+        self.url_filter = url_filter or UrlFilter(self.domain, self.exclude_paths, self.include_only_prefix,
+                                                  robots=robots)
+        self.start_key = self.url_filter.normalize(start_url)
+        # listed_urls（サイトマップなどで分かっているURL）は取得せずに訪問済みとして記録する。
+        # それらを含むディレクトリのページも取得しない（リンクを辿るのは一覧にないディレクトリだけ）。
+        # follow_links=False ならどのページも取得しない
+        self.follow_pdf, self.lightweight = crawl_kind(self.handlers)
+        self.listed_urls = [url for url in listed_urls or [] if self.follow_pdf or not is_pdf_url(url)]
+        self.covered_directories = {get_directory(urlparse(url).path) for url in self.listed_urls}
+        self.follow_links = follow_links
+        # 増分クロール: previous_pages（前回の {URL: 本文ハッシュ}）を渡すと、
+        # 前回のURLを先に取得し、新規・変更・削除のあったURLだけをハンドラに渡す
+        self.incremental = previous_pages is not None
+        self.previous_pages = previous_pages or {}
+        self.record_pages = record_pages or self.incremental
+        self.current_pages = {}  # 今回の {URL: 本文ハッシュ}（次回の増分クロール用）
+        self.change_counts = {'new': 0, 'changed': 0, 'unchanged': 0, 'removed': 0}
+        self.seed_urls = [
+            url for url in self.previous_pages
+            if (self.follow_pdf or not is_pdf_url(url)) and self.url_filter.allows(url)
+        ]
+
+    def should_visit(self, url):
+        return self.url_filter.allows(url)
+
+    def should_fetch(self, url):
+        # 一覧で分かっているディレクトリのページ・PDF（軽量取得なら HEAD する）は取得しない（訪問済みとして記録するだけ）
+        normalized_url = self.url_filter.normalize(url)
+        if not self.follow_links:
+            return False
+        if normalized_url != self.start_key and get_directory(urlparse(normalized_url).path) in self.covered_directories:
+            return False
+        return self.lightweight or not is_pdf_url(normalized_url)
+
+    def extract_links(self, page):
+        if getattr(page.response, 'body_skipped', False):
+            return []
+        if self.lightweight:
+            hrefs = page.extract('links', lambda: self.timed('parse', extract_hrefs, response_text(page.response)))
+        else:
+            hrefs = page.extract('links', lambda: [link_tag['href'] for link_tag in page.soup.find_all('a', href=True)])
+        links = []
+        resolve = self.url_filter.resolve
+        for href in hrefs:
+            normalized_url = resolve(page.url, href)
+            if normalized_url is not None and (self.follow_pdf or not is_pdf_url(normalized_url)):
+                links.append(normalized_url)
+        return links
+
+    def fetch_page(self, url):
+        if not self.lightweight:
+            return self.http.get(url)
+        return self.http.head(url) if is_pdf_url(url) else self.http.get_page(url)
+
+    def timed(self, stage, func, *args):
+        with self.metrics.timer(stage):
+            return func(*args)
+
+    def visit(self, normalized_url, response=None, error=None):
+        for handler in self.handlers:
+            handler.on_visit(normalized_url)
+        if response is None and error is None:
+            return
+        info = fetch_info(response, error)
+        self.metrics.record_fetch(info['status'], downloaded_bytes(response), retry_count(response))
+        for handler in self.handlers:
+            handler.on_fetched(normalized_url, info)
+
+    def process(self, url, response):
+        page = Page(url, response, self.http.cache, self.metrics)
+        # ハンドラがsoupを書き換える前にリンクを集めておく
+        links = self.extract_links(page)
+        for handler in self.handlers:
+            handler.on_page(page)
+        return links
+
+    def handle_result(self, url, response=None, error=None):
+        # 取得結果（PDFは response なし）をハンドラに渡し、次に辿るリンクを返す
+        normalized_url = self.url_filter.normalize(url)
+        self.bytes_downloaded += downloaded_bytes(response)
+        if error is not None:
+            print(f"エラー: {url} - {error}")
+            status = getattr(getattr(error, 'response', None), 'status_code', None)
+            # 404/410 以外の一時的なエラーは前回の状態を引き継ぐ（削除扱いにしない）
+            if status not in (404, 410) and normalized_url in self.previous_pages:
+                self.current_pages[normalized_url] = self.previous_pages[normalized_url]
+            if not self.incremental:
+                self.visit(normalized_url, error=error)
+            return []
+
+        if self.record_pages:
+            digest = None
+            if response is not None:
+                digest = response_digest(response)
+            self.current_pages[normalized_url] = digest
+
+        if self.incremental:
+            if normalized_url not in self.previous_pages:
+                change = 'new'
+            elif response is not None and self.previous_pages[normalized_url] != digest:
+                change = 'changed'
+            else:
+                # 変更のないページは書き出さず、リンクだけ辿る（キャッシュ済みなら解析もしない）
+                self.change_counts['unchanged'] += 1
+                return [] if response is None else self.extract_links(Page(url, response, self.http.cache, self.metrics))
+            self.change_counts[change] += 1
+            for handler in self.handlers:
+                handler.on_change(normalized_url, change)
+
+        self.visit(normalized_url, response)
+        return [] if response is None else self.process(url, response)
+
+    def report_removed(self):
+        # 前回あって今回見つからなかった（または 404/410 の）URL
+        for url in self.previous_pages:
+            if url not in self.current_pages:
+                self.change_counts['removed'] += 1
+                for handler in self.handlers:
+                    handler.on_change(url, 'removed')
+
+    def report_progress(self, done, total):
+        self.metrics.page_done()
+        if self.progress_callback:
+            stats = {}
+            for handler in self.handlers:
+                stats.update(handler.progress_stats() or {})
+            if self.metrics.enabled:
+                stats['metrics'] = self.metrics.snapshot(stats)
+            self.progress_callback(done=done, total=total, **stats)
+
+    def make_frontier(self):
+        # 開始URL・前回のURL（増分クロール時）・listed_urls を入れたフロンティア（'dfs' なら開始URLを最後に取り出す）
+        # チェックポイントから再開するときは前回のフロンティアに戻し、処理済みのページ数も返す
+        lifo = self.order == 'dfs'
+        frontier = Frontier(self.order, make_seen_set(self.seen_mode, bloom_error_rate=self.bloom_error_rate),
+                            deprioritize=self.deprioritize, priority_patterns=self.priority_patterns,
+                            track_depth=self.order == 'priority' or self.budget.max_depth is not None)
+        if self.checkpoint is not None and self.checkpoint.resumed:
+            done = self.checkpoint.restore(frontier, self.current_pages)
+            print(f"チェックポイントから再開: 処理済み {done} 件、残り {len(frontier)} 件")
+            return frontier, done
+        seeds = self.seed_urls + self.listed_urls
+        urls = [self.start_url] + (seeds[::-1] if lifo else seeds)
+        for url in urls:
+            self.enqueue(frontier, url, self.url_filter.normalize(url))
+        return frontier, 0
+
+    def enqueue(self, frontier, url, key=None, depth=0):
+        if frontier.add(url, key, depth) and self.checkpoint is not None:
+            self.checkpoint.added(url, key, depth)
+
+    def enqueue_links(self, frontier, links, depth):
+        # depth は links のページの深さ（max_depth を超えるリンクは辿らない）
+        if not self.budget.allows_depth(depth):
+            return
+        for link in links:
+            self.enqueue(frontier, link, depth=depth)
+
+    def out_of_budget(self, pages):
+        # 予算を使い切ったか（pages は処理済み＋取得中のページ数）。使い切ったら stop_reason にその上限の名前を入れる
+        if self.stop_reason is None:
+            self.stop_reason = self.budget.exhausted(pages, self.bytes_downloaded)
+        return self.stop_reason is not None
+
+    def page_done(self, url):
+        # 処理を終えたURLをチェックポイントに記録し、時期が来たらハンドラの結果と一緒に書き出す
+        if self.checkpoint is None:
+            return
+        self.checkpoint.done(url, self.current_pages.get(self.url_filter.normalize(url)))
+        if self.checkpoint.due():
+            self.save_checkpoint()
+
+    def save_checkpoint(self):
+        for handler in self.handlers:
+            handler.checkpoint()
+        self.checkpoint.flush()
+
+    def run(self):
+        completed = False
+        self.budget.start()
+        try:
+            if self.mode == 'serial':
+                self.run_serial()
+            else:
+                asyncio.run(self.run_async())
+            if self.stop_reason is not None:
+                print(f"予算（{self.stop_reason}）に達したため、クロールを終了しました（未取得 {self.remaining} 件）")
+            # 予算で打ち切った場合、取得しなかったページを削除扱いにしない
+            elif self.incremental:
+                self.report_removed()
+            results = [handler.finish() for handler in self.handlers]
+            completed = True
+        finally:
+            if self.owns_http:
+                self.http.close()
+            if self.checkpoint is not None:
+                # 途中で止まった場合は、そこまでの分を書いてから閉じる（次回はその続きから）
+                if not completed:
+                    try:
+                        self.save_checkpoint()
+                    except Exception as e:
+                        print(f"チェックポイントを保存できません: {e}")
+                self.checkpoint.close(remove=completed)
+            close_handlers(self.handlers)
+        return results
+
+    def run_serial(self):
+        # 重複はキューに入れる時点で除く（同じURLがスタックに何度も積まれない）
+        frontier, done = self.make_frontier()
+        throttle = HostThrottle(self.min_delay)
+
+        while frontier:
+            if self.out_of_budget(done):
+                break
+            url, depth = frontier.pop()
+
+            if not self.should_fetch(url):
+                links = self.handle_result(url)
+            else:
+                throttle.wait(url)
+                try:
+                    with self.metrics.timer('fetch'):
+                        response = self.fetch(url)
+                except Exception as e:
+                    links = self.handle_result(url, error=e)
+                else:
+                    links = self.handle_result(url, response)
+            self.enqueue_links(frontier, links, depth + 1)
+            self.page_done(url)
+
+            done += 1
+            self.report_progress(done, done + len(frontier))
+        self.remaining = len(frontier)
+        return done
+
+    async def run_async(self):
+        # 取得は先読みで最大 concurrency 件並列に行い、ページ処理（解析・書き込み・リンク追加）は
+        # キューに入った順に1件ずつ行う。リンクの追加順が通信のタイミングに左右されないため、
+        # 出力順は毎回同じになる（幅優先順）。
+        loop = asyncio.get_running_loop()
+        limiter = AsyncHostLimiter(self.per_host_concurrency, self.min_delay)
+        global_semaphore = asyncio.Semaphore(self.concurrency)
+        window = self.concurrency * 2  # 先読みする件数（メモリ上に保持するレスポンス数の上限）
+
+        async def fetch_one(url):
+            async with global_semaphore:
+                semaphore = await limiter.acquire(url)
+                try:
+                    return await loop.run_in_executor(executor, _safe_fetch, self.fetch, url, self.metrics)
+                finally:
+                    limiter.release(semaphore)
+
+        pending, done = self.make_frontier()
+        inflight = deque()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                while pending or inflight:
+                    # 予算を使い切ったら新しく取得せず、取得中のページだけ処理して終える
+                    while pending and len(inflight) < window and not self.out_of_budget(done + len(inflight)):
+                        url, depth = pending.pop()
+                        task = asyncio.ensure_future(fetch_one(url)) if self.should_fetch(url) else None
+                        inflight.append((url, depth, task))
+                    if not inflight:
+                        break
+
+                    url, depth, task = inflight.popleft()
+                    if task is None:
+                        links = self.handle_result(url)
+                    else:
+                        response, error = await task
+                        links = self.handle_result(url, response, error)
+                    self.enqueue_links(pending, links, depth + 1)
+                    self.page_done(url)
+
+                    done += 1
+                    self.report_progress(done, done + len(pending) + len(inflight))
+            finally:
+                # ページ処理で例外が起きた場合も、先読み中の取得を止めてから終了する
+                for _, _, task in inflight:
+                    if task is not None:
+                        task.cancel()
+        self.remaining = len(pending)
+        return done
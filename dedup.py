@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import re
+from urllib.parse import urlparse
+
+# === 重複・ほぼ重複ページの検出 ===
+# CMS ではタグ一覧・ページ送り・印刷用・セッションIDを含むパスなど、同じ本文が多くのURLで公開される。
+# 抽出した本文（extract_page_content の blocks。タイトル・ディスクリプションは含めない）から
+# - 完全一致 : 空白を詰めた本文の SHA-1
+# - ほぼ一致 : 3語（日本語などは3文字）の shingle から作った 64bit の SimHash。ハミング距離 distance 以下なら重複
+#              （既定の 6 で、数百語のページなら数%の違い（タグ・日付・パンくずの1行など）まで重複とみなす）
+# を求め、先に書いたページと同じならそのページは書き込まない。
+# ほぼ一致は、共通のテンプレート（フッターなど）が長く固有の本文が短いページも重複とみなしてしまうので、選んだときだけ使う。
+# SimHash は 64bit を distance+1 個のブロックに分けて索引する（距離 distance 以下なら、どれか1ブロックは必ず一致する）
+# ので、ページ数が増えても比較するのは同じブロックを持つ候補だけ
+
+DEDUP_MODES = ('off', 'exact', 'near')
+DEFAULT_DISTANCE = 6
+SHINGLE_SIZE = 3
+MIN_SHINGLES = 20 # これより短い本文は完全一致だけを見る（SimHash が安定しないため）
+
+# URLパターンごとの重複率がこれを超えたら、そのパターンのURLは後回しにする（deprioritized）
+NOISY_MIN_PAGES = 20
+NOISY_RATIO = 0.8
+
+MAX_EXAMPLES = 100
+
+_TOKEN = re.compile(r'[a-z0-9]+|[^\W\da-z_]')
+# ビットごとの変換表（bit 番目が立っているバイトを 1、そうでないバイトを 0 にする）
+_BIT_TABLES = [bytes(byte >> bit & 1 for byte in range(256)) for bit in range(8)]
+
+
+def page_text(content):
+    return '\n'.join(text for _, text, _ in content['blocks'])
+
+
+def exact_hash(text):
+    return hashlib.sha1(' '.join(text.split()).encode('utf-8')).hexdigest()
+
+
+def simhash(text):
+    # shingle ごとの 64bit ハッシュの各ビットを多数決した値（shingle が少なすぎれば None）
+    tokens = _TOKEN.findall(text.lower())
+    shingles = set(map(' '.join, zip(*(tokens[i:] for i in range(SHINGLE_SIZE)))))
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    data = b''.join(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest() for shingle in shingles)
+    # ビットごとに数える：バイト位置ごとに取り出して変換表で 0/1 にし、1 の数を数える（どちらも C で処理される）
+    half = len(shingles) / 2
+    value = 0
+    for position in range(8):
+        column = data[position::8]
+        for bit, table in enumerate(_BIT_TABLES):
+            if column.translate(table).count(1) > half:
+                value |= 1 << (position * 8 + bit)
+    return value
+
+
+def url_pattern(url):
+    # 最初のディレクトリだけを残したパターン（例: /tag/foo/page/2 → /tag/*）
+    segments = [segment for segment in urlparse(url).path.split('/') if segment]
+    if not segments:
+        return '/'
+    return '/' + segments[0] + ('/*' if len(segments) > 1 else '')
+
+
+class DuplicateIndex:
+    # mode: 'exact'（完全一致のみ）/ 'near'（ほぼ一致も）
+    # path を指定すると、checkpoint() ごとに判定したページ（登録したページとスキップしたページ）を追記し、
+    # resume=True なら読み戻す（crawler のチェックポイント用。スキップの件数・URLパターンごとの集計も元に戻る）
+    #   登録したページ   : [URL, 本文のハッシュ, SimHash]
+    #   スキップしたページ: {"url": URL, "duplicate_of": 先に書いたページのURL, "kind": 'exact' / 'near'}
+    def __init__(self, mode='exact', distance=DEFAULT_DISTANCE, path=None, resume=False):
+        if mode not in DEDUP_MODES or mode == 'off':
+            raise ValueError(f"不明な重複判定の方式: {mode}")
+        self.mode = mode
+        self.distance = distance
+        self.path = path
+        self.exact = {}  # {本文のハッシュ: 最初のURL}
+        # SimHash のブロック（開始ビット, ビット数）と、ブロックごとの {ブロックの値: [(SimHash, URL)]}
+        width = 64 // (distance + 1)
+        self.blocks = [(i * width, 64 - i * width if i == distance else width) for i in range(distance + 1)]
+        self.buckets = [{} for _ in self.blocks]
+        self.unsaved = []
+        self.checked = 0
+        self.skipped = {'exact': 0, 'near': 0}
+        self.examples = []
+        self.patterns = {}  # {URLパターン: [ページ数, 重複数]}
+        if path and resume and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        continue  # 書き込み途中で止まった行
+                    entry = json.loads(line)
+                    if isinstance(entry, dict):
+                        self.record(entry['url'], entry['duplicate_of'], entry['kind'])
+                    else:
+                        url, digest, fingerprint = entry
+                        self.record(url)
+                        self.add(url, digest, fingerprint)
+        elif path and os.path.exists(path):
+            os.remove(path)
+
+    def add(self, url, digest, fingerprint):
+        self.exact.setdefault(digest, url)
+        if fingerprint is not None:
+            for (start, bits), bucket in zip(self.blocks, self.buckets):
+                bucket.setdefault(fingerprint >> start & ((1 << bits) - 1), []).append((fingerprint, url))
+
+    def find_near(self, fingerprint):
+        for (start, bits), bucket in zip(self.blocks, self.buckets):
+            for candidate, url in bucket.get(fingerprint >> start & ((1 << bits) - 1), ()):
+                if (candidate ^ fingerprint).bit_count() <= self.distance:
+                    return url
+        return None
+
+    def record(self, url, duplicate_of=None, kind=None):
+        # 判定したページを集計する（duplicate_of があればスキップしたページ）
+        self.checked += 1
+        counts = self.patterns.setdefault(url_pattern(url), [0, 0])
+        counts[0] += 1
+        if duplicate_of is not None:
+            counts[1] += 1
+            self.skipped[kind] += 1
+            if len(self.examples) < MAX_EXAMPLES:
+                self.examples.append({'url': url, 'duplicate_of': duplicate_of, 'kind': kind})
+
+    def check(self, url, content):
+        # 先に登録したページと重複していればそのURLを返し、そうでなければ登録して None を返す
+        text = page_text(content)
+        if not text.strip():
+            return None  # 本文のないページ（画像だけなど）は比べない
+        digest = exact_hash(text)
+        duplicate_of, kind = self.exact.get(digest), 'exact'
+        fingerprint = simhash(text) if self.mode == 'near' else None
+        if duplicate_of is None and fingerprint is not None:
+            duplicate_of, kind = self.find_near(fingerprint), 'near'
+        self.record(url, duplicate_of, kind)
+        if duplicate_of is not None:
+            self.unsaved.append({'url': url, 'duplicate_of': duplicate_of, 'kind': kind})
+            return duplicate_of
+        self.add(url, digest, fingerprint)
+        self.unsaved.append((url, digest, fingerprint))
+        return None
+
+    def deprioritized_pattern(self, pattern):
+        counts = self.patterns.get(pattern)
+        return counts is not None and counts[0] >= NOISY_MIN_PAGES and counts[1] >= counts[0] * NOISY_RATIO
+
+    def deprioritized(self, url):
+        # 重複ばかり出ているURLパターンのURLか（crawler の Frontier で後回しにする）
+        return self.deprioritized_pattern(url_pattern(url))
+
+    def checkpoint(self):
+        if self.path and self.unsaved:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(entry) + '\n' for entry in self.unsaved))
+        self.unsaved = []
+
+    def close(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def summary(self):
+        # 進捗表示用の件数だけ
+        return {
+            'checked': self.checked,
+            'skipped': self.skipped['exact'] + self.skipped['near'],
+            'exact': self.skipped['exact'],
+            'near': self.skipped['near'],
+        }
+
+    def stats(self):
+        # レポート用（重複ばかりのURLパターンと、スキップしたページの例を含む）
+        stats = {'mode': self.mode, **self.summary()}
+        stats['noisy_patterns'] = [pattern for pattern in self.patterns if self.deprioritized_pattern(pattern)]
+        stats['examples'] = self.examples
+        return stats
@@ -0,0 +1,166 @@
+import re
+import zlib
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin, urlparse
+
+# === robots.txt と sitemap.xml によるURLの収集 ===
+# discovery（URL一覧の作り方）
+#   'crawl'        : 従来どおり全ページを取得してリンクを辿る
+#   'sitemap'      : robots.txt の Sitemap（なければ /sitemap.xml）に載っているURLは取得せずに一覧に入れ、
+#                    サイトマップに1件もないディレクトリだけリンクを辿って取得する
+#   'sitemap_only' : サイトマップに載っているURLだけを一覧にする（ページは1件も取得しない）
+# 'sitemap' / 'sitemap_only' では robots.txt の Disallow / Allow（* と $ に対応）と Crawl-delay に従う
+# サイトマップはインデックス・gzip にも対応し、XML全体を読み込まずに少しずつ解析する
+DISCOVERY_MODES = ('crawl', 'sitemap', 'sitemap_only')
+
+MAX_SITEMAPS = 1000          # 読み込むサイトマップの数の上限（インデックスの入れ子を含む）
+SITEMAP_CHUNK_SIZE = 64 * 1024
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _rule_pattern(path):
+    # robots.txt のパス（* は任意の文字列、末尾の $ は終端）を正規表現にする
+    anchored = path.endswith('$')
+    if anchored:
+        path = path[:-1]
+    pattern = '.*'.join(re.escape(part) for part in path.split('*'))
+    return re.compile(pattern + (r'\Z' if anchored else ''))
+
+
+class RobotsRules:
+    def __init__(self, rules=None, crawl_delay=None, sitemaps=None):
+        # rules: [(パスの長さ, 許可なら True, 正規表現), ...]
+        self.rules = rules or []
+        self.crawl_delay = crawl_delay
+        self.sitemaps = sitemaps or []
+
+    def allowed(self, path):
+        # 一致したルールのうちパスが最も長いものに従う（同じ長さなら Allow を優先）
+        best = None
+        for length, allow, pattern in self.rules:
+            if pattern.match(path) and (best is None or (length, allow) > best):
+                best = (length, allow)
+        return best is None or best[1]
+
+
+def parse_robots(text, user_agent='*'):
+    # user_agent に当てはまるグループ（なければ *）のルールを返す
+    agent = user_agent.split('/')[0].lower()
+    groups = {}       # User-agent -> (ルール, Crawl-delay)
+    current = []      # 今のグループの User-agent
+    in_rules = False  # User-agent の後にルールの行が出てきたか（次の User-agent で新しいグループ）
+    sitemaps = []
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        field, value = (part.strip() for part in line.split(':', 1))
+        field = field.lower()
+        if field == 'sitemap':
+            if value:
+                sitemaps.append(value)
+        elif field == 'user-agent':
+            if in_rules:
+                current, in_rules = [], False
+            current.append(value.lower())
+            groups.setdefault(value.lower(), ([], [None]))
+        elif field in ('allow', 'disallow', 'crawl-delay') and current:
+            in_rules = True
+            for name in current:
+                rules, delay = groups[name]
+                if field == 'crawl-delay':
+                    try:
+                        delay[0] = float(value)
+                    except ValueError:
+                        pass
+                elif value:
+                    rules.append((len(value), field == 'allow', _rule_pattern(value)))
+    # 名前が User-agent に含まれるグループのうち最も長いもの、なければ *
+    names = [name for name in groups if name != '*' and name in agent]
+    name = max(names, key=len) if names else '*'
+    rules, delay = groups.get(name, ([], [None]))
+    return RobotsRules(rules, delay[0], sitemaps)
+
+
+def fetch_robots(http, start_url):
+    # robots.txt を取得する。取得できなければ制限なしとして扱う
+    robots_url = urljoin(start_url, '/robots.txt')
+    try:
+        response = http.get(robots_url)
+    except Exception as e:
+        print(f"robots.txt を取得できないため制限なしとして扱います: {robots_url} - {e}")
+        return RobotsRules()
+    return parse_robots(response.text, http.session.headers.get('User-Agent', '*'))
+
+
+def _iter_sitemap_entries(chunks):
+    # サイトマップのXMLを少しずつ解析し、(種類, URL) を返す。種類はインデックスなら 'sitemap'、それ以外は 'url'
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    decompress = None
+    root = None
+    first = True
+    for chunk in chunks:
+        if first:
+            first = False
+            if chunk.startswith(GZIP_MAGIC):
+                decompress = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        parser.feed(decompress.decompress(chunk) if decompress else chunk)
+        for event, elem in parser.read_events():
+            tag = elem.tag.rsplit('}', 1)[-1]
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+            if tag == 'loc' and elem.text:
+                yield ('sitemap' if root.tag.endswith('sitemapindex') else 'url'), elem.text.strip()
+            elif tag in ('url', 'sitemap'):
+                root.clear()  # 読み終えた要素を捨ててメモリを増やさない
+    parser.close()
+
+
+def iter_sitemap_urls(http, sitemap_urls, max_sitemaps=MAX_SITEMAPS, stats=None):
+    # サイトマップ（インデックスなら中のサイトマップも）に載っているページのURLを順に返す
+    # stats（辞書）を渡すと読み込んだサイトマップの数などを書き込む
+    stats = stats if stats is not None else {}
+    stats.setdefault('sitemaps', 0)
+    stats.setdefault('sitemap_errors', 0)
+    pending = list(sitemap_urls)
+    seen = set(pending)
+    while pending and stats['sitemaps'] < max_sitemaps:
+        sitemap_url = pending.pop(0)
+        try:
+            with http.get(sitemap_url, stream=True) as response:
+                stats['sitemaps'] += 1
+                for kind, url in _iter_sitemap_entries(response.iter_content(SITEMAP_CHUNK_SIZE)):
+                    if kind == 'url':
+                        yield url
+                    elif url not in seen:
+                        seen.add(url)
+                        pending.append(url)
+        except Exception as e:
+            stats['sitemap_errors'] += 1
+            print(f"サイトマップを読み込めません: {sitemap_url} - {e}")
+    if pending:
+        print(f"サイトマップが多すぎるため {len(pending)} 件は読み込みません（上限 {max_sitemaps}）")
+
+
+def discover_sitemap_urls(http, start_url, robots, url_filter, report=None):
+    # サイトマップのURLのうちクロール対象（同じドメイン・除外ルール・robots.txt）のものを正規化して返す
+    origin = f'{urlparse(start_url).scheme}://{urlparse(start_url).netloc}'
+    sitemaps = robots.sitemaps or [origin + '/sitemap.xml']
+    stats = {}
+    urls = []
+    seen = set()
+    found = 0
+    for url in iter_sitemap_urls(http, sitemaps, stats=stats):
+        found += 1
+        if not url_filter.allows(url):
+            continue
+        url = url_filter.normalize(url)
+        if url not in seen:
+            seen.add(url)
+            urls.append(url)
+    print(f"サイトマップ: {stats['sitemaps']} 件から {found} URL（対象 {len(urls)} URL）")
+    if report is not None:
+        report['discovery'] = dict(stats, sitemap_urls=found, seed_urls=len(urls), crawl_delay=robots.crawl_delay)
+    return urls
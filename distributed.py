@@ -0,0 +1,323 @@
+import json
+import time
+import uuid
+from urllib.parse import urlparse
+
+from redis.exceptions import WatchError
+
+from crawler import Crawler, CrawlHandler, close_handlers, is_pdf_url, DEFAULT_MIN_DELAY
+from extract import PAGE_EXTRACT_KIND, extract_page_content
+from url_filter import UrlFilter
+
+# === 複数ワーカーでの分散クロール ===
+# 1つのサイトのクロールを複数の Celery ワーカーで分担する。未訪問URL（フロンティア）と訪問済みURLは
+# Redis（Celery のブローカーと同じもの）に置き、各ワーカーはURLをまとめて取り出して取得・解析する。
+# 取り出したURLには期限（リース。lease_ttl 秒、処理が進むたびに延長）を付け、期限までに完了しなければ
+# （ワーカーが落ちたら）次に取り出すワーカーがキューに戻す。
+# 同じホストへのリクエスト間隔（min_delay）は全ワーカーで共有する（ワーカー数によらず1ホストあたり min_delay 秒に1回）。
+# ページごとの抽出結果も Redis に保存し、最後に1つのワーカーが（深さ, URL）の順に並べて Word/CSV にまとめる。
+#
+# Redis のキー（crawl:<ジョブID>: で始まる。ジョブ終了後 DEFAULT_JOB_TTL 秒で消える）
+#   config          : クロール設定（開始URL・除外パスなど）の JSON
+#   seen            : 見つかったURL（SET。キューに入れる前にここで重複を除く）
+#   queue           : 未取得のURL（ZSET。スコアは開始URLからの深さ。浅いものから取り出す）
+#   leases          : 処理中のURL（ZSET。メンバーは "<リースID>\t<深さ>\t<URL>"、スコアはリースの期限）
+#   pending         : キューにあるURLと処理中のURLの数。0 になったらクロール終了
+#   results         : URL -> ページごとの結果の JSON（HASH）
+#   order           : 結果のあるURL（ZSET。スコアは深さ。同じ深さはURL順に並ぶので、この順にまとめる）
+#   stats           : 処理済みページ数・ワーカー数など（HASH）
+#   throttle:<ホスト> : そのホストに次にリクエストしてよい時刻（Redis サーバーの時計。短い期限付き）
+# redis には redis.Redis（テスト時は fakeredis.FakeRedis）を decode_responses=False（既定）のまま渡す
+
+DEFAULT_JOB_TTL = 24 * 60 * 60
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_IDLE_TIMEOUT = 600  # 他のワーカーの処理待ちがこれ以上続いたら終了する（落ちたワーカーがいる場合）
+DEFAULT_LEASE_TTL = 300     # 取り出したURLをこの秒数のうちに完了しなければキューに戻す
+POLL_INTERVAL = 0.2
+RESULTS_CHUNK = 500         # まとめるときに一度に読む結果の数
+KEYS = ('config', 'seen', 'queue', 'leases', 'pending', 'results', 'order', 'stats')
+
+
+class RedisFrontier:
+    def __init__(self, redis, job_id, ttl=DEFAULT_JOB_TTL, lease_ttl=DEFAULT_LEASE_TTL):
+        self.redis = redis
+        self.job_id = job_id
+        self.ttl = ttl
+        self.lease_ttl = lease_ttl
+
+    def key(self, name):
+        return f'crawl:{self.job_id}:{name}'
+
+    def start(self, start_url, exclude_paths=None, include_only_prefix=None, follow_pdf=False, keep_query_params=None):
+        config = {
+            'start_url': start_url,
+            'exclude_paths': exclude_paths or [],
+            'include_only_prefix': include_only_prefix or [],
+            'follow_pdf': follow_pdf,
+            'keep_query_params': keep_query_params or [],
+        }
+        self.redis.set(self.key('config'), json.dumps(config), ex=self.ttl)
+        self.add([make_url_filter(config).normalize(start_url)], 0)
+
+    def config(self):
+        data = self.redis.get(self.key('config'))
+        return json.loads(data) if data else None
+
+    def add(self, urls, depth):
+        # 初めて見つかったURLだけをキューに入れる（pending は親URLの complete より先に増やす）
+        if not urls:
+            return
+        pipe = self.redis.pipeline()
+        for url in urls:
+            pipe.sadd(self.key('seen'), url)
+        new_urls = [url for url, added in zip(urls, pipe.execute()) if added]
+        pipe = self.redis.pipeline()
+        if new_urls:
+            pipe.zadd(self.key('queue'), {url: depth for url in new_urls})
+            pipe.incrby(self.key('pending'), len(new_urls))
+        for name in ('seen', 'queue', 'pending'):
+            pipe.expire(self.key(name), self.ttl)
+        pipe.execute()
+
+    def claim(self, count):
+        # 浅いURLから count 件取り出してリースを付ける [(リース, URL, 深さ), ...]
+        # キューからの取り出しとリースの追加は1つのトランザクションで行う（間でワーカーが落ちてもURLを失わない）
+        self.requeue_expired()
+        lease_id = uuid.uuid4().hex
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.key('queue'))
+                    entries = pipe.zrange(self.key('queue'), 0, count - 1, withscores=True)
+                    if not entries:
+                        return []
+                    claimed = [(f'{lease_id}\t{int(depth)}\t{url.decode("utf-8")}', url.decode('utf-8'), int(depth))
+                               for url, depth in entries]
+                    pipe.multi()
+                    pipe.zrem(self.key('queue'), *[url for url, _ in entries])
+                    pipe.zadd(self.key('leases'), {lease: time.time() + self.lease_ttl for lease, _, _ in claimed})
+                    pipe.expire(self.key('leases'), self.ttl)
+                    pipe.execute()
+                    return claimed
+                except WatchError:
+                    continue  # 他のワーカーが先に取り出した
+
+    def extend(self, leases):
+        # 処理中のURLのリースを延長する（期限切れでキューに戻されたものは戻さない）
+        if leases:
+            self.redis.zadd(self.key('leases'), {lease: time.time() + self.lease_ttl for lease in leases}, xx=True)
+
+    def requeue_expired(self):
+        # 期限の切れたリース（落ちたワーカーが処理していたURL）をキューに戻す。pending は処理中の分として数えたまま
+        if not self.redis.zcount(self.key('leases'), '-inf', time.time()):
+            return
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.key('leases'))
+                    expired = pipe.zrangebyscore(self.key('leases'), '-inf', time.time())
+                    if not expired:
+                        return
+                    pipe.multi()
+                    pipe.zrem(self.key('leases'), *expired)
+                    queued = {}
+                    for lease in expired:
+                        _, depth, url = lease.decode('utf-8').split('\t', 2)
+                        queued[url] = int(depth)
+                    pipe.zadd(self.key('queue'), queued)
+                    pipe.execute()
+                    print(f"分散クロール: 期限の切れた {len(expired)} 件のURLをキューに戻しました")
+                    return
+                except WatchError:
+                    continue  # 他のワーカーが完了した・戻した
+
+    def complete(self, lease, url, depth, result):
+        # リースがまだ有効なときだけ処理済みとして数える（期限切れでキューに戻されていれば、戻した分が後で数える）
+        result = dict(result, depth=depth)
+        pipe = self.redis.pipeline()
+        pipe.hset(self.key('results'), url, json.dumps(result, ensure_ascii=False))
+        pipe.zadd(self.key('order'), {url: depth})
+        pipe.zrem(self.key('leases'), lease)
+        for name in ('results', 'order'):
+            pipe.expire(self.key(name), self.ttl)
+        if not pipe.execute()[2]:
+            return
+        pipe = self.redis.pipeline()
+        pipe.hincrby(self.key('stats'), 'done', 1)
+        pipe.decr(self.key('pending'))
+        pipe.expire(self.key('stats'), self.ttl)
+        pipe.execute()
+
+    def finished(self):
+        return int(self.redis.get(self.key('pending')) or 0) <= 0
+
+    def worker_started(self):
+        self.redis.hincrby(self.key('stats'), 'workers', 1)
+
+    def worker_stopped(self):
+        self.redis.hincrby(self.key('stats'), 'workers', -1)
+
+    def progress(self):
+        # 全ワーカー合計の進捗（ジョブがなければ None）
+        if not self.redis.exists(self.key('config')):
+            return None
+        stats = {name.decode('utf-8'): int(value) for name, value in self.redis.hgetall(self.key('stats')).items()}
+        done = stats.get('done', 0)
+        pending = max(int(self.redis.get(self.key('pending')) or 0), 0)
+        return {'done': done, 'total': done + pending, 'workers': stats.get('workers', 0)}
+
+    def results(self):
+        # ページごとの結果を（深さ, URL）の順に返す（ワーカーの処理順によらず毎回同じ順になる）
+        # 全部を一度に読み込まないよう、order から RESULTS_CHUNK 件ずつURLを取り出して読む
+        start = 0
+        while True:
+            urls = self.redis.zrange(self.key('order'), start, start + RESULTS_CHUNK - 1)
+            if not urls:
+                return
+            for data in self.redis.hmget(self.key('results'), urls):
+                if data is not None:
+                    yield json.loads(data)
+            start += len(urls)
+
+    def delete(self):
+        self.redis.delete(*[self.key(name) for name in KEYS])
+
+
+class RedisHostThrottle:
+    # 同じジョブの全ワーカーで共有するホストごとのリクエスト間隔（crawler.HostThrottle の分散版）
+    # 次にリクエストしてよい時刻をトランザクションで予約する。時刻はワーカー間の時計のずれを避けるため Redis サーバーの時計
+    def __init__(self, redis, job_id, min_delay):
+        self.redis = redis
+        self.job_id = job_id
+        self.min_delay = min_delay
+
+    def wait(self, url):
+        if self.min_delay <= 0:
+            return
+        key = f'crawl:{self.job_id}:throttle:{urlparse(url).netloc}'
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    seconds, microseconds = pipe.time()
+                    now = seconds + microseconds / 1e6
+                    reserved = pipe.get(key)
+                    start = max(now, float(reserved) + self.min_delay) if reserved else now
+                    pipe.multi()
+                    pipe.set(key, repr(start), px=int((start - now + self.min_delay) * 1000) + 1000)
+                    pipe.execute()
+                    break
+                except WatchError:
+                    continue  # 他のワーカーが先に予約した
+        if start > now:
+            time.sleep(start - now)
+
+
+def make_url_filter(config):
+    # ジョブの設定からリンクの判定ルールを作る（1プロセスの全ワーカーで共有できる）
+    return UrlFilter(urlparse(config['start_url']).netloc, config['exclude_paths'], config['include_only_prefix'],
+                     config.get('keep_query_params'))
+
+
+class PageCollector(CrawlHandler):
+    # 1ページ分の結果（URLと本文の抽出結果）を記録する
+    def __init__(self, follow_pdf=False):
+        self.wants_pdf_urls = follow_pdf
+        self.result = None
+
+    def on_visit(self, url):
+        self.result = {'url': url}
+
+    def on_fetched(self, url, info):
+        self.result['fetched'] = info
+
+    def on_page(self, page):
+        self.result['content'] = page.extract(PAGE_EXTRACT_KIND, lambda: extract_page_content(page.soup))
+
+
+class StoredPage:
+    # 保存済みの抽出結果からハンドラに渡すページ（本文の抽出結果だけを持つ）
+    def __init__(self, url, content):
+        self.url = url
+        self.content = content
+
+    def extract(self, kind, extract):
+        return self.content if kind == PAGE_EXTRACT_KIND else extract()
+
+
+def process_url(crawler, throttle, url):
+    # 1件取得してハンドラに渡し、次に辿るリンクを返す（PDFは取得しない）
+    if is_pdf_url(url):
+        return crawler.handle_result(url)
+    throttle.wait(url)
+    try:
+        response = crawler.fetch(url)
+    except Exception as e:
+        return crawler.handle_result(url, error=e)
+    return crawler.handle_result(url, response)
+
+
+def run_worker(redis, job_id, http, batch_size=DEFAULT_BATCH_SIZE, min_delay=DEFAULT_MIN_DELAY,
+               idle_timeout=DEFAULT_IDLE_TIMEOUT, url_filter=None, lease_ttl=DEFAULT_LEASE_TTL):
+    # フロンティアが空になり、どのワーカーも処理中でなくなるまでURLを取り出して処理する
+    # 処理したページ数を返す（url_filter を渡さなければジョブの設定から作る）
+    frontier = RedisFrontier(redis, job_id, lease_ttl=lease_ttl)
+    config = frontier.config()
+    if config is None:
+        raise ValueError(f"分散クロールのジョブが見つかりません: {job_id}")
+    collector = PageCollector(config['follow_pdf'])
+    crawler = Crawler(config['start_url'], [collector], exclude_paths=config['exclude_paths'],
+                      include_only_prefix=config['include_only_prefix'], http=http,
+                      url_filter=url_filter or make_url_filter(config))
+    throttle = RedisHostThrottle(redis, job_id, min_delay)
+    done = 0
+    idle_since = None
+    frontier.worker_started()
+    try:
+        while True:
+            batch = frontier.claim(batch_size)
+            if not batch:
+                if frontier.finished():
+                    break
+                idle_since = idle_since or time.monotonic()
+                if time.monotonic() - idle_since > idle_timeout:
+                    print(f"分散クロール: {idle_timeout}秒間処理待ちが続いたため終了します")
+                    break
+                time.sleep(POLL_INTERVAL)
+                continue
+            idle_since = None
+            for i, (lease, url, depth) in enumerate(batch):
+                collector.result = None
+                try:
+                    links = process_url(crawler, throttle, url)
+                except Exception as e:
+                    # 1ページの失敗で他のワーカーを待たせないよう、処理済みとして先に進む
+                    print(f"エラー: {url} - {e}")
+                    links = []
+                frontier.add(links, depth + 1)
+                frontier.complete(lease, url, depth, collector.result or {'url': url})
+                frontier.extend([lease for lease, _, _ in batch[i + 1:]])
+                done += 1
+    finally:
+        frontier.worker_stopped()
+    return done
+
+
+def reduce_results(redis, job_id, handlers):
+    # 全ワーカーの結果を（深さ, URL）の順にハンドラへ渡し、ハンドラごとの結果をリストで返す
+    frontier = RedisFrontier(redis, job_id)
+    try:
+        for result in frontier.results():
+            url = result['url']
+            for handler in handlers:
+                handler.on_visit(url)
+            if 'fetched' in result:
+                for handler in handlers:
+                    handler.on_fetched(url, result['fetched'])
+            if 'content' in result:
+                page = StoredPage(url, result['content'])
+                for handler in handlers:
+                    handler.on_page(page)
+        return [handler.finish() for handler in handlers]
+    finally:
+        close_handlers(handlers)
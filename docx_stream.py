@@ -0,0 +1,128 @@
+import os
+import re
+import shutil
+import zipfile
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from docx import Document
+
+# === Word文書の逐次書き出し ===
+# python-docx の Document は全ページ分のXMLをメモリに持ち、最後に save() するまで何も残らない。
+# ここでは段落のXMLをページごとに一時ファイル（<出力先>.parts/body.xml）へ追記し、
+# save() のときに python-docx の既定テンプレートと組み合わせて .docx（zip）を作る。
+# - メモリ使用量はページ数に関係なくほぼ一定
+# - ページごとに commit() した位置を pages.log に記録するので、途中で落ちても resume=True で続きから書ける
+# 書き出す段落は python-docx の add_heading / add_paragraph / add_page_break と同じ構造にする
+
+BODY_FILE = 'body.xml'
+LOG_FILE = 'pages.log'
+
+_TEXT_SPLIT = re.compile(r'(\t|\r|\n)')
+
+
+def _run_xml(text):
+    # python-docx の Run.text と同じく、タブは <w:tab/>、改行は <w:br/> にする
+    parts = []
+    for piece in _TEXT_SPLIT.split(text):
+        if piece == '\t':
+            parts.append('<w:tab/>')
+        elif piece in ('\r', '\n'):
+            parts.append('<w:br/>')
+        elif piece:
+            parts.append(f'<w:t xml:space="preserve">{escape(piece)}</w:t>')
+    return f'<w:r>{"".join(parts)}</w:r>'
+
+
+class StreamingDocx:
+    def __init__(self, output_file, resume=False):
+        self.output_file = output_file
+        self.parts_dir = output_file + '.parts'
+        self.written_keys = set()  # commit 済みのページ（resume 時に書き込みを省略するため）
+        os.makedirs(self.parts_dir, exist_ok=True)
+        body_path = os.path.join(self.parts_dir, BODY_FILE)
+        log_path = os.path.join(self.parts_dir, LOG_FILE)
+
+        committed = 0
+        if resume and os.path.exists(log_path):
+            with open(log_path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break  # 書き込み途中の行
+                    offset, key = line.rstrip('\n').split('\t', 1)
+                    committed = int(offset)
+                    self.written_keys.add(key)
+        else:
+            for path in (body_path, log_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        # 最後に commit した位置より後ろ（書きかけのページ）は捨てる
+        # 書き込みは commit 時にページ単位でまとめて行う（未確定の内容はディスクに出さない）
+        self.body = open(body_path, 'ab', buffering=0)
+        self.body.truncate(committed)
+        self.log = open(log_path, 'a', encoding='utf-8')
+        self.pending = []
+
+        template = Document()
+        self.style_ids = {}
+        for name in ['Title', 'List Bullet'] + [f'Heading {level}' for level in range(1, 10)]:
+            self.style_ids[name] = template.styles[name].style_id
+        self.template = BytesIO()
+        template.save(self.template)
+
+    def _write(self, xml):
+        self.pending.append(xml)
+
+    def _flush(self):
+        if self.pending:
+            self.body.write(''.join(self.pending).encode('utf-8'))
+            self.pending = []
+
+    def add_paragraph(self, text='', style=None):
+        ppr = ''
+        if style:
+            ppr = f'<w:pPr><w:pStyle w:val="{self.style_ids[style]}"/></w:pPr>'
+        run = _run_xml(text) if text else ''
+        self._write(f'<w:p>{ppr}{run}</w:p>')
+
+    def add_heading(self, text='', level=1):
+        self.add_paragraph(text, 'Title' if level == 0 else f'Heading {level}')
+
+    def add_page_break(self):
+        self._write('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+
+    def commit(self, key):
+        # ここまでの内容を1ページ分として確定させる
+        self._flush()
+        self.log.write(f'{self.body.tell()}\t{key}\n')
+        self.log.flush()
+        self.written_keys.add(key)
+
+    def save(self):
+        self._flush()
+        self.body.close()
+        self.log.close()
+        tmp_path = self.output_file + '.tmp'
+        with zipfile.ZipFile(self.template) as source, \
+                zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as target:
+            for item in source.infolist():
+                if item.filename != 'word/document.xml':
+                    target.writestr(item, source.read(item.filename))
+                    continue
+                # テンプレートの <w:sectPr> の直前に本文を流し込む
+                document_xml = source.read(item.filename)
+                split_at = document_xml.rindex(b'<w:sectPr')
+                with target.open(item.filename, 'w', force_zip64=True) as dst:
+                    dst.write(document_xml[:split_at])
+                    with open(os.path.join(self.parts_dir, BODY_FILE), 'rb') as body:
+                        shutil.copyfileobj(body, dst, 1024 * 1024)
+                    dst.write(document_xml[split_at:])
+        os.replace(tmp_path, self.output_file)
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return self.output_file
+
+    def close(self):
+        # save せずに閉じる（commit 済みの本文とログは resume 用に残す）
+        self.body.close()
+        self.log.close()
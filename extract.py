@@ -0,0 +1,192 @@
+import os
+import re
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup, Comment, NavigableString, Tag
+from bs4.element import PreformattedString
+
+from metrics import NULL_METRICS
+
+# === HTML本文の抽出 ===
+# 1. パーサーは lxml が入っていれば lxml（html.parser より数倍速い）、なければ html.parser
+# 2. ヘッダー・ナビ・スクリプト等の除去は、あらかじめまとめた判定条件で木を1回だけ走査して行う
+# 3. 本文の走査では見出し・リストは get_text した時点でその配下を読み終えたものとし、
+#    配下の文字列を段落として重ねて出力しない（部分木の再走査もしない）
+
+try:
+    from lxml import etree
+    DEFAULT_PARSER = 'lxml'
+except ImportError:
+    etree = None
+    DEFAULT_PARSER = 'html.parser'
+
+# SCRAPE_HTML_PARSER で明示的に指定することもできる（'lxml' / 'html.parser' / 'html5lib'）
+HTML_PARSER = os.environ.get('SCRAPE_HTML_PARSER', DEFAULT_PARSER)
+
+# --- 除去する要素 ---
+REMOVE_TAGS = frozenset(['header', 'nav', 'meta', 'script', 'style', 'noscript', 'iframe', 'link', 'svg'])
+REMOVE_IDS = frozenset([
+    'header', 'site-header', 'main-header', 'global-header',
+    'header-nav', 'header-menu', 'header-wrapper',
+    'global-nav', 'gnav', 'footer',
+])
+REMOVE_CLASSES = frozenset([
+    'header', 'site-header', 'main-header', 'global-header',
+    'header-nav', 'header-menu', 'header-wrapper',
+    'global-nav', 'menu', 'nav',
+])
+REMOVE_ROLES = frozenset(['banner'])
+
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+
+
+# --- クリーンアップ＆補助関数 ---
+def sanitize_text(text):
+    return re.sub(r'[\\/*?:"<>|]', "_", text)
+
+
+# XML 1.0 で使えない文字（制御文字・サロゲート・U+FFFE/U+FFFF）
+# utf-8 に変換できない文字はサロゲートだけなので、これを消せば utf-8 としても安全
+_INVALID_XML_CHARS = re.compile('[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]')
+
+
+def clean_text(text):
+    if not text:
+        return ''
+    return _INVALID_XML_CHARS.sub('', text)
+
+
+def response_text(response):
+    # Content-Type に charset があればそれを使い、なければ本文から推定する（推定は遅いので必要なときだけ）
+    if 'charset=' not in response.headers.get('Content-Type', '').lower():
+        response.encoding = response.apparent_encoding
+    return response.text
+
+
+def make_soup(markup, parser=None):
+    return BeautifulSoup(markup, parser or HTML_PARSER)
+
+
+class _HrefParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            for name, value in attrs:
+                if name == 'href':
+                    self.hrefs.append(value or '')
+                    break
+
+
+def extract_hrefs(markup):
+    # <a href> の値だけを取り出す（soup を作らない。本文を使わないURL一覧用）
+    # lxml があればそのトークナイザ（C実装）で <a> の開始タグだけを拾う
+    if etree is not None:
+        parser = etree.HTMLPullParser(events=('start',), tag='a')
+        parser.feed(markup)
+        parser.close()
+        return [href for _, element in parser.read_events() for href in [element.get('href')] if href is not None]
+    parser = _HrefParser()
+    parser.feed(markup)
+    parser.close()
+    return parser.hrefs
+
+
+def is_boilerplate(tag):
+    if tag.name in REMOVE_TAGS:
+        return True
+    attrs = tag.attrs
+    if not attrs:
+        return False
+    if attrs.get('id') in REMOVE_IDS or attrs.get('role') in REMOVE_ROLES:
+        return True
+    classes = attrs.get('class')
+    if classes:
+        if isinstance(classes, str):
+            classes = classes.split()
+        return not REMOVE_CLASSES.isdisjoint(classes)
+    return False
+
+
+def strip_boilerplate(soup):
+    # 不要な要素とコメントを1回の走査で取り除き、残った <img> と PDFリンクを文書順に集める
+    images = []
+    pdf_links = []
+    stack = [soup]
+    while stack:
+        node = stack.pop()
+        if node.name == 'img':
+            src = node.get('src')
+            if src:
+                images.append(src)
+        elif node.name == 'a':
+            href = node.get('href')
+            if href and href.lower().endswith('.pdf'):
+                pdf_links.append(href)
+        kept = []
+        for child in list(node.contents):
+            if isinstance(child, Tag):
+                if is_boilerplate(child):
+                    child.decompose()
+                else:
+                    kept.append(child)
+            elif isinstance(child, Comment):
+                child.extract()
+        stack.extend(reversed(kept))
+    return images, pdf_links
+
+
+def iter_blocks(root):
+    # 本文を [種類, テキスト, 見出しレベル] の順に返す（文書順）
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Tag):
+            level = HEADING_TAGS.get(node.name)
+            if level:
+                text = node.get_text(strip=True)
+                if text:
+                    yield ['heading', clean_text(text), level]
+            elif node.name == 'li':
+                text = node.get_text(strip=True)
+                if text:
+                    yield ['bullet', clean_text(text), 0]
+            else:
+                stack.extend(reversed(node.contents))
+        elif isinstance(node, NavigableString) and not isinstance(node, PreformattedString):
+            text = node.strip()
+            if text:
+                yield ['text', clean_text(text), 0]
+
+
+# 抽出結果はキャッシュに保存できるよう JSON にできる形で返す
+#   blocks: [種類, テキスト, 見出しレベル] のリスト（種類は 'heading' / 'bullet' / 'text'）
+PAGE_EXTRACT_KIND = 'page:2'  # 抽出処理を変えたら番号を上げる（古いキャッシュを使わないため）
+
+
+def extract_page_content(soup, metrics=NULL_METRICS):
+    # ディスクリプションとタイトルは除去の前に取得（<head> 内なので除去の影響は受けない）
+    description_text = None
+    description_tag = soup.find('meta', attrs={'name': 'description'})
+    if description_tag and description_tag.get('content'):
+        description_text = description_tag.get('content').strip()
+    title_tag = soup.find('title')
+    title = title_tag.get_text(strip=True) if title_tag else "no_title"
+    clean_title = sanitize_text(title)
+
+    with metrics.timer('strip'):
+        images, pdf_links = strip_boilerplate(soup)
+
+    # 本文エリア
+    with metrics.timer('extract'):
+        content_source = soup.find('main') or soup
+        blocks = list(iter_blocks(content_source))
+    return {
+        'title': clean_title,
+        'description': description_text,
+        'blocks': blocks,
+        'images': images,
+        'pdf_links': pdf_links,
+    }
@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+# === 画像・PDFからのテキスト抽出の並列実行（OcrPool / PdfPool の共通部分） ===
+# ページの処理（クロール）を待たせないよう、取得はスレッド、抽出（OCR・テキスト抽出）はプロセスプールで行う
+# - 同じURLはクロール全体で1回だけ取得・抽出する（全ページ共通のロゴや、何ページからもリンクされるPDFなど）
+# - URLが違っても内容（SHA-256）が同じものは抽出し直さない
+# - レスポンスキャッシュに保存された内容なら前回の抽出結果を使う
+# submit(url) は (内容のSHA-256, テキスト) を返す Future を返す
+# サブクラスは kind（キャッシュでの抽出結果の種類）と fetch() / extract() を実装する
+
+DEFAULT_WORKERS = os.cpu_count() or 2
+
+
+def make_executor(workers):
+    # Celery の prefork ワーカーのようなデーモンプロセスは子プロセスを作れないのでスレッドで実行する
+    # （tesseract は pytesseract が別プロセスとして起動し、PyMuPDF は処理中に GIL を手放すので、スレッドでも並列に動く）
+    if multiprocessing.current_process().daemon:
+        return ThreadPoolExecutor(workers)
+    return ProcessPoolExecutor(workers)
+
+
+def timed(fn, *args):
+    # プロセスプール側で実行する（結果とかかった秒数を返す）
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class ExtractPool:
+    kind = None
+
+    def __init__(self, http, workers=None):
+        self.http = http
+        workers = workers or DEFAULT_WORKERS
+        self.executor = make_executor(workers)
+        self.downloader = ThreadPoolExecutor(workers * 2)
+        self.lock = threading.Lock()
+        self.by_url = {}     # URL -> Future
+        self.by_digest = {}  # 内容のSHA-256 -> Future
+        self.stats = {
+            'requested': 0,   # 抽出対象として渡された数（重複を含む）
+            'extracted': 0,   # 実際に抽出した数
+            'skipped': 0,     # 大きさの条件で抽出しなかった数
+            'cache_hits': 0,  # URL・内容の重複やキャッシュで抽出を省略した数
+            'errors': 0,
+            'seconds': 0.0,   # 抽出にかかった時間の合計
+        }
+
+    def submit(self, url):
+        with self.lock:
+            self.stats['requested'] += 1
+            future = self.by_url.get(url)
+            if future is not None:
+                self.stats['cache_hits'] += 1
+                return future
+            future = self.downloader.submit(self._process, url)
+            self.by_url[url] = future
+            return future
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['seconds'] = round(stats['seconds'], 3)
+        return stats
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def fetch(self, url):
+        # (内容, SHA-256, レスポンスキャッシュに保存されたか) を返す。対象外なら内容を None にする
+        raise NotImplementedError
+
+    def extract(self, source):
+        # 内容からテキストを取り出す。対象外なら None を返す
+        raise NotImplementedError
+
+    def run(self, fn, *args):
+        # fn をプロセスプールで実行する
+        result, seconds = self.executor.submit(timed, fn, *args).result()
+        with self.lock:
+            self.stats['extracted'] += 1
+            self.stats['seconds'] += seconds
+        return result
+
+    def _process(self, url):
+        try:
+            source, digest, stored = self.fetch(url)
+            if source is None:
+                self._count('skipped')
+                return digest, ''
+            try:
+                with self.lock:
+                    future = self.by_digest.get(digest)
+                    owner = future is None
+                    if owner:
+                        future = self.by_digest[digest] = Future()
+                    else:
+                        self.stats['cache_hits'] += 1
+                if not owner:
+                    return future.result()
+                try:
+                    result = (digest, self._extract_cached(source, digest if stored else None))
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+                future.set_result(result)
+                return result
+            finally:
+                if hasattr(source, 'close'):
+                    source.close()
+        except Exception:
+            self._count('errors')
+            raise
+
+    def _extract_cached(self, source, stored_digest):
+        cache = self.http.cache if stored_digest else None
+        if cache is not None:
+            text = cache.get_extract(stored_digest, self.kind)
+            if text is not None:
+                self._count('cache_hits')
+                return text
+        text = self.extract(source)
+        if text is None:
+            self._count('skipped')
+            return ''
+        if cache is not None:
+            cache.put_extract(stored_digest, self.kind, text)
+        return text
+
+    def close(self):
+        self.downloader.shutdown(cancel_futures=True)
+        self.executor.shutdown(cancel_futures=True)
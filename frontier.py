@@ -0,0 +1,198 @@
+import hashlib
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+from scheduler import make_queue
+
+# === 訪問済みURLと未訪問URL（フロンティア）の省メモリな保持 ===
+# Frontier はURLをキューに入れる時点で重複を除く（同じURLが何度もキューに入らない）。
+# 訪問済みの判定（seen）は3種類から選べる
+#   'exact'       : URL文字列の set（従来どおり。1URLあたり100バイト前後）
+#   'fingerprint' : URLの64bitハッシュ値を整列済み配列に保持（1URLあたり十数バイト。衝突は事実上起きない）
+#   'bloom'       : ブルームフィルタ（1URLあたり数バイト。error_rate の確率で未訪問のURLを訪問済みと誤判定し、
+#                   そのURLは取得されない）
+# 'fingerprint' / 'bloom' ではキュー内のURLも「スキーム+ホスト」を番号に置き換えたバイト列で持つ
+# （'exact' ではURL文字列を訪問済みの set と共有するので、そのまま持つ方が小さい）
+SEEN_MODES = ('exact', 'fingerprint', 'bloom')
+DEFAULT_BLOOM_CAPACITY = 1000000
+DEFAULT_BLOOM_ERROR_RATE = 0.001
+
+ORIGIN_PATTERN = re.compile(r'[^:/?#]+://[^/?#]*')
+
+
+def fingerprint(key):
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class ExactSet:
+    def __init__(self):
+        self.keys = set()
+
+    def add(self, key):
+        # 新しく追加したら True
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class FingerprintSet:
+    # 指紋は整列済みの array('Q')（8バイト/件）に持ち、直近の追加分だけ set に溜めてまとめてマージする
+    MIN_MERGE = 1 << 16
+
+    def __init__(self):
+        self.merged = array('Q')
+        self.recent = set()
+
+    def _in_merged(self, fp):
+        i = bisect_left(self.merged, fp)
+        return i < len(self.merged) and self.merged[i] == fp
+
+    def add(self, key):
+        fp = fingerprint(key)
+        if fp in self.recent or self._in_merged(fp):
+            return False
+        self.recent.add(fp)
+        if len(self.recent) > max(self.MIN_MERGE, len(self.merged) >> 3):
+            self.merged = array('Q', heapq.merge(self.merged, sorted(self.recent)))
+            self.recent = set()
+        return True
+
+    def __contains__(self, key):
+        fp = fingerprint(key)
+        return fp in self.recent or self._in_merged(fp)
+
+    def __len__(self):
+        return len(self.merged) + len(self.recent)
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))  # ビット数
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        added = False
+        for pos in self._positions(key):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class BloomSet:
+    # 件数が capacity を超えたら、容量2倍・誤判定率半分のフィルタを足していく（全体の誤判定率は約 2×error_rate 以内）
+    def __init__(self, capacity=DEFAULT_BLOOM_CAPACITY, error_rate=DEFAULT_BLOOM_ERROR_RATE):
+        self.filters = [BloomFilter(capacity, error_rate)]
+
+    def add(self, key):
+        if key in self:
+            return False
+        last = self.filters[-1]
+        if last.count >= last.capacity:
+            last = BloomFilter(last.capacity * 2, last.error_rate / 2)
+            self.filters.append(last)
+        last.add(key)
+        return True
+
+    def __contains__(self, key):
+        return any(key in bloom for bloom in self.filters)
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+
+def make_seen_set(mode='exact', bloom_capacity=DEFAULT_BLOOM_CAPACITY, bloom_error_rate=DEFAULT_BLOOM_ERROR_RATE):
+    if mode == 'exact':
+        return ExactSet()
+    if mode == 'fingerprint':
+        return FingerprintSet()
+    if mode == 'bloom':
+        return BloomSet(bloom_capacity, bloom_error_rate)
+    raise ValueError(f"不明な訪問済み判定の方式: {mode}")
+
+
+class Frontier:
+    # order（scheduler.CRAWL_ORDERS）の順にURLを取り出す（'dfs' は後から入れたURLから、'bfs' は入れた順）
+    # deprioritize（URL -> bool）を渡すと、取り出すときに True になったURLは後回しにし、
+    # ほかのURLがなくなってから入れた順に取り出す（重複ページばかりのURLパターンなど）
+    # track_depth=True ならURLごとに深さ（リンクを辿った回数）も持ち、pop() で返す（False なら常に 0）
+    def __init__(self, order='bfs', seen=None, deprioritize=None, priority_patterns=None, track_depth=False):
+        self.seen = seen if seen is not None else ExactSet()
+        self.compact = not isinstance(self.seen, ExactSet)
+        self.deprioritize = deprioritize
+        self.track_depth = track_depth
+        self.queue = make_queue(order, priority_patterns)
+        self.deferred = deque()
+        self.origins = []      # 番号 -> 'https://example.com'
+        self.origin_ids = {}   # 'https://example.com' -> 番号
+
+    def add(self, url, key=None, depth=0):
+        # 初めてのURLならキューに入れて True を返す（key は重複判定に使う値。既定はURLそのもの）
+        if not self.seen.add(key or url):
+            return False
+        item = self._pack(url) if self.compact else url
+        self.queue.push((item, depth) if self.track_depth else item, url, depth)
+        return True
+
+    def mark_seen(self, key):
+        # キューには入れずに訪問済みにする
+        self.seen.add(key)
+
+    def pop(self):
+        # (URL, 深さ) を返す
+        while self.queue:
+            entry = self.queue.pop()
+            url, depth = self._unpack_entry(entry)
+            if self.deprioritize is None or not self.deprioritize(url):
+                return url, depth
+            self.deferred.append(entry)
+        return self._unpack_entry(self.deferred.popleft())
+
+    def __len__(self):
+        return len(self.queue) + len(self.deferred)
+
+    def __contains__(self, key):
+        return key in self.seen
+
+    def _pack(self, url):
+        match = ORIGIN_PATTERN.match(url)
+        origin = match.group() if match else ''
+        origin_id = self.origin_ids.get(origin)
+        if origin_id is None:
+            origin_id = self.origin_ids[origin] = len(self.origins)
+            self.origins.append(origin)
+        return origin_id.to_bytes(4, 'big') + url[len(origin):].encode('utf-8')
+
+    def _unpack_entry(self, entry):
+        item, depth = entry if self.track_depth else (entry, 0)
+        return (self._unpack(item) if self.compact else item), depth
+
+    def _unpack(self, packed):
+        return self.origins[int.from_bytes(packed[:4], 'big')] + packed[4:].decode('utf-8')
@@ -0,0 +1,154 @@
+import hashlib
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+# === HTTP通信設定 ===
+DEFAULT_POOL_SIZE = 8          # ホストごとに保持する接続数（並列数に合わせる）
+DEFAULT_TIMEOUT = (10, 30)     # (接続, 読み込み) タイムアウト秒
+DEFAULT_MAX_RETRIES = 3        # 429/5xx・接続エラー時の再試行回数
+DEFAULT_BACKOFF_FACTOR = 0.5   # 再試行間隔 0.5s, 1s, 2s ...
+MAX_RETRY_AFTER = 60           # Retry-After がこれより長い場合は切り詰める（秒）
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+
+def is_html_response(response):
+    # Content-Type がないときは本文を見ないと分からないのでHTMLとして扱う
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    return not content_type or content_type in HTML_CONTENT_TYPES
+
+
+def response_size(response):
+    # 本文のバイト数（本文を読んでいなければ Content-Range / Content-Length から。分からなければ None）
+    if not getattr(response, 'body_skipped', False):
+        return len(response.content)
+    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+    if total.isdigit():
+        return int(total)
+    length = response.headers.get('Content-Length', '')
+    return int(length) if length.isdigit() else None
+
+
+# download() で本文が max_bytes を超えたときに送出する
+class ResponseTooLarge(Exception):
+    pass
+
+
+# Retry-After を尊重しつつ、極端に長い待ち時間でワーカーが止まらないようにする
+class CappedRetry(Retry):
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+
+# 接続を使い回すHTTPクライアント（ページ・画像・PDFの取得で共有する）
+# - ホストごとに keep-alive の接続プールを持つので TCP/TLS ハンドシェイクは初回のみ
+# - gzip/deflate（brotli が入っていれば br も）で圧縮転送を受け付ける
+# - 429/5xx・接続エラーは指数バックオフで再試行（Retry-After を優先）
+# - cache（response_cache.ResponseCache）を渡すと If-None-Match / If-Modified-Since で再検証し、
+#   304 の場合はキャッシュ済みの本文を返す
+class HttpClient:
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR, cache=None):
+        self.timeout = timeout
+        self.cache = cache
+        retry = CappedRetry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        # ヘッダー指定やストリーミングの取得はキャッシュを通さない
+        use_cache = self.cache is not None and not kwargs.get('headers') and not kwargs.get('stream')
+        entry = self.cache.lookup(url) if use_cache else None
+        if entry is not None:
+            kwargs['headers'] = entry.conditional_headers()
+        response = self.session.get(url, **kwargs)
+        if entry is not None and response.status_code == 304:
+            return self.cache.revalidated(entry, response)
+        response.raise_for_status()
+        if use_cache:
+            self.cache.store(url, response)
+        return response
+
+    def get_page(self, url):
+        # HTMLなら get() と同じ（キャッシュで再検証する）。HTML以外は本文を読まずに接続を閉じ、
+        # ヘッダーとステータスだけのレスポンス（body_skipped=True、content は空）を返す（URL一覧用）
+        entry = self.cache.lookup(url) if self.cache is not None else None
+        headers = entry.conditional_headers() if entry is not None else None
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if entry is not None and response.status_code == 304:
+                return self.cache.revalidated(entry, response)
+            response.raise_for_status()
+            if not is_html_response(response):
+                response._content = b''
+                response.body_skipped = True
+                return response
+            response.content  # 本文を読み込む
+        if self.cache is not None:
+            self.cache.store(url, response)
+        return response
+
+    def head(self, url):
+        # 本文を取得せずにステータス・Content-Type・サイズを得る（HEAD に対応していなければ先頭1バイトだけ GET する）
+        response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        if response.status_code in (405, 501):
+            with self.session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=self.timeout) as response:
+                pass
+        response.raise_for_status()
+        response._content = b''
+        response.body_skipped = True
+        return response
+
+    def download(self, url, fileobj, max_bytes=None):
+        # 本文を fileobj に書き出しながら取得し、本文の SHA-256 を返す（PDFなど大きなファイル用）
+        # 本文全体をメモリに載せない。キャッシュがあれば get() と同じく再検証し、保存もする
+        entry = self.cache.lookup(url) if self.cache is not None else None
+        headers = entry.conditional_headers() if entry is not None else None
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if entry is not None and response.status_code == 304:
+                self.cache.revalidated_to_file(entry, response, fileobj)
+                return entry.digest
+            response.raise_for_status()
+            length = response.headers.get('Content-Length', '')
+            if max_bytes and length.isdigit() and int(length) > max_bytes:
+                raise ResponseTooLarge(f'{length} bytes > {max_bytes} bytes')
+            digest = hashlib.sha256()
+            size = 0
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise ResponseTooLarge(f'> {max_bytes} bytes')
+                digest.update(chunk)
+                fileobj.write(chunk)
+        digest = digest.hexdigest()
+        if self.cache is not None:
+            self.cache.store_file(url, response, fileobj, digest, size)
+        return digest
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import Counter
+
+from redis.exceptions import WatchError
+
+# === ジョブの登録（同じリクエストのまとめ・結果の再利用）と同時実行数の制御 ===
+# 同じ内容のリクエスト（種類と引数が同じ）は1つのタスクにまとめる
+#   - 実行中・実行待ちなら、そのタスクIDを返す
+#   - result_ttl 秒以内に完了していれば、そのタスクIDを返す（結果をそのまま使う。出力ファイルの確認は呼び出し側）
+# タスクはワーカーで実行を始める前に admit() で枠を取る。全体で max_jobs 件、同じホストは max_jobs_per_host 件まで。
+# 枠が空いていなければ実行待ちのまま（呼び出し側で少し待ってから再試行する）。
+# 実行待ちは登録順に並べ、先に待っているジョブ（枠が空けば実行できるもの）を追い越さない。
+# 実行中の枠は slot_ttl 秒で切れる（touch() で延長する）ので、ワーカーが落ちたジョブの枠は自然に空く
+# 実行待ちのタスクは admit() を試すたびに最後に見た時刻を更新し、WAITING_TTL 秒以上見ていないタスクは
+# 失われたもの（ブローカーから消えたなど）として実行待ちから外す（同じリクエストもまとめない）
+#
+# Redis のキー（scrape: で始まる）
+#   request:<リクエストのハッシュ> : タスクID（実行中は job_ttl、完了後は result_ttl 秒で消える）
+#   request-of:<タスクID>         : リクエストのハッシュ
+#   jobs:waiting                  : 実行待ちのタスクID（ZSET。スコアは登録時刻）
+#   jobs:seen                     : 実行待ちのタスクID -> 最後に見た時刻（HASH）
+#   jobs:running                  : 実行中のタスクID（ZSET。スコアは枠の期限）
+#   jobs:hosts                    : タスクID -> 取得先のホスト（HASH）
+#   jobs:admission                : admit() の排他用のロック
+
+DEFAULT_RESULT_TTL = 600
+DEFAULT_MAX_JOBS = 4
+DEFAULT_MAX_JOBS_PER_HOST = 1
+DEFAULT_SLOT_TTL = 90
+DEFAULT_JOB_TTL = 7 * 24 * 60 * 60
+WAITING_TTL = 30 * 60        # 実行待ちのタスクをこれより長く見ていなければ失われたものとみなす
+ADMISSION_LOCK_TTL = 5000    # ミリ秒
+ADMISSION_LOCK_WAIT = 2.0    # 秒
+
+
+def request_hash(kind, args):
+    return hashlib.sha256(json.dumps([kind, args], sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class JobRegistry:
+    def __init__(self, redis, result_ttl=DEFAULT_RESULT_TTL, max_jobs=DEFAULT_MAX_JOBS,
+                 max_jobs_per_host=DEFAULT_MAX_JOBS_PER_HOST, slot_ttl=DEFAULT_SLOT_TTL, job_ttl=DEFAULT_JOB_TTL):
+        self.redis = redis
+        self.result_ttl = result_ttl
+        self.max_jobs = max_jobs
+        self.max_jobs_per_host = max_jobs_per_host
+        self.slot_ttl = slot_ttl
+        self.job_ttl = job_ttl
+
+    def key(self, name):
+        return f'scrape:{name}'
+
+    # --- 同じリクエストのまとめ ---
+    def find(self, kind, args):
+        # 同じリクエストの直近のタスクID（なければ None）
+        task_id = self.redis.get(self.key(f'request:{request_hash(kind, args)}'))
+        return task_id.decode('utf-8') if task_id else None
+
+    def register(self, kind, args, task_id, host, replace=None):
+        # 新しいタスクを登録して実行待ちにし True を返す。同じリクエストのタスクがすでにあれば（replace を渡したら、
+        # それ以外のタスクがあれば）登録せずに False を返す（同時に来た同じリクエストは1つだけ登録される）
+        digest = request_hash(kind, args)
+        request_key = self.key(f'request:{digest}')
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(request_key)
+                current = pipe.get(request_key)
+                if current is not None and current.decode('utf-8') != replace:
+                    return False
+                now = time.time()
+                pipe.multi()
+                pipe.set(request_key, task_id, ex=self.job_ttl)
+                pipe.set(self.key(f'request-of:{task_id}'), digest, ex=self.job_ttl)
+                pipe.zadd(self.key('jobs:waiting'), {task_id: now}, nx=True)
+                pipe.hset(self.key('jobs:seen'), task_id, now)
+                pipe.hset(self.key('jobs:hosts'), task_id, host)
+                pipe.execute()
+                return True
+            except WatchError:
+                return False  # 同じリクエストが先に登録された
+
+    def finish(self, task_id, success):
+        # 成功したら同じリクエストに result_ttl 秒間この結果を返し、失敗したら次のリクエストで実行し直す
+        self.release(task_id)
+        digest = self.redis.get(self.key(f'request-of:{task_id}'))
+        if not digest:
+            return
+        request_key = self.key(f'request:{digest.decode("utf-8")}')
+        current = self.redis.get(request_key)
+        if current is None or current.decode('utf-8') != task_id:
+            return  # より新しいタスクに置き換わっている
+        if success and self.result_ttl > 0:
+            self.redis.expire(request_key, self.result_ttl)
+        else:
+            self.redis.delete(request_key)
+
+    def is_active(self, task_id):
+        # 実行待ち（WAITING_TTL 秒以内に見ている）か、実行中（枠の期限内）か
+        now = time.time()
+        if self.redis.zscore(self.key('jobs:waiting'), task_id) is not None:
+            seen = self.redis.hget(self.key('jobs:seen'), task_id)
+            return seen is not None and float(seen) > now - WAITING_TTL
+        expires = self.redis.zscore(self.key('jobs:running'), task_id)
+        return expires is not None and expires > now
+
+    # --- 同時実行数の制御 ---
+    def wait(self, task_id, host):
+        # 実行待ちに加える（すでに待っていれば順番はそのまま、最後に見た時刻だけ更新する）
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.zadd(self.key('jobs:waiting'), {task_id: now}, nx=True)
+        pipe.hset(self.key('jobs:seen'), task_id, now)
+        pipe.hset(self.key('jobs:hosts'), task_id, host)
+        pipe.execute()
+
+    def admit(self, task_id, host):
+        # 実行の枠を取れたら True。取れなければ実行待ちのまま False
+        lock = self._acquire_admission_lock()
+        if lock is None:
+            return False
+        try:
+            now = time.time()
+            running = self._running(now)
+            if task_id in running:
+                self.touch(task_id)  # 再配信されたタスク（枠はそのまま使う）
+                return True
+            self.wait(task_id, host)
+            per_host = Counter(self._hosts(running).values())
+            if len(running) >= self.max_jobs or per_host[host] >= self.max_jobs_per_host:
+                return False
+            # 先に待っているジョブのうち、次に実行できるもの（ホストの枠が空いているもの）の分の枠は残す
+            waiting = [waiting.decode('utf-8') for waiting in self.redis.zrange(self.key('jobs:waiting'), 0, -1)]
+            ahead = self._hosts(waiting[:waiting.index(task_id)] if task_id in waiting else waiting)
+            reserved = Counter()
+            for waiting_host in ahead.values():
+                if per_host[waiting_host] + reserved[waiting_host] < self.max_jobs_per_host:
+                    reserved[waiting_host] += 1
+            if (len(running) + sum(reserved.values()) >= self.max_jobs or
+                    per_host[host] + reserved[host] >= self.max_jobs_per_host):
+                return False
+            pipe = self.redis.pipeline()
+            pipe.zadd(self.key('jobs:running'), {task_id: now + self.slot_ttl})
+            pipe.zrem(self.key('jobs:waiting'), task_id)
+            pipe.hdel(self.key('jobs:seen'), task_id)
+            pipe.hset(self.key('jobs:hosts'), task_id, host)
+            pipe.execute()
+            return True
+        finally:
+            self._release_admission_lock(lock)
+
+    def touch(self, task_id, ttl=None):
+        # 実行中の枠の期限を ttl 秒（既定は slot_ttl）後まで延ばす（実行中のタスクから定期的に呼ぶ）
+        self.redis.zadd(self.key('jobs:running'), {task_id: time.time() + (ttl or self.slot_ttl)}, xx=True)
+
+    def release(self, task_id):
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.key('jobs:running'), task_id)
+        pipe.zrem(self.key('jobs:waiting'), task_id)
+        pipe.hdel(self.key('jobs:seen'), task_id)
+        pipe.hdel(self.key('jobs:hosts'), task_id)
+        pipe.execute()
+
+    def position(self, task_id):
+        # 実行待ちの順番（1 から。待っていなければ None）
+        rank = self.redis.zrank(self.key('jobs:waiting'), task_id)
+        return rank + 1 if rank is not None else None
+
+    def active_tasks(self):
+        # 実行待ち・実行中のタスクID
+        running = self._running(time.time())
+        return [task_id.decode('utf-8') for task_id in self.redis.zrange(self.key('jobs:waiting'), 0, -1)] + sorted(running)
+
+    def snapshot(self):
+        # 実行中・実行待ちの件数とホストごとの実行中の件数（/status 用）
+        running = self._running(time.time())
+        return {'running': len(running), 'waiting': self.redis.zcard(self.key('jobs:waiting')),
+                'max_jobs': self.max_jobs, 'max_jobs_per_host': self.max_jobs_per_host,
+                'hosts': dict(Counter(self._hosts(running).values()))}
+
+    def _running(self, now):
+        # 期限の切れた枠（落ちたワーカー）と、失われた実行待ちのタスクを片付けてから、実行中のタスクIDを返す
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(self.key('jobs:running'), '-inf', now)
+        pipe.zrange(self.key('jobs:running'), 0, -1)
+        pipe.hgetall(self.key('jobs:seen'))
+        pipe.zrange(self.key('jobs:waiting'), 0, -1)
+        _, running, seen, waiting = pipe.execute()
+        lost = [task_id for task_id in waiting if float(seen.get(task_id, 0)) <= now - WAITING_TTL]
+        if lost:
+            pipe = self.redis.pipeline()
+            pipe.zrem(self.key('jobs:waiting'), *lost)
+            pipe.hdel(self.key('jobs:seen'), *lost)
+            pipe.hdel(self.key('jobs:hosts'), *lost)
+            pipe.execute()
+        return {task_id.decode('utf-8') for task_id in running}
+
+    def _hosts(self, task_ids):
+        task_ids = list(task_ids)
+        if not task_ids:
+            return {}
+        values = self.redis.hmget(self.key('jobs:hosts'), task_ids)
+        return {task_id: value.decode('utf-8') for task_id, value in zip(task_ids, values) if value is not None}
+
+    def _acquire_admission_lock(self):
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + ADMISSION_LOCK_WAIT
+        while not self.redis.set(self.key('jobs:admission'), token, nx=True, px=ADMISSION_LOCK_TTL):
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.05)
+        return token
+
+    def _release_admission_lock(self, token):
+        current = self.redis.get(self.key('jobs:admission'))
+        if current is not None and current.decode('utf-8') == token:
+            self.redis.delete(self.key('jobs:admission'))
+
+
+def cleanup_outputs(directory, max_bytes, in_use=()):
+    # directory の合計が max_bytes 以下になるまで古いファイルから消し、消したファイルのパスを返す
+    # in_use（実行中・実行待ちのジョブの出力先）と、それで始まるファイル（チェックポイントなど）は消さない
+    in_use = tuple(os.path.abspath(path) for path in in_use if path)
+    files = []
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, os.path.abspath(entry.path)))
+    total = sum(size for _, size, _ in files)
+    removed = []
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if in_use and path.startswith(in_use):
+            continue
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"出力ファイルを削除できません: {path} - {e}")
+            continue
+        total -= size
+        removed.append(path)
+    return removed
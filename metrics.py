@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+
+# === クロールの計測（段階ごとの処理時間・ダウンロード量・ステータスコード） ===
+# 段階: fetch（取得）/ parse（HTML解析）/ strip（不要要素の除去）/ extract（本文抽出）/
+#       dedup（重複ページの判定）/ ocr・pdf（ExtractPool のワーカーでの処理時間）/ write（Word への書き込み）
+# SCRAPE_METRICS=0 なら NULL_METRICS（何もしない）を使い、計測の負荷はかからない
+STAGES = ('fetch', 'parse', 'strip', 'extract', 'dedup', 'ocr', 'pdf', 'write')
+METRICS_ENABLED = os.environ.get('SCRAPE_METRICS', '1') != '0'
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.stage, time.perf_counter() - self.start)
+
+
+class CrawlMetrics:
+    enabled = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.stage_counts = dict.fromkeys(STAGES, 0)
+        self.bytes_downloaded = 0
+        self.status_codes = {}  # {'200': 件数, ..., 'error': 応答のなかった件数}
+        self.retries = 0
+        self.pages = 0
+
+    def timer(self, stage):
+        # with metrics.timer('fetch'): ... の形で使う（別スレッドから呼んでもよい）
+        return _Timer(self, stage)
+
+    def add_time(self, stage, seconds, count=1):
+        with self.lock:
+            self.stage_seconds[stage] += seconds
+            self.stage_counts[stage] += count
+
+    def record_fetch(self, status, downloaded, retries):
+        # status が None なら応答のなかったエラー。downloaded は実際に受信した本文のバイト数
+        key = str(status) if status is not None else 'error'
+        with self.lock:
+            self.status_codes[key] = self.status_codes.get(key, 0) + 1
+            self.bytes_downloaded += downloaded
+            self.retries += retries
+
+    def page_done(self):
+        with self.lock:
+            self.pages += 1
+
+    def snapshot(self, pool_stats=None):
+        # 集計を辞書で返す。pool_stats（DocxWriter.progress_stats()）があれば OCR・PDF の処理時間も含める
+        elapsed = time.monotonic() - self.started
+        with self.lock:
+            stages = {stage: {'seconds': round(self.stage_seconds[stage], 3), 'count': self.stage_counts[stage]}
+                      for stage in STAGES}
+            snapshot = {
+                'elapsed': round(elapsed, 3),
+                'pages': self.pages,
+                'pages_per_sec': round(self.pages / elapsed, 2) if elapsed > 0 else 0.0,
+                'bytes_downloaded': self.bytes_downloaded,
+                'retries': self.retries,
+                'status_codes': dict(self.status_codes),
+                'stages': stages,
+            }
+        for stage in ('ocr', 'pdf'):
+            pool = (pool_stats or {}).get(stage)
+            if pool:
+                stages[stage] = {'seconds': pool['seconds'], 'count': pool['extracted']}
+        return snapshot
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class NullMetrics:
+    enabled = False
+    _timer = _NullTimer()
+
+    def timer(self, stage):
+        return self._timer
+
+    def add_time(self, stage, seconds, count=1):
+        pass
+
+    def record_fetch(self, status, downloaded, retries):
+        pass
+
+    def page_done(self):
+        pass
+
+    def snapshot(self, pool_stats=None):
+        return None
+
+
+NULL_METRICS = NullMetrics()
+
+
+def make_metrics(enabled=None):
+    enabled = METRICS_ENABLED if enabled is None else enabled
+    return CrawlMetrics() if enabled else NULL_METRICS
+
+
+# --- Prometheus のテキスト形式 ---
+PROMETHEUS_METRICS = [
+    ('scrape_pages_total', 'counter', '処理したページ数', lambda s: [({}, s['pages'])]),
+    ('scrape_pages_per_second', 'gauge', '1秒あたりの処理ページ数', lambda s: [({}, s['pages_per_sec'])]),
+    ('scrape_elapsed_seconds', 'gauge', '開始からの経過秒数', lambda s: [({}, s['elapsed'])]),
+    ('scrape_bytes_downloaded_total', 'counter', '受信した本文のバイト数', lambda s: [({}, s['bytes_downloaded'])]),
+    ('scrape_retries_total', 'counter', '再試行の回数', lambda s: [({}, s['retries'])]),
+    ('scrape_responses_total', 'counter', 'ステータスコードごとの取得数',
+     lambda s: [({'status': status}, count) for status, count in sorted(s['status_codes'].items())]),
+    ('scrape_stage_seconds_total', 'counter', '段階ごとの処理時間（秒）',
+     lambda s: [({'stage': stage}, value['seconds']) for stage, value in s['stages'].items()]),
+    ('scrape_stage_calls_total', 'counter', '段階ごとの処理回数',
+     lambda s: [({'stage': stage}, value['count']) for stage, value in s['stages'].items()]),
+]
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(snapshots):
+    # snapshots: {タスクID: snapshot()} を Prometheus のテキスト形式にする（タスクIDは task ラベル）
+    lines = []
+    for name, metric_type, help_text, samples in PROMETHEUS_METRICS:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for task_id, snapshot in sorted(snapshots.items()):
+            for labels, value in samples(snapshot):
+                labels = dict({'task': task_id}, **labels)
+                label_text = ','.join(f'{key}="{_label_value(val)}"' for key, val in labels.items())
+                lines.append(f'{name}{{{label_text}}} {value}')
+    return '\n'.join(lines) + '\n'
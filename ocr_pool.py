@@ -0,0 +1,44 @@
+import hashlib
+from io import BytesIO
+
+from PIL import Image
+import pytesseract
+
+from extract_pool import ExtractPool
+
+# === 画像OCRの並列実行 ===
+# 取得・重複排除・キャッシュは extract_pool.ExtractPool が行う
+# - 幅か高さが min_size ピクセル未満の画像（アイコン・スペーサーなど）は認識しない
+# - 長辺が max_side ピクセルを超える画像は縮小してから認識する
+
+DEFAULT_MIN_SIZE = 32
+DEFAULT_MAX_SIDE = 2000
+
+
+def _recognize(content, lang, max_side):
+    img = Image.open(BytesIO(content))
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side))
+    return pytesseract.image_to_string(img, lang=lang).strip()
+
+
+class OcrPool(ExtractPool):
+    def __init__(self, http, lang, workers=None, min_size=DEFAULT_MIN_SIZE, max_side=DEFAULT_MAX_SIDE):
+        super().__init__(http, workers)
+        self.lang = lang
+        self.kind = f'ocr:{lang}'
+        self.min_size = min_size
+        self.max_side = max_side
+
+    def fetch(self, img_url):
+        response = self.http.get(img_url)
+        content = response.content
+        # レスポンスキャッシュに保存された画像なら、その digest で前回の認識結果を探せる
+        stored_digest = getattr(response, 'content_digest', None)
+        return content, stored_digest or hashlib.sha256(content).hexdigest(), stored_digest is not None
+
+    def extract(self, content):
+        width, height = Image.open(BytesIO(content)).size  # ヘッダーだけ読む
+        if width < self.min_size or height < self.min_size:
+            return None
+        return self.run(_recognize, content, self.lang, self.max_side)
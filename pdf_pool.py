@@ -0,0 +1,44 @@
+import tempfile
+
+import fitz  # PyMuPDF
+
+from extract_pool import ExtractPool
+from http_client import ResponseTooLarge
+
+# === PDFテキスト抽出の並列実行 ===
+# 取得・重複排除・キャッシュは extract_pool.ExtractPool が行う
+# - 本文は一時ファイルに書き出し、抽出するプロセスにはパスだけを渡す（PDFの中身をメモリに読み込んで送らない）
+# - max_bytes を超えるPDFは途中で取得をやめ、抽出しない
+
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024   # 100MB
+
+
+def _extract_text(path):
+    with fitz.open(path, filetype="pdf") as doc_pdf:
+        return ''.join(page.get_text() for page in doc_pdf).strip()
+
+
+class PdfPool(ExtractPool):
+    kind = 'pdf'
+
+    def __init__(self, http, workers=None, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(http, workers)
+        self.max_bytes = max_bytes
+
+    def fetch(self, pdf_url):
+        # 一時ファイルは close() で消える（ExtractPool が抽出後に閉じる）
+        spool = tempfile.NamedTemporaryFile(suffix='.pdf')
+        try:
+            digest = self.http.download(pdf_url, spool, max_bytes=self.max_bytes)
+            spool.flush()
+        except ResponseTooLarge as e:
+            spool.close()
+            print(f"PDFが大きすぎるためスキップ: {pdf_url} ({e})")
+            return None, None, False
+        except BaseException:
+            spool.close()
+            raise
+        return spool, digest, self.http.cache is not None
+
+    def extract(self, spool):
+        return self.run(_extract_text, spool.name)
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from urllib.parse import urldefrag
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# === レスポンスキャッシュ（再クロール用） ===
+# - インデックス（URL → 本文ハッシュ・ETag・Last-Modified）は SQLite に保存
+# - 本文は SHA-256 をファイル名にして保存（同じ内容は1つだけ保持する）
+# - 抽出結果（本文テキスト・リンク・OCR・PDFテキスト）は本文ハッシュごとに保存し、
+#   内容が変わっていなければ解析・OCRをやり直さずに再利用する
+# - 合計サイズが上限を超えたら最終アクセスの古い順に削除する（LRU）
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1GB
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# 保存しておくレスポンスヘッダー
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest);
+CREATE TABLE IF NOT EXISTS extracts (
+    digest TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (digest, kind)
+);
+'''
+
+
+def cache_key(url):
+    return urldefrag(url)[0]
+
+
+class CacheEntry:
+    def __init__(self, url, digest, size, headers):
+        self.url = url
+        self.digest = digest
+        self.size = size
+        self.headers = headers
+
+    def conditional_headers(self):
+        headers = {}
+        if self.headers.get('ETag'):
+            headers['If-None-Match'] = self.headers['ETag']
+        if self.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = self.headers['Last-Modified']
+        return headers
+
+
+class ResponseCache:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite3'),
+                                  timeout=30, check_same_thread=False, isolation_level=None)
+        self.db.executescript(SCHEMA)
+        self.total_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        # 今回のクロールでの集計
+        self.requests = 0
+        self.hits = 0
+        self.bytes_saved = 0
+        self.extract_hits = 0
+
+    def object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def lookup(self, url):
+        with self.lock:
+            self.requests += 1
+            row = self.db.execute('SELECT digest, size, headers FROM entries WHERE url = ?',
+                                  (cache_key(url),)).fetchone()
+        if row is None or not os.path.exists(self.object_path(row[0])):
+            return None
+        return CacheEntry(url, row[0], row[1], json.loads(row[2]))
+
+    def revalidated(self, entry, response):
+        # 304 Not Modified のレスポンスから、キャッシュ済み本文を持つレスポンスを組み立てる
+        with open(self.object_path(entry.digest), 'rb') as f:
+            body = f.read()
+        headers = self._touch(entry, response)
+
+        cached = requests.Response()
+        cached.status_code = 200
+        cached._content = body
+        cached.headers = CaseInsensitiveDict(headers)
+        cached.url = response.url
+        cached.request = response.request
+        cached.encoding = requests.utils.get_encoding_from_headers(cached.headers)
+        cached.from_cache = True
+        cached.content_digest = entry.digest
+        return cached
+
+    def revalidated_to_file(self, entry, response, fileobj):
+        # 304 Not Modified のとき、キャッシュ済みの本文を fileobj に書き出す（大きなファイル用）
+        with open(self.object_path(entry.digest), 'rb') as f:
+            shutil.copyfileobj(f, fileobj, COPY_CHUNK_SIZE)
+        self._touch(entry, response)
+
+    def _touch(self, entry, response):
+        headers = dict(entry.headers)
+        for name in ('ETag', 'Last-Modified'):
+            if response.headers.get(name):
+                headers[name] = response.headers[name]
+        with self.lock:
+            self.hits += 1
+            self.bytes_saved += entry.size
+            self.db.execute('UPDATE entries SET headers = ?, last_access = ? WHERE url = ?',
+                            (json.dumps(headers), time.time(), cache_key(entry.url)))
+        return headers
+
+    def store(self, url, response):
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        response.content_digest = digest
+        self._store(url, response, digest, len(body), lambda f: f.write(body))
+
+    def store_file(self, url, response, fileobj, digest, size):
+        # download() で fileobj に書き出した本文を保存する（digest は本文の SHA-256）
+        def write(f):
+            fileobj.seek(0)
+            shutil.copyfileobj(fileobj, f, COPY_CHUNK_SIZE)
+        self._store(url, response, digest, size, write)
+
+    def _store(self, url, response, digest, size, write):
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        headers = {name: response.headers[name] for name in STORED_HEADERS if response.headers.get(name)}
+        key = cache_key(url)
+        with self.lock:
+            old = self.db.execute('SELECT digest, size FROM entries WHERE url = ?', (key,)).fetchone()
+            self.db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                            (key, digest, size, json.dumps(headers), time.time()))
+            self.total_bytes += size - (old[1] if old else 0)
+            if old and old[0] != digest:
+                self._release_object(old[0])
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _release_object(self, digest):
+        # 他のURLから参照されていない本文と抽出結果を削除する
+        if self.db.execute('SELECT 1 FROM entries WHERE digest = ? LIMIT 1', (digest,)).fetchone():
+            return
+        self.db.execute('DELETE FROM extracts WHERE digest = ?', (digest,))
+        try:
+            os.remove(self.object_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        target = self.max_bytes * 0.9
+        rows = self.db.execute('SELECT url, digest, size FROM entries ORDER BY last_access').fetchall()
+        for url, digest, size in rows:
+            if self.total_bytes <= target:
+                break
+            self.db.execute('DELETE FROM entries WHERE url = ?', (url,))
+            self.total_bytes -= size
+            self._release_object(digest)
+
+    def get_extract(self, digest, kind):
+        with self.lock:
+            row = self.db.execute('SELECT data FROM extracts WHERE digest = ? AND kind = ?',
+                                  (digest, kind)).fetchone()
+            if row is None:
+                return None
+            self.extract_hits += 1
+        return json.loads(row[0])
+
+    def put_extract(self, digest, kind, data):
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO extracts VALUES (?, ?, ?)',
+                            (digest, kind, json.dumps(data, ensure_ascii=False)))
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'hits': self.hits,
+            'hit_ratio': round(self.hits / self.requests, 3) if self.requests else 0.0,
+            'bytes_saved': self.bytes_saved,
+            'extract_hits': self.extract_hits,
+            'size_bytes': self.total_bytes,
+        }
+
+    def close(self):
+        self.db.close()
+
+
+def cached_extract(cache, response, kind, extract):
+    # 本文の内容が前回と同じなら保存済みの抽出結果を返し、違えば extract() を実行して保存する
+    digest = getattr(response, 'content_digest', None)
+    if cache is None or digest is None:
+        return extract()
+    data = cache.get_extract(digest, kind)
+    if data is None:
+        data = extract()
+        cache.put_extract(digest, kind, data)
+    return data
@@ -0,0 +1,156 @@
+import heapq
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+from url_filter import PathRules, get_directory
+
+# === クロール順序と予算 ===
+# フロンティア（frontier.Frontier）からURLを取り出す順序
+#   'dfs'      : 後から見つけたURLから（深さ優先。serial の従来の動作）
+#   'bfs'      : 見つけた順に（幅優先。async の従来の動作）
+#   'priority' : 深さ＋URLパターンの重み（priority_patterns）の小さい順。同じなら見つけた順
+#   'fair'     : 最初のディレクトリ（get_directory。/service/ など）ごとに1件ずつ順番に。ディレクトリ内は見つけた順
+#                （カレンダーやアーカイブのような深いディレクトリが他のディレクトリを待たせない）
+# CrawlBudget の上限（ページ数・深さ・秒数・受信バイト数）に達したら、新しいページの取得をやめて、
+# そこまでの結果でクロールを終える
+CRAWL_ORDERS = ('dfs', 'bfs', 'priority', 'fair')
+
+
+def parse_priority_patterns(text):
+    # '/news=-2,/archive/*=10' → [('/news', -2), ('/archive/*', 10)]（パターンは exclude_paths と同じ書き方）
+    # 環境変数（CRAWL_PRIORITY）から読むので、書き方の誤った項目は警告して無視する（起動を止めない）
+    patterns = []
+    for entry in (text or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        rule, _, weight = entry.rpartition('=')
+        try:
+            if not rule:
+                raise ValueError("'パターン=重み' の形ではありません")
+            patterns.append((rule, int(weight)))
+        except ValueError as e:
+            print(f"クロールの優先度の指定を無視します: {entry!r} - {e}")
+    return patterns
+
+
+class StackQueue:
+    def __init__(self):
+        self.items = deque()
+
+    def push(self, item, url, depth):
+        self.items.append(item)
+
+    def pop(self):
+        return self.items.pop()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class FifoQueue(StackQueue):
+    def pop(self):
+        return self.items.popleft()
+
+
+class PriorityQueue:
+    # (深さ＋重み, 追加順, item) のヒープ
+    def __init__(self, priority_patterns=None):
+        self.rules = [(PathRules([rule]), weight) for rule, weight in priority_patterns or []]
+        self.heap = []
+        self.count = 0
+
+    def weight(self, url):
+        # 最初に一致したパターンの重み（どれにも一致しなければ 0）
+        if not self.rules:
+            return 0
+        path = urlparse(url).path
+        return next((weight for rules, weight in self.rules if rules.match(path)), 0)
+
+    def push(self, item, url, depth):
+        heapq.heappush(self.heap, (depth + self.weight(url), self.count, item))
+        self.count += 1
+
+    def pop(self):
+        return heapq.heappop(self.heap)[2]
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class FairQueue:
+    # ディレクトリごとのキューを、URLの残っているディレクトリの間で順番に回す
+    def __init__(self):
+        self.queues = {}        # {ディレクトリ: deque}
+        self.turns = deque()    # URLの残っているディレクトリ（次に取り出す順）
+        self.size = 0
+
+    def push(self, item, url, depth):
+        directory = get_directory(urlparse(url).path)
+        queue = self.queues.get(directory)
+        if queue is None:
+            queue = self.queues[directory] = deque()
+        if not queue:
+            self.turns.append(directory)
+        queue.append(item)
+        self.size += 1
+
+    def pop(self):
+        directory = self.turns.popleft()
+        queue = self.queues[directory]
+        item = queue.popleft()
+        if queue:
+            self.turns.append(directory)
+        else:
+            del self.queues[directory]
+        self.size -= 1
+        return item
+
+    def __len__(self):
+        return self.size
+
+
+def make_queue(order='bfs', priority_patterns=None):
+    if order == 'dfs':
+        return StackQueue()
+    if order == 'bfs':
+        return FifoQueue()
+    if order == 'priority':
+        return PriorityQueue(priority_patterns)
+    if order == 'fair':
+        return FairQueue()
+    raise ValueError(f"不明なクロール順序: {order}")
+
+
+class CrawlBudget:
+    # 上限は None（または 0）なら無制限。深さは開始URL（と前回のURL・サイトマップのURL）を 0 として数える
+    def __init__(self, max_pages=None, max_depth=None, max_seconds=None, max_bytes=None):
+        self.max_pages = max_pages or None
+        self.max_depth = max_depth if max_depth is not None and max_depth >= 0 else None
+        self.max_seconds = max_seconds or None
+        self.max_bytes = max_bytes or None
+        self.started = time.monotonic()
+
+    @property
+    def limited(self):
+        return any(limit is not None for limit in (self.max_pages, self.max_depth, self.max_seconds, self.max_bytes))
+
+    def start(self):
+        self.started = time.monotonic()
+
+    def allows_depth(self, depth):
+        return self.max_depth is None or depth <= self.max_depth
+
+    def exhausted(self, pages, downloaded):
+        # 使い切った上限の名前（まだ余裕があれば None）。pages は処理済み＋取得中のページ数
+        if self.max_pages is not None and pages >= self.max_pages:
+            return 'max_pages'
+        if self.max_seconds is not None and time.monotonic() - self.started >= self.max_seconds:
+            return 'max_seconds'
+        if self.max_bytes is not None and downloaded >= self.max_bytes:
+            return 'max_bytes'
+        return None
+
+
+UNLIMITED = CrawlBudget()
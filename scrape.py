@@ -1,16 +1,27 @@
 import os
-import time
-import re
-import requests
-from bs4 import BeautifulSoup
-from bs4 import Comment
-from urllib.parse import urljoin, urlparse, urlunparse
-from PIL import Image
-import pytesseract
-from io import BytesIO
-import fitz  # PyMuPDF
-from docx import Document
+from urllib.parse import urljoin, urlparse
+from collections import deque
+from text_stream import open_document, RecordingDocument
+from extract_pool import DEFAULT_WORKERS
+from ocr_pool import OcrPool, DEFAULT_MIN_SIZE as DEFAULT_OCR_MIN_SIZE, DEFAULT_MAX_SIDE as DEFAULT_OCR_MAX_SIDE
+from pdf_pool import PdfPool, DEFAULT_MAX_BYTES as DEFAULT_PDF_MAX_BYTES
+from extract import clean_text, extract_page_content, PAGE_EXTRACT_KIND
 import csv
+import json
+import threading
+from http_client import HttpClient
+from crawl_manifest import manifest_key, load_manifest, save_manifest
+from response_cache import ResponseCache, DEFAULT_MAX_BYTES as DEFAULT_CACHE_MAX_BYTES
+from distributed import RedisFrontier, run_worker, reduce_results, make_url_filter
+from url_filter import UrlFilter
+from discovery import DISCOVERY_MODES, fetch_robots, discover_sitemap_urls
+from metrics import make_metrics, NULL_METRICS
+from dedup import DuplicateIndex, DEFAULT_DISTANCE as DEFAULT_DEDUP_DISTANCE
+from checkpoint import CrawlCheckpoint, DEFAULT_EVERY as DEFAULT_CHECKPOINT_PAGES, DEFAULT_INTERVAL as DEFAULT_CHECKPOINT_INTERVAL
+from frontier import DEFAULT_BLOOM_ERROR_RATE
+from scheduler import CrawlBudget, parse_priority_patterns
+from crawler import (Crawler, CrawlHandler, close_handlers, crawl_kind, normalize_url, is_pdf_url, get_directory,
+                     DEFAULT_CONCURRENCY, DEFAULT_PER_HOST_CONCURRENCY, DEFAULT_MIN_DELAY)
 
 # === 設定 ===
 ENABLE_OCR = False  # 画像OCRをONにする場合 True, OFFにする場合 False
@@ -27,35 +38,58 @@ include_only_prefix = []
 # OCR用 言語設定（日本語＋英語）
 ocr_lang = 'jpn+eng'
 
-# --- クリーンアップ＆補助関数 ---
-def sanitize_text(text):
-    return re.sub(r'[\\/*?:"<>|]', "_", text)
-
-def normalize_url(url):
-    parsed = urlparse(url)
-    path = parsed.path.rstrip('/')
-    normalized = urlunparse((parsed.scheme, parsed.netloc, path, '', '', ''))
-    return normalized
-
-def clean_text(text):
-    if not text:
-        return ''
-    text = text.replace('\x00', '')
-    text = text.encode('utf-8', 'ignore').decode('utf-8', 'ignore')
-
-    def is_valid_xml_char(c):
-        codepoint = ord(c)
-        return (
-            codepoint == 0x9 or
-            codepoint == 0xA or
-            codepoint == 0xD or
-            (0x20 <= codepoint <= 0xD7FF) or
-            (0xE000 <= codepoint <= 0xFFFD) or
-            (0x10000 <= codepoint <= 0x10FFFF)
-        )
-
-    text = ''.join(c for c in text if is_valid_xml_char(c))
-    return text
+# OCRの並列数と対象画像の大きさ（幅・高さが OCR_MIN_SIZE 未満は認識しない、長辺が OCR_MAX_SIDE を超えたら縮小）
+OCR_WORKERS = int(os.environ.get('OCR_WORKERS', DEFAULT_WORKERS))
+OCR_MIN_SIZE = int(os.environ.get('OCR_MIN_SIZE', DEFAULT_OCR_MIN_SIZE))
+OCR_MAX_SIDE = int(os.environ.get('OCR_MAX_SIDE', DEFAULT_OCR_MAX_SIDE))
+
+# PDF抽出の並列数と、取得するPDFの大きさの上限（超えるものは抽出しない）
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', DEFAULT_WORKERS))
+PDF_MAX_BYTES = int(os.environ.get('PDF_MAX_BYTES', DEFAULT_PDF_MAX_BYTES))
+
+MAX_PENDING_PAGES = 50  # OCR・PDF抽出の結果待ちで溜めておくページ数の上限
+
+# クロール方式（'serial' または 'async'）と並列数
+CRAWL_MODE = os.environ.get('CRAWL_MODE', 'serial')
+CONCURRENCY = int(os.environ.get('CRAWL_CONCURRENCY', DEFAULT_CONCURRENCY))
+PER_HOST_CONCURRENCY = int(os.environ.get('CRAWL_PER_HOST_CONCURRENCY', DEFAULT_PER_HOST_CONCURRENCY))
+# 同一ホストへのリクエスト開始間隔（秒）。空ならクロール方式ごとの既定（serial は 1 秒、async は 0.5 秒）
+MIN_DELAY = float(os.environ['CRAWL_MIN_DELAY']) if os.environ.get('CRAWL_MIN_DELAY') else None
+
+# 訪問済みURLの保持方法（'exact' / 'fingerprint' / 'bloom'）と、bloom で未訪問URLを訪問済みと誤判定する確率
+SEEN_MODE = os.environ.get('CRAWL_SEEN_MODE', 'exact')
+BLOOM_ERROR_RATE = float(os.environ.get('CRAWL_BLOOM_ERROR_RATE', DEFAULT_BLOOM_ERROR_RATE))
+
+# リンクのURLに残すクエリパラメータ名（カンマ区切り、グロブ可。空なら従来どおりクエリをすべて除く）
+KEEP_QUERY_PARAMS = [name.strip() for name in os.environ.get('CRAWL_KEEP_QUERY_PARAMS', '').split(',') if name.strip()]
+
+# URL一覧（list_all_urls / list_all_urls_with_stats）の作り方（'crawl' / 'sitemap' / 'sitemap_only'）
+DISCOVERY = os.environ.get('CRAWL_DISCOVERY', 'crawl')
+
+# URLを取り出す順序（'dfs' / 'bfs' / 'priority' / 'fair'。空ならクロール方式の既定：serial は dfs、async は bfs）と、
+# 'priority' のときのURLパターンごとの重み（'/news=-2,/archive/*=10' の形。深さに足され、小さいほど先に取得）
+CRAWL_ORDER = os.environ.get('CRAWL_ORDER') or None
+CRAWL_PRIORITY = parse_priority_patterns(os.environ.get('CRAWL_PRIORITY', ''))
+
+# 1回のクロールの予算（ページ数・リンクを辿る深さ・秒数・受信バイト数）。0（深さは -1）なら無制限
+MAX_PAGES = int(os.environ.get('CRAWL_MAX_PAGES', 0))
+MAX_DEPTH = int(os.environ.get('CRAWL_MAX_DEPTH', -1))
+MAX_SECONDS = float(os.environ.get('CRAWL_MAX_SECONDS', 0))
+MAX_BYTES = int(os.environ.get('CRAWL_MAX_BYTES', 0))
+
+# チェックポイント（途中で止まったクロールの再開用）を書く間隔（ページ数・秒）。ページ数が 0 なら書かない
+CHECKPOINT_PAGES = int(os.environ.get('CRAWL_CHECKPOINT_PAGES', DEFAULT_CHECKPOINT_PAGES))
+CHECKPOINT_INTERVAL = float(os.environ.get('CRAWL_CHECKPOINT_INTERVAL', DEFAULT_CHECKPOINT_INTERVAL))
+
+# 重複ページの判定（'off' / 'exact'（本文が完全に同じ）/ 'near'（ほぼ同じも））と、ほぼ同じとみなす SimHash の距離
+# SCRAPE_DEDUP_DEPRIORITIZE=1 なら重複ばかりのURLパターン（/tag/* など）のURLは最後に回す
+DEDUP_MODE = os.environ.get('SCRAPE_DEDUP', 'exact')
+DEDUP_DISTANCE = int(os.environ.get('SCRAPE_DEDUP_DISTANCE', DEFAULT_DEDUP_DISTANCE))
+DEDUP_DEPRIORITIZE = os.environ.get('SCRAPE_DEDUP_DEPRIORITIZE') == '1'
+
+# レスポンスキャッシュの保存先（未設定ならキャッシュしない。app.py は未設定なら 'cache' を渡す）と容量の上限
+CACHE_DIR = os.environ.get('SCRAPE_CACHE_DIR')
+CACHE_MAX_BYTES = int(os.environ.get('SCRAPE_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES))
 
 def should_visit(url):
     path = urlparse(url).path
@@ -66,340 +100,580 @@ def should_visit(url):
         return any(path.startswith(prefix) for prefix in include_only_prefix)
     return True
 
-def scrape_website(start_url, output_file, exclude_paths=None, enable_ocr=False, enable_pdf=False, include_only_prefix=None, progress_callback=None):
-    if exclude_paths is None:
-        exclude_paths = []
-    if include_only_prefix is None:
-        include_only_prefix = []
-    visited = set()
-    to_visit = [start_url]
-    domain = urlparse(start_url).netloc
-    doc = Document()
-    is_first_page = True
-    processed_pages = 0
-
-    def should_visit(url):
-        path = urlparse(url).path
-        for exclude in exclude_paths:
-            if path.startswith(exclude):
-                return False
-        if include_only_prefix:
-            return any(path.startswith(prefix) for prefix in include_only_prefix)
-        return True
-
-    while to_visit:
-        url = to_visit.pop()
-        normalized_current_url = normalize_url(url)
-        if normalized_current_url in visited:
-            continue
-        visited.add(normalized_current_url)
-
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            response.encoding = response.apparent_encoding
-        except Exception as e:
-            print(f"エラー: {url} - {e}")
-            continue
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # --- <header>タグとその関連要素を完全に除去 ---
-        # headerタグ自体を除去
-        for header_tag in soup.find_all('header'):
-            header_tag.decompose()
-        
-        # headerに関連するクラスやIDを持つ要素も除去
-        header_selectors = [
-            {'class_': ['header', 'site-header', 'main-header', 'global-header']},
-            {'id': ['header', 'site-header', 'main-header', 'global-header']},
-            {'role': 'banner'},
-            {'class_': ['header-nav', 'header-menu', 'header-wrapper']},
-            {'id': ['header-nav', 'header-menu', 'header-wrapper']}
-        ]
-        
-        for selector in header_selectors:
-            for tag in soup.find_all(attrs=selector):
-                tag.decompose()
-
-        # --- グローバルナビゲーション除去 ---
-        for nav in soup.find_all('nav'):
-            nav.decompose()
-        # <header>タグ内のリストやナビゲーション要素は既に除去される
-
-        unwanted_selectors = [
-            {'id': 'global-nav'},
-            {'id': 'gnav'},
-            {'class': 'global-nav'},
-            {'class': 'header-nav'},
-            {'class': 'menu'},
-            {'class': 'nav'},
-            {'id': 'header'},
-            {'id': 'footer'},
-        ]
-        for selector in unwanted_selectors:
-            for tag in soup.find_all(attrs=selector):
-                tag.decompose()
-
-        # ★ ディスクリプションだけ先に取得
-        description_text = None
-        description_tag = soup.find('meta', attrs={'name': 'description'})
-        if description_tag and description_tag.get('content'):
-            description_text = description_tag.get('content').strip()
-
-        # ★ コメントアウトを削除
-        for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
-            comment.extract()
-
-        # ★ 不要なmeta, script, style, noscript, iframe, link, svgタグを削除
-        for tag in soup(['meta', 'script', 'style', 'noscript', 'iframe', 'link', 'svg']):
-            tag.decompose()
-
-        # タイトル取得
-        title_tag = soup.find('title')
-        title = title_tag.get_text(strip=True) if title_tag else "no_title"
-        clean_title = sanitize_text(title)
+# --- ページ処理ハンドラ（crawler.Crawler に渡す） ---
+CHANGE_LABELS = {'new': '新規', 'changed': '更新'}
+
+class DocxWriter(CrawlHandler):
+    # 各ページの本文をWord文書に書き込む（ページごとにディスクへ書き出すのでメモリは増えない）
+    # resume=True なら前回途中まで書いた内容の続きから書き、書き込み済みのページは飛ばす
+    # OCR・PDF抽出は OcrPool / PdfPool でクロールと並行して行い、ページは結果がそろった順（＝訪問順）に書き込む
+    # 同じPDF（内容が同じものを含む）のテキストは最初にリンクしていたページにだけ書き、以降のページには参照を書く
+    # output_format（text_stream.OUTPUT_FORMATS）が 'jsonl' / 'markdown' ならWordの代わりにその形式で書き出す
+    # on_page_written を渡すと、書き込んだページごとに text_stream.PageRecorder の辞書で呼ばれる
+    # dedup（dedup.DuplicateIndex）を渡すと、先に書いたページと本文が同じ（ほぼ同じ）ページは書き込まない
+    def __init__(self, output_file, enable_ocr=False, enable_pdf=False, http=None, resume=False, metrics=NULL_METRICS,
+                 output_format='docx', on_page_written=None, dedup=None):
+        self.output_file = output_file
+        self.metrics = metrics
+        self.dedup = dedup
+        self.enable_ocr = enable_ocr
+        self.enable_pdf = enable_pdf
+        self.http = http or HttpClient()
+        self.doc = open_document(output_file, output_format, resume=resume)
+        if on_page_written is not None:
+            self.doc = RecordingDocument(self.doc, on_page_written)
+        self.is_first_page = not self.doc.written_keys
+        self.change_label = None  # 増分クロール時、次に書き込むページの「新規」「更新」
+        self.removed_urls = []
+        self.ocr = OcrPool(self.http, ocr_lang, workers=OCR_WORKERS, min_size=OCR_MIN_SIZE,
+                           max_side=OCR_MAX_SIDE) if enable_ocr else None
+        self.pdf = PdfPool(self.http, workers=PDF_WORKERS, max_bytes=PDF_MAX_BYTES) if enable_pdf else None
+        self.pending_pages = deque()  # OCR・PDF抽出の結果待ちのページ
+        self.written_pdfs = {}  # 書き込み済みのPDF {内容のSHA-256: (PDFのURL, 書き込んだページのタイトル)}
+
+    def on_change(self, url, change):
+        if change == 'removed':
+            self.removed_urls.append(url)
+        else:
+            self.change_label = CHANGE_LABELS[change]
+
+    def on_page(self, page):
+        url = page.url
+        page_key = normalize_url(url)
+        if page_key in self.doc.written_keys:
+            self.change_label = None
+            return
+        content = page.extract(PAGE_EXTRACT_KIND, lambda: extract_page_content(page.soup, self.metrics))
+        if self.dedup is not None:
+            with self.metrics.timer('dedup'):
+                duplicate_of = self.dedup.check(url, content)
+            if duplicate_of is not None:
+                self.change_label = None
+                print(f"重複のためスキップ: {urlparse(url).path}（{duplicate_of} と同じ内容）")
+                return
+        pending = {'key': page_key, 'url': url, 'label': self.change_label, 'content': content,
+                   'ocr': [], 'pdf': []}
+        self.change_label = None
+
+        # 画像からOCR抽出 (ON/OFF)：ここでは予約だけして、結果は書き込むときに受け取る
+        if self.enable_ocr:
+            for img_url in content['images']:
+                img_full_url = urljoin(url, img_url)
+                if img_full_url.lower().endswith('.svg'):
+                    continue
+                pending['ocr'].append((img_full_url, self.ocr.submit(img_full_url)))
+
+        # PDFからテキスト抽出 (ON/OFF)：OCRと同じく予約だけしておく
+        if self.enable_pdf:
+            for full_url in dict.fromkeys(urljoin(url, href) for href in content['pdf_links']):
+                pending['pdf'].append((full_url, self.pdf.submit(full_url)))
+
+        self.pending_pages.append(pending)
+        self.write_ready_pages()
+
+    def write_ready_pages(self, wait=False):
+        # 先頭から順に、OCR・PDF抽出が終わったページを書き込む（溜まりすぎたら終わるのを待つ）
+        while self.pending_pages:
+            head = self.pending_pages[0]
+            ready = all(future.done() for _, future in head['ocr'] + head['pdf'])
+            if not (ready or wait or len(self.pending_pages) > MAX_PENDING_PAGES):
+                break
+            with self.metrics.timer('write'):
+                self.write_page(self.pending_pages.popleft())
+
+    def write_page(self, pending):
+        url = pending['url']
+        content = pending['content']
+        clean_title = content['title']
 
         # ページ区切り（最初の1ページ目はスキップ）
-        if not is_first_page:
-            doc.add_page_break()
+        if not self.is_first_page:
+            self.doc.add_page_break()
         else:
-            is_first_page = False
-        doc.add_heading(clean_text(clean_title), level=1)
+            self.is_first_page = False
+        self.doc.add_heading(clean_text(clean_title), level=1)
+        if pending['label']:
+            self.doc.add_paragraph(clean_text(f"【{pending['label']}】{url}"))
 
         # ディスクリプションがあれば出力
-        if description_text:
-            doc.add_paragraph(clean_text(f"【ディスクリプション】\n{description_text}"))
-
-        # 本文エリア
-        main_content = soup.find('main')
-        if main_content:
-            content_source = main_content
-        else:
-            content_source = soup
-
-        # 本文のすべてのテキスト抽出
-        for element in content_source.descendants:
-            if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                text = element.get_text(strip=True)
-                if text:
-                    level = int(element.name[1])
-                    doc.add_heading(clean_text(text), level=level)
-            elif element.name == 'li':
-                text = element.get_text(strip=True)
-                if text:
-                    doc.add_paragraph(clean_text(text), style='List Bullet')
-            elif element.name is None:
-                text = element.strip()
-                if text:
-                    doc.add_paragraph(clean_text(text))
-
-        # 画像からOCR抽出 (ON/OFF)
-        if enable_ocr:
-            ocr_texts = []
-            for img_tag in soup.find_all('img'):
-                img_url = img_tag.get('src')
-                if img_url:
-                    img_full_url = urljoin(url, img_url)
-                    if img_full_url.lower().endswith('.svg'):
-                        continue
-                    try:
-                        img_response = requests.get(img_full_url)
-                        img_response.raise_for_status()
-                        img = Image.open(BytesIO(img_response.content))
-                        text_from_image = pytesseract.image_to_string(img, lang=ocr_lang).strip()
-                        if text_from_image:
-                            ocr_texts.append(text_from_image)
-                    except Exception as e:
-                        print(f"画像エラー: {img_full_url} - {e}")
-                        continue
-            if ocr_texts:
-                doc.add_heading("画像から抽出されたテキスト", level=2)
-                for ocr_text in ocr_texts:
-                    doc.add_paragraph(clean_text(ocr_text))
-
-        # PDFからテキスト抽出 (ON/OFF)
-        if enable_pdf:
-            for link_tag in soup.find_all('a', href=True):
-                href = link_tag['href']
-                if href.lower().endswith('.pdf'):
-                    full_url = urljoin(url, href)
-                    try:
-                        pdf_response = requests.get(full_url)
-                        pdf_response.raise_for_status()
-                        pdf_bytes = BytesIO(pdf_response.content)
-                        doc_pdf = fitz.open(stream=pdf_bytes, filetype="pdf")
-                        extracted_text = ""
-                        for page in doc_pdf:
-                            extracted_text += page.get_text()
-                        if extracted_text.strip():
-                            doc.add_heading("PDFから抽出されたテキスト", level=2)
-                            doc.add_paragraph(clean_text(extracted_text.strip()))
-                    except Exception as e:
-                        print(f"PDFエラー: {full_url} - {e}")
-                        continue
-
-        # === 🆕 リンク収集 ===
-        for link_tag in soup.find_all('a', href=True):
-            href = link_tag['href']
-            full_url = urljoin(url, href)
-            normalized_url = normalize_url(full_url)
-            if (
-                urlparse(normalized_url).netloc == domain and
-                normalized_url not in visited and
-                should_visit(normalized_url) and
-                not normalized_url.lower().endswith('.pdf')
-            ):
-                to_visit.append(normalized_url)
-
-        # ★ ページごとに進捗を表示・報告
-        processed_pages += 1
-        current_total = processed_pages + len(to_visit)
-        if progress_callback:
-            progress_callback(done=processed_pages, total=current_total)
-        
+        if content['description']:
+            self.doc.add_paragraph(clean_text(f"【ディスクリプション】\n{content['description']}"))
+
+        for kind, text, level in content['blocks']:
+            if kind == 'heading':
+                self.doc.add_heading(text, level=level)
+            elif kind == 'bullet':
+                self.doc.add_paragraph(text, style='List Bullet')
+            else:
+                self.doc.add_paragraph(text)
+
+        ocr_texts = []
+        for img_full_url, future in pending['ocr']:
+            try:
+                _, text_from_image = future.result()
+            except Exception as e:
+                print(f"画像エラー: {img_full_url} - {e}")
+                continue
+            if text_from_image:
+                ocr_texts.append(text_from_image)
+        if ocr_texts:
+            self.doc.add_heading("画像から抽出されたテキスト", level=2)
+            for ocr_text in ocr_texts:
+                self.doc.add_paragraph(clean_text(ocr_text))
+
+        for pdf_url, future in pending['pdf']:
+            try:
+                digest, extracted_text = future.result()
+            except Exception as e:
+                print(f"PDFエラー: {pdf_url} - {e}")
+                continue
+            if not extracted_text:
+                continue
+            if digest in self.written_pdfs:
+                first_url, first_title = self.written_pdfs[digest]
+                self.doc.add_paragraph(clean_text(f"【PDF】{pdf_url}（テキストは「{first_title}」のページに掲載: {first_url}）"))
+                continue
+            self.written_pdfs[digest] = (pdf_url, clean_title)
+            self.doc.add_heading("PDFから抽出されたテキスト", level=2)
+            self.doc.add_paragraph(clean_text(f"【PDF】{pdf_url}"))
+            self.doc.add_paragraph(clean_text(extracted_text))
+
+        self.doc.commit(pending['key'])
         path = urlparse(url).path
         print(f"書き込み完了: {path} - {clean_title}")
-        time.sleep(1)
-
-    doc.save(output_file)
-    print(f"全ページを {output_file} にまとめました！")
-    return output_file
-
-def list_all_urls(start_url, exclude_paths=None, include_only_prefix=None, progress_callback=None):
-    if exclude_paths is None:
-        exclude_paths = []
-    if include_only_prefix is None:
-        include_only_prefix = []
-    visited = set()
-    to_visit = [start_url]
-    domain = urlparse(start_url).netloc
-    url_list = []
-    total = 0
-
-    def should_visit(url):
-        path = urlparse(url).path
-        for exclude in exclude_paths:
-            if path.startswith(exclude):
-                return False
-        if include_only_prefix:
-            return any(path.startswith(prefix) for prefix in include_only_prefix)
-        return True
-
-    while to_visit:
-        url = to_visit.pop()
-        normalized_current_url = normalize_url(url)
-        if normalized_current_url in visited:
-            continue
-        visited.add(normalized_current_url)
-        url_list.append(normalized_current_url)
-        total += 1
-        if progress_callback:
-            progress_callback(done=total, total=len(visited) + len(to_visit))
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-        except Exception as e:
-            print(f"エラー: {url} - {e}")
-            continue
-        soup = BeautifulSoup(response.text, 'html.parser')
-        for link_tag in soup.find_all('a', href=True):
-            href = link_tag['href']
-            full_url = urljoin(url, href)
-            normalized_url = normalize_url(full_url)
-            if (
-                urlparse(normalized_url).netloc == domain and
-                normalized_url not in visited and
-                should_visit(normalized_url) and
-                not normalized_url.lower().endswith('.pdf')
-            ):
-                to_visit.append(normalized_url)
-    return url_list
-
-def list_all_urls_with_stats(start_url, output_file, exclude_paths=None, include_only_prefix=None, progress_callback=None):
-    if exclude_paths is None:
-        exclude_paths = []
-    if include_only_prefix is None:
-        include_only_prefix = []
-    visited = set()
-    to_visit = [start_url]
-    domain = urlparse(start_url).netloc
-    url_rows = []  # 各ページの情報
-    dir_stats = {}  # ディレクトリごとの統計 {'/service/': {'page': 0, 'pdf': 0}, ...}
-    total_pages = 0
-    total_pdfs = 0
-
-    def should_visit(url):
-        path = urlparse(url).path
-        for exclude in exclude_paths:
-            if path.startswith(exclude):
-                return False
-        if include_only_prefix:
-            return any(path.startswith(prefix) for prefix in include_only_prefix)
-        return True
-
-    def get_directory(path):
-        # 例: /service/abc → /service/
-        if not path or path == '/':
-            return '/'
-        parts = path.strip('/').split('/')
-        return '/' + parts[0] + '/'
-
-    while to_visit:
-        url = to_visit.pop()
-        normalized_current_url = normalize_url(url)
-        if normalized_current_url in visited:
-            continue
-        visited.add(normalized_current_url)
-        path = urlparse(normalized_current_url).path
-        directory = get_directory(path)
-        is_pdf = 1 if normalized_current_url.lower().endswith('.pdf') else 0
-        url_rows.append([normalized_current_url, directory, is_pdf])
+
+    def checkpoint(self):
+        # OCR・PDF抽出の結果待ちのページも書き込んでおく（書き込んだページは resume で飛ばされる）
+        self.write_ready_pages(wait=True)
+        if self.dedup is not None:
+            self.dedup.checkpoint()
+
+    def progress_stats(self):
+        stats = {}
+        if self.ocr is not None:
+            stats['ocr'] = self.ocr.snapshot()
+        if self.pdf is not None:
+            stats['pdf'] = self.pdf.snapshot()
+        if self.dedup is not None:
+            stats['duplicates'] = self.dedup.summary()
+        return stats
+
+    def finish(self):
+        self.write_ready_pages(wait=True)
+        for pool in (self.ocr, self.pdf):
+            if pool is not None:
+                pool.close()
+        # 増分クロールで削除されたページの一覧
+        if self.removed_urls:
+            if not self.is_first_page:
+                self.doc.add_page_break()
+            self.doc.add_heading("削除されたページ", level=1)
+            for url in self.removed_urls:
+                self.doc.add_paragraph(clean_text(url), style='List Bullet')
+        self.doc.save()
+        if self.dedup is not None:
+            self.dedup.close()
+            print(f"重複のためスキップしたページ: {self.dedup.summary()['skipped']} 件")
+        print(f"全ページを {self.output_file} にまとめました！")
+        return self.output_file
+
+    def close(self):
+        # 途中で止まったクロールでも OCR・PDF抽出のプールと書き出し中のファイルを閉じる（finish の後なら何もしない）
+        for pool in (self.ocr, self.pdf):
+            if pool is not None:
+                pool.close()
+        self.doc.close()
+
+class UrlLister(CrawlHandler):
+    # 訪問したページのURLを順に集める（PDFは含めない）
+    needs_page_content = False
+
+    def __init__(self):
+        self.url_list = []
+
+    def on_visit(self, url):
+        if not is_pdf_url(url):
+            self.url_list.append(url)
+
+    def finish(self):
+        return self.url_list
+
+class DirectoryStats(CrawlHandler):
+    # ページ一覧とディレクトリ別統計をCSVに出力する
+    # 取得したURLには Content-Type・ステータス・バイト数も載せる（PDFは HEAD で調べる）
+    # on_row を渡すと、ページ一覧の行が確定するたびに {列名: 値} で呼ばれる（CSVの書き出しを待たずに流せる）
+    # チェックポイントごとに、それまでの行を <output_file>.rows.log に追記し、resume=True なら読み戻して続ける
+    wants_pdf_urls = True
+    needs_page_content = False
+
+    def __init__(self, output_file, incremental=False, on_row=None, resume=False):
+        self.output_file = output_file
+        self.incremental = incremental
+        self.on_row = on_row
+        self.pending_row = None  # on_row に渡す前の行（取得結果 on_fetched を待つ）
+        self.url_rows = []  # 各ページの情報
+        self.dir_stats = {}  # ディレクトリごとの統計 {'/service/': {'page': 0, 'pdf': 0}, ...}
+        self.total_pages = 0
+        self.total_pdfs = 0
+        self.changes = {}  # 増分クロール時の {URL: 'new' / 'changed' / 'removed'}
+        self.fetched = {}  # {URL: [content_type, status, bytes]}
+        self.rows_log = output_file + '.rows.log'
+        self.saved_rows = 0  # rows_log に書いた行数
+        self.restored_urls = set()  # rows_log から読み戻したURL（再開後にもう一度訪問されても数えない）
+        if resume and os.path.exists(self.rows_log):
+            self.restore()
+        elif os.path.exists(self.rows_log):
+            os.remove(self.rows_log)
+
+    def restore(self):
+        with open(self.rows_log, encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # 書き込み途中の行
+                row, fetched, change = json.loads(line)
+                if change:
+                    self.changes[row[0]] = change
+                if fetched:
+                    self.fetched[row[0]] = fetched
+                self.count_row(row)
+                self.url_rows.append(row)
+                self.restored_urls.add(row[0])
+        self.saved_rows = len(self.url_rows)
+
+    def checkpoint(self):
+        with open(self.rows_log, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps([row, self.fetched.get(row[0]), self.changes.get(row[0])], ensure_ascii=False) + '\n'
+                            for row in self.url_rows[self.saved_rows:]))
+        self.saved_rows = len(self.url_rows)
+
+    def header(self):
+        header = ['url', 'directory', 'is_pdf', 'content_type', 'status', 'bytes']
+        return header + ['change'] if self.incremental else header
+
+    def row(self, row):
+        row = row + self.fetched.get(row[0], [None, None, None])
+        return row + [self.changes.get(row[0], '')] if self.incremental else row
+
+    def add_row(self, row):
+        # 1つ前の行は、その取得結果（on_fetched）が届いているはずなので on_row に渡す
+        self.flush_row()
+        self.url_rows.append(row)
+        self.pending_row = row
+
+    def flush_row(self):
+        if self.on_row is not None and self.pending_row is not None:
+            self.on_row(dict(zip(self.header(), self.row(self.pending_row))))
+        self.pending_row = None
+
+    def on_change(self, url, change):
+        if url in self.restored_urls:
+            return
+        self.changes[url] = change
+        if change == 'removed':
+            # 削除されたURLは一覧にだけ載せ、統計には数えない
+            self.add_row([url, get_directory(urlparse(url).path), 1 if is_pdf_url(url) else 0])
+
+    def on_visit(self, url):
+        if url in self.restored_urls:
+            return
+        row = [url, get_directory(urlparse(url).path), 1 if is_pdf_url(url) else 0]
+        self.add_row(row)
+        self.count_row(row)
+
+    def count_row(self, row):
+        url, directory, is_pdf = row
+        if self.changes.get(url) == 'removed':
+            return
         # ディレクトリ統計
-        if directory not in dir_stats:
-            dir_stats[directory] = {'page': 0, 'pdf': 0}
-        dir_stats[directory]['page'] += 1
+        if directory not in self.dir_stats:
+            self.dir_stats[directory] = {'page': 0, 'pdf': 0}
+        self.dir_stats[directory]['page'] += 1
         if is_pdf:
-            dir_stats[directory]['pdf'] += 1
-            total_pdfs += 1
-        total_pages += 1
-        # 進捗コールバック（処理済み件数と残り件数の合計で計算）
-        if progress_callback:
-            current_total = total_pages + len(to_visit)
-            progress_callback(done=total_pages, total=current_total)
+            self.dir_stats[directory]['pdf'] += 1
+            self.total_pdfs += 1
+        self.total_pages += 1
+
+    def on_fetched(self, url, info):
+        if url in self.restored_urls:
+            return
+        self.fetched[url] = [info['content_type'], info['status'], info['bytes']]
+
+    def finish(self):
+        self.flush_row()
+        # CSV出力
+        with open(self.output_file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            # ページ一覧
+            writer.writerow(self.header())
+            for row in self.url_rows:
+                writer.writerow(self.row(row))
+            # 空行
+            writer.writerow([])
+            # ディレクトリ統計
+            writer.writerow(['directory', 'page_count', 'pdf_count'])
+            for directory, stats in self.dir_stats.items():
+                writer.writerow([directory, stats['page'], stats['pdf']])
+            # 空行
+            writer.writerow([])
+            # サイト全体統計
+            writer.writerow(['total_pages', 'total_pdfs'])
+            writer.writerow([self.total_pages, self.total_pdfs])
+        if os.path.exists(self.rows_log):
+            os.remove(self.rows_log)
+        return self.output_file
+
+def create_http_client(concurrency=None, cache_dir=None):
+    # ページ取得の並列数に合わせて接続プールの大きさを決める
+    cache_dir = cache_dir or CACHE_DIR
+    cache = ResponseCache(cache_dir, max_bytes=CACHE_MAX_BYTES) if cache_dir else None
+    return HttpClient(pool_size=max(concurrency or CONCURRENCY, PER_HOST_CONCURRENCY), cache=cache)
+
+def write_report(report, http):
+    # report（辞書）にキャッシュのヒット率などの集計を書き込む
+    if report is not None and http.cache is not None:
+        report['cache'] = http.cache.stats()
+
+def manifest_directory(cache_dir=None):
+    # 前回クロールの記録はキャッシュと同じ場所に保存する（キャッシュ無効なら記録しない）
+    cache_dir = cache_dir or CACHE_DIR
+    return os.path.join(cache_dir, 'manifests') if cache_dir else None
+
+def make_budget():
+    # CRAWL_MAX_* の設定から作るクロールの予算
+    return CrawlBudget(max_pages=MAX_PAGES, max_depth=MAX_DEPTH, max_seconds=MAX_SECONDS, max_bytes=MAX_BYTES)
+
+def run_crawl(start_url, handlers, exclude_paths=None, include_only_prefix=None, progress_callback=None,
+              crawl_mode=None, concurrency=None, per_host_concurrency=None, min_delay=None, http=None,
+              cache_dir=None, report=None, incremental=False, discovery='crawl', metrics=None, checkpoint_file=None,
+              resume=False, deprioritize=None, order=None, budget=None):
+    # 1回のクロールで複数のハンドラに結果を渡し、ハンドラごとの結果をリストで返す
+    # incremental=True なら前回クロールから新規・変更・削除のあったページだけを出力する
+    # discovery（discovery.DISCOVERY_MODES）が 'crawl' 以外なら robots.txt とサイトマップでURLを集める
+    # metrics（metrics.CrawlMetrics）を渡さなければ SCRAPE_METRICS に従って作り、report['metrics'] に集計を書く
+    # checkpoint_file を指定すると CHECKPOINT_PAGES ページごとにチェックポイントを書き、
+    # resume=True ならそのチェックポイントの続きからクロールする（ハンドラも resume で作っておくこと）
+    # deprioritize（URL -> bool）が True を返すURLはほかのURLがなくなってから取得する
+    # order（scheduler.CRAWL_ORDERS）はURLを取り出す順序、budget（scheduler.CrawlBudget）はクロールの上限
+    # （渡さなければ CRAWL_ORDER / CRAWL_MAX_*）。上限で打ち切ったら report['budget'] に理由と未取得のURL数を書く
+    if http is None:
+        with create_http_client(concurrency, cache_dir) as http:
+            return run_crawl(start_url, handlers, exclude_paths, include_only_prefix, progress_callback,
+                             crawl_mode, concurrency, per_host_concurrency, min_delay, http=http,
+                             cache_dir=cache_dir, report=report, incremental=incremental, discovery=discovery,
+                             metrics=metrics, checkpoint_file=checkpoint_file, resume=resume,
+                             deprioritize=deprioritize, order=order, budget=budget)
+    metrics = metrics or make_metrics()
+    if discovery not in DISCOVERY_MODES:
+        raise ValueError(f"不明なURLの収集方法: {discovery}")
+    manifest_dir = manifest_directory(cache_dir)
+    if incremental and manifest_dir is None:
+        raise ValueError("増分クロールにはキャッシュの保存先（cache_dir / SCRAPE_CACHE_DIR）が必要です")
+    robots = fetch_robots(http, start_url) if discovery != 'crawl' else None
+    url_filter = UrlFilter(urlparse(start_url).netloc, exclude_paths, include_only_prefix, KEEP_QUERY_PARAMS, robots)
+    listed_urls = discover_sitemap_urls(http, start_url, robots, url_filter, report) if robots is not None else None
+    # 前回の記録は同じ種類のクロール（Word出力とURL一覧など）のものだけを使う
+    key = manifest_key(start_url, exclude_paths, include_only_prefix, *crawl_kind(handlers))
+    previous_pages = (load_manifest(manifest_dir, key) or {}) if incremental else None
+    checkpoint = None
+    if checkpoint_file and CHECKPOINT_PAGES > 0:
+        checkpoint = CrawlCheckpoint(checkpoint_file, resume=resume, every=CHECKPOINT_PAGES, interval=CHECKPOINT_INTERVAL)
+    crawler = Crawler(
+        start_url,
+        handlers,
+        exclude_paths=exclude_paths,
+        include_only_prefix=include_only_prefix,
+        mode=crawl_mode or CRAWL_MODE,
+        concurrency=concurrency or CONCURRENCY,
+        per_host_concurrency=per_host_concurrency or PER_HOST_CONCURRENCY,
+        min_delay=MIN_DELAY if min_delay is None else min_delay,
+        http=http,
+        progress_callback=progress_callback,
+        previous_pages=previous_pages,
+        record_pages=manifest_dir is not None,
+        seen_mode=SEEN_MODE,
+        bloom_error_rate=BLOOM_ERROR_RATE,
+        url_filter=url_filter,
+        robots=robots,
+        listed_urls=listed_urls,
+        follow_links=discovery != 'sitemap_only',
+        metrics=metrics,
+        checkpoint=checkpoint,
+        deprioritize=deprioritize,
+        order=order or CRAWL_ORDER,
+        priority_patterns=CRAWL_PRIORITY,
+        budget=budget or make_budget(),
+    )
+    results = crawler.run()
+    # 予算で打ち切ったクロールは一部のページしか見ていないので、次回の増分クロールの基準にしない
+    if manifest_dir is not None and crawler.stop_reason is None:
+        save_manifest(manifest_dir, key, start_url, crawler.current_pages)
+    write_report(report, http)
+    if report is not None and metrics.enabled:
+        report['metrics'] = metrics.snapshot()
+    if report is not None and incremental:
+        report['delta'] = dict(crawler.change_counts)
+    if report is not None and crawler.stop_reason is not None:
+        report['budget'] = {'reason': crawler.stop_reason, 'remaining': crawler.remaining}
+    return results
+
+def make_duplicate_index(mode=None, output_file=None, resume=False):
+    # 重複ページの索引（mode が 'off' なら None）。output_file を渡すとチェックポイントとともに <output_file>.dedup に保存する
+    mode = mode or DEDUP_MODE
+    if mode == 'off':
+        return None
+    return DuplicateIndex(mode, DEDUP_DISTANCE, path=output_file + '.dedup' if output_file else None, resume=resume)
+
+def scrape_website(start_url, output_file, exclude_paths=None, enable_ocr=False, enable_pdf=False, include_only_prefix=None, progress_callback=None,
+                   crawl_mode=None, concurrency=None, per_host_concurrency=None, min_delay=None, stats_output_file=None,
+                   cache_dir=None, report=None, incremental=False, resume=False, metrics=None, output_format='docx',
+                   on_page_written=None, on_row=None, dedup=None, order=None, budget=None):
+    # stats_output_file を指定すると、同じクロールからページ一覧CSVも出力する
+    # output_format（'docx' / 'jsonl' / 'markdown'）が Word 以外なら、output_file にページごとに追記していく
+    # on_page_written / on_row を渡すと、書き込んだページ・ページ一覧の行ごとに呼ばれる（DocxWriter / DirectoryStats）
+    # resume=True なら途中まで書き出した output_file とチェックポイント（<output_file>.checkpoint）の続きからクロールする
+    # report に辞書を渡すと、キャッシュのヒット率やOCR・PDF抽出の集計などが書き込まれる
+    # incremental=True なら前回から新規・変更・削除のあったページだけの差分文書を作る
+    # metrics を渡さなければ SCRAPE_METRICS に従って作り、report['metrics'] に段階ごとの処理時間などを書く
+    # dedup（'off' / 'exact' / 'near'。既定は SCRAPE_DEDUP）で重複ページを書き込まず、report['duplicates'] に件数を書く
+    # order / budget はURLを取り出す順序とクロールの上限（run_crawl）
+    # ページ・画像・PDFの取得で同じ接続プール（とキャッシュ）を使う
+    metrics = metrics or make_metrics()
+    index = make_duplicate_index(dedup, output_file, resume)
+    deprioritize = index.deprioritized if index is not None and DEDUP_DEPRIORITIZE else None
+    with create_http_client(concurrency, cache_dir) as http:
+        handlers = [DocxWriter(output_file, enable_ocr=enable_ocr, enable_pdf=enable_pdf, http=http, resume=resume,
+                               metrics=metrics, output_format=output_format, on_page_written=on_page_written,
+                               dedup=index)]
+        if stats_output_file:
+            handlers.append(DirectoryStats(stats_output_file, incremental=incremental, on_row=on_row, resume=resume))
+        # クロールを始める前（robots.txt・前回の記録の読み込みなど）に失敗してもハンドラを閉じる
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-        except Exception as e:
-            print(f"エラー: {url} - {e}")
-            continue
-        soup = BeautifulSoup(response.text, 'html.parser')
-        for link_tag in soup.find_all('a', href=True):
-            href = link_tag['href']
-            full_url = urljoin(url, href)
-            normalized_url = normalize_url(full_url)
-            if (
-                urlparse(normalized_url).netloc == domain and
-                normalized_url not in visited and
-                should_visit(normalized_url)
-            ):
-                to_visit.append(normalized_url)
-    # CSV出力
-    with open(output_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        # ページ一覧
-        writer.writerow(['url', 'directory', 'is_pdf'])
-        for row in url_rows:
-            writer.writerow(row)
-        # 空行
-        writer.writerow([])
-        # ディレクトリ統計
-        writer.writerow(['directory', 'page_count', 'pdf_count'])
-        for directory, stats in dir_stats.items():
-            writer.writerow([directory, stats['page'], stats['pdf']])
-        # 空行
-        writer.writerow([])
-        # サイト全体統計
-        writer.writerow(['total_pages', 'total_pdfs'])
-        writer.writerow([total_pages, total_pdfs])
-    return output_file
\ No newline at end of file
+            results = run_crawl(
+                start_url,
+                handlers,
+                exclude_paths=exclude_paths,
+                include_only_prefix=include_only_prefix,
+                progress_callback=progress_callback,
+                crawl_mode=crawl_mode,
+                concurrency=concurrency,
+                per_host_concurrency=per_host_concurrency,
+                min_delay=min_delay,
+                http=http,
+                cache_dir=cache_dir,
+                report=report,
+                incremental=incremental,
+                metrics=metrics,
+                checkpoint_file=output_file + '.checkpoint',
+                resume=resume,
+                deprioritize=deprioritize,
+                order=order,
+                budget=budget,
+            )
+        finally:
+            close_handlers(handlers)
+    if report is not None:
+        report.update(handlers[0].progress_stats())
+        if index is not None:
+            report['duplicates'] = index.stats()
+        if metrics.enabled:
+            report['metrics'] = metrics.snapshot(report)
+    return results[0]
+
+def list_all_urls(start_url, exclude_paths=None, include_only_prefix=None, progress_callback=None,
+                  crawl_mode=None, concurrency=None, per_host_concurrency=None, min_delay=None, cache_dir=None, report=None,
+                  discovery=None, order=None, budget=None):
+    results = run_crawl(
+        start_url,
+        [UrlLister()],
+        exclude_paths=exclude_paths,
+        include_only_prefix=include_only_prefix,
+        progress_callback=progress_callback,
+        crawl_mode=crawl_mode,
+        concurrency=concurrency,
+        per_host_concurrency=per_host_concurrency,
+        min_delay=min_delay,
+        cache_dir=cache_dir,
+        report=report,
+        discovery=discovery or DISCOVERY,
+        order=order,
+        budget=budget,
+    )
+    return results[0]
+
+def list_all_urls_with_stats(start_url, output_file, exclude_paths=None, include_only_prefix=None, progress_callback=None,
+                             crawl_mode=None, concurrency=None, per_host_concurrency=None, min_delay=None, cache_dir=None, report=None,
+                             incremental=False, discovery=None, on_row=None, resume=False, order=None, budget=None):
+    # incremental=True なら前回から新規・変更・削除のあったURLだけを change 列付きで出力する
+    # resume=True ならチェックポイント（<output_file>.checkpoint）の続きからクロールする
+    # discovery='sitemap' / 'sitemap_only' ならサイトマップに載っているURLはページを取得せずに一覧にする
+    # on_row を渡すと、CSVの書き出しを待たずに一覧の行ごとに {列名: 値} で呼ばれる
+    results = run_crawl(
+        start_url,
+        [DirectoryStats(output_file, incremental=incremental, on_row=on_row, resume=resume)],
+        exclude_paths=exclude_paths,
+        include_only_prefix=include_only_prefix,
+        progress_callback=progress_callback,
+        crawl_mode=crawl_mode,
+        concurrency=concurrency,
+        per_host_concurrency=per_host_concurrency,
+        min_delay=min_delay,
+        cache_dir=cache_dir,
+        report=report,
+        incremental=incremental,
+        discovery=discovery or DISCOVERY,
+        checkpoint_file=output_file + '.checkpoint',
+        resume=resume,
+        order=order,
+        budget=budget,
+    )
+    return results[0]
+
+# --- 分散クロール（distributed.py） ---
+def start_distributed_crawl(redis, job_id, start_url, exclude_paths=None, include_only_prefix=None, with_url_list=False):
+    # ジョブのフロンティアを作る。with_url_list=True ならページ一覧CSV用にPDFへのリンクも記録する
+    RedisFrontier(redis, job_id).start(start_url, exclude_paths, include_only_prefix, follow_pdf=with_url_list,
+                                       keep_query_params=KEEP_QUERY_PARAMS)
+
+def crawl_distributed(redis, job_id, min_delay=None, cache_dir=None, url_filter=None):
+    # 1ワーカー分のクロール（ジョブのURLがなくなるまで取り出して処理する）。処理したページ数を返す
+    with create_http_client(cache_dir=cache_dir) as http:
+        if min_delay is None:
+            min_delay = DEFAULT_MIN_DELAY if MIN_DELAY is None else MIN_DELAY
+        return run_worker(redis, job_id, http, min_delay=min_delay, url_filter=url_filter)
+
+def reduce_distributed(redis, job_id, output_file, enable_ocr=False, enable_pdf=False, stats_output_file=None,
+                       cache_dir=None, report=None, output_format='docx', dedup=None):
+    # 全ワーカーの結果から Word（と stats_output_file を指定すればページ一覧CSV）を作り、Word のパスを返す
+    index = make_duplicate_index(dedup)
+    with create_http_client(cache_dir=cache_dir) as http:
+        handlers = [DocxWriter(output_file, enable_ocr=enable_ocr, enable_pdf=enable_pdf, http=http,
+                               output_format=output_format, dedup=index)]
+        if stats_output_file:
+            handlers.append(DirectoryStats(stats_output_file))
+        results = reduce_results(redis, job_id, handlers)
+        if report is not None:
+            report.update(handlers[0].progress_stats())
+            if index is not None:
+                report['duplicates'] = index.stats()
+            report['distributed'] = RedisFrontier(redis, job_id).progress()
+            write_report(report, http)
+    return results[0]
+
+def scrape_website_distributed(start_url, output_file, redis, workers=4, exclude_paths=None, enable_ocr=False, enable_pdf=False,
+                               include_only_prefix=None, min_delay=None, stats_output_file=None, cache_dir=None, report=None,
+                               job_id=None):
+    # 分散クロールを1プロセス内のスレッドで実行する（ローカルの Redis や fakeredis での動作確認用）
+    job_id = job_id or f'local-{os.getpid()}-{threading.get_ident()}'
+    start_distributed_crawl(redis, job_id, start_url, exclude_paths, include_only_prefix, with_url_list=bool(stats_output_file))
+    # リンクの判定ルールは1回だけ作って全ワーカーで共有する
+    url_filter = make_url_filter(RedisFrontier(redis, job_id).config())
+    threads = [threading.Thread(target=crawl_distributed, args=(redis, job_id, min_delay, cache_dir, url_filter))
+               for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        return reduce_distributed(redis, job_id, output_file, enable_ocr, enable_pdf, stats_output_file, cache_dir, report)
+    finally:
+        RedisFrontier(redis, job_id).delete()
@@ -0,0 +1,48 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from bench_clean_text import legacy_clean_text  # noqa: E402
+from extract import clean_text  # noqa: E402
+
+# clean_text（正規表現での除去）が変更前の実装と同じ出力になること
+# ランダムな文字列（制御文字・サロゲート・U+FFFE/U+FFFF・補助面の文字を含む）で比べる
+
+# 境界付近の文字を多めに混ぜる
+EDGE_CODEPOINTS = [0x0, 0x8, 0x9, 0xA, 0xB, 0xC, 0xD, 0xE, 0x1F, 0x20, 0x7F, 0x85,
+                   0xD7FF, 0xD800, 0xDBFF, 0xDC00, 0xDFFF, 0xE000, 0xFFFD, 0xFFFE, 0xFFFF,
+                   0x10000, 0x1F600, 0x10FFFF]
+
+
+def random_text(rng, max_length):
+    chars = []
+    for _ in range(rng.randint(0, max_length)):
+        roll = rng.random()
+        if roll < 0.3:
+            codepoint = rng.choice(EDGE_CODEPOINTS)
+        elif roll < 0.5:
+            codepoint = rng.randint(0, 0x7F)
+        elif roll < 0.8:
+            codepoint = rng.randint(0x3040, 0x9FFF)
+        else:
+            codepoint = rng.randint(0, 0x10FFFF)
+        chars.append(chr(codepoint))
+    return ''.join(chars)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_clean_text_matches_legacy_implementation(seed):
+    rng = random.Random(seed)
+    for _ in range(5000):
+        text = random_text(rng, 40)
+        assert clean_text(text) == legacy_clean_text(text), repr(text)
+
+
+@pytest.mark.parametrize('text', [None, '', '\x00', '\ud800', '\ufffe\uffff', 'a\tb\nc\rd'])
+def test_clean_text_edge_cases(text):
+    assert clean_text(text) == legacy_clean_text(text)
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import scrape  # noqa: E402
+from pdf_pool import PdfPool  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+# クロールが途中で例外で止まっても、PDF抽出のプールと書き出し中のファイルを閉じ、
+# 閉じた後も同じ出力先の続きから再開できること
+
+
+@pytest.fixture
+def site():
+    with StubServer(10, 3, 0) as server:
+        server.pdfs = 1
+        server.article_words = 20
+        yield server
+
+
+@pytest.mark.parametrize('mode', ['serial', 'async'])
+@pytest.mark.parametrize('output_format', ['docx', 'jsonl'])
+def test_failed_crawl_closes_pools_and_files(site, tmp_path, monkeypatch, mode, output_format):
+    monkeypatch.setattr(scrape, 'CHECKPOINT_PAGES', 1)
+    closed_pools = []
+    close_pool = PdfPool.close
+    monkeypatch.setattr(PdfPool, 'close', lambda pool: closed_pools.append(pool) or close_pool(pool))
+    documents = []
+    open_document = scrape.open_document
+    monkeypatch.setattr(scrape, 'open_document', lambda *args, **kwargs: documents.append(open_document(*args, **kwargs))
+                        or documents[-1])
+
+    def fail_on_third_page(record):
+        if len(written) == 2:
+            raise RuntimeError('stop')
+        written.append(record['url'])
+    written = []
+    output_file = str(tmp_path / f'output.{output_format}')
+    with pytest.raises(RuntimeError):
+        scrape.scrape_website(site.base_url + '/page/0', output_file, enable_pdf=True, crawl_mode=mode, min_delay=0,
+                              output_format=output_format, on_page_written=fail_on_third_page, dedup='off')
+    assert closed_pools
+    [doc] = documents
+    files = (doc.body, doc.log) if output_format == 'docx' else (doc.output, doc.log)
+    assert all(f.closed for f in files)
+
+    # 閉じた後も、書き込んだページ（on_page_written で失敗した3ページ目も書き込み済み）の続きから再開できる
+    written = [None]  # 以降のページでは失敗させない
+    scrape.scrape_website(site.base_url + '/page/0', output_file, enable_pdf=True, crawl_mode=mode, min_delay=0,
+                          output_format=output_format, on_page_written=lambda record: written.append(record['url']),
+                          dedup='off', resume=True)
+    assert len(written) - 1 == site.page_count - 3
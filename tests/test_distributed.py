@@ -0,0 +1,222 @@
+import os
+import sys
+import threading
+from unittest import mock
+from urllib.parse import urlparse
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+fakeredis = pytest.importorskip('fakeredis')
+
+import app  # noqa: E402
+import scrape  # noqa: E402
+from celery import states  # noqa: E402
+from celery.exceptions import ChordError, Ignore, Retry  # noqa: E402
+from distributed import RedisFrontier, run_worker, reduce_results  # noqa: E402
+from http_client import HttpClient  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+# 分散クロール（distributed.py）を fakeredis とスタブサーバーで動かす
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def site():
+    with StubServer(40, 3, 0) as server:
+        yield server
+
+
+def job_keys(redis, job_id):
+    return redis.keys(f'crawl:{job_id}:*')
+
+
+def page_depth(site, url):
+    # スタブサイトの /page/<n> の /page/0 からの深さ
+    n = int(url.rsplit('/', 1)[1])
+    depth = 0
+    while n:
+        n = (n - 1) // site.fanout
+        depth += 1
+    return depth
+
+
+def crawl(redis, job_id, site, workers):
+    # workers 個のワーカーで分散クロールし、(各ワーカーの処理ページ数, まとめたURLの一覧) を返す
+    scrape.start_distributed_crawl(redis, job_id, site.base_url + '/page/0')
+    pages = []
+
+    def worker():
+        with HttpClient() as http:
+            pages.append(run_worker(redis, job_id, http, batch_size=3, min_delay=0))
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return pages, reduce_results(redis, job_id, [scrape.UrlLister()])[0]
+
+
+def test_claim_requeues_expired_lease(redis, site):
+    start_url = site.base_url + '/page/0'
+    RedisFrontier(redis, 'job').start(start_url)
+    # 取り出した直後に落ちたワーカー（リースの期限がすでに切れている）
+    dead = RedisFrontier(redis, 'job', lease_ttl=-1)
+    [(dead_lease, url, depth)] = dead.claim(10)
+    assert (url, depth) == (start_url, 0)
+
+    # 期限内のリースは他のワーカーに取り出されない
+    alive = RedisFrontier(redis, 'job')
+    [(lease, url, depth)] = alive.claim(10)
+    assert (url, depth) == (start_url, 0) and lease != dead_lease
+    assert alive.claim(10) == []
+    dead.extend([dead_lease])  # 期限切れでキューに戻したリースは延長しても戻らない
+    assert redis.zscore(alive.key('leases'), dead_lease) is None
+
+    alive.add([site.base_url + '/page/1'], 1)
+    alive.complete(lease, url, depth, {'url': url})
+    # 落ちたワーカーが後から完了を書いても数えない
+    dead.complete(dead_lease, url, depth, {'url': url})
+    assert alive.progress() == {'done': 1, 'total': 2, 'workers': 0}
+    assert not alive.finished()
+
+    [(lease, url, depth)] = alive.claim(10)
+    assert (url, depth) == (site.base_url + '/page/1', 1)
+    alive.complete(lease, url, depth, {'url': url})
+    assert alive.finished()
+    assert alive.progress() == {'done': 2, 'total': 2, 'workers': 0}
+
+
+def test_progress_adds_up_all_workers(redis, site):
+    frontier = RedisFrontier(redis, 'job')
+    assert frontier.progress() is None
+    frontier.start(site.base_url + '/page/0')
+    frontier.worker_started()
+    frontier.worker_started()
+    assert frontier.progress() == {'done': 0, 'total': 1, 'workers': 2}
+
+    [(lease, url, depth)] = frontier.claim(10)
+    frontier.add([site.base_url + f'/page/{n}' for n in (1, 2, 3)], depth + 1)
+    frontier.complete(lease, url, depth, {'url': url})
+    # 2つ目のワーカーが取り出して処理中の分も total に含める
+    other = RedisFrontier(redis, 'job')
+    claimed = other.claim(2)
+    assert frontier.progress() == {'done': 1, 'total': 4, 'workers': 2}
+    for lease, url, depth in claimed:
+        other.complete(lease, url, depth, {'url': url})
+    frontier.worker_stopped()
+    assert frontier.progress() == {'done': 3, 'total': 4, 'workers': 1}
+
+
+def test_workers_share_frontier_without_duplicates(redis, site):
+    pages, urls = crawl(redis, 'job', site, workers=4)
+    assert sum(pages) == site.page_count
+    # どのページも1回だけ取得する
+    assert site.responses == {200: site.page_count}
+    assert len(urls) == len(set(urls)) == site.page_count
+    assert RedisFrontier(redis, 'job').progress() == {'done': site.page_count, 'total': site.page_count, 'workers': 0}
+
+
+def test_reduce_order_is_stable_and_matches_serial_crawl(redis, site):
+    _, four_workers = crawl(redis, 'four', site, workers=4)
+    _, one_worker = crawl(redis, 'one', site, workers=1)
+    serial = scrape.list_all_urls(site.base_url + '/page/0', crawl_mode='serial', min_delay=0)
+    # ワーカー数・処理の順序によらず（深さ, URL）の順にまとめ、同じページを集める
+    assert four_workers == one_worker
+    assert four_workers == sorted(serial, key=lambda url: (page_depth(site, url), url))
+
+
+@pytest.fixture
+def celery_app(redis, monkeypatch, tmp_path):
+    # app.py のタスクを fakeredis で動かす（Celery への送信は記録するだけ）
+    monkeypatch.setattr(app, '_redis', redis)
+    monkeypatch.setattr(app, '_job_registry', None)
+    monkeypatch.setattr(app, 'UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setattr(app, 'CACHE_FOLDER', '')
+    app.celery.conf.update(result_backend='cache+memory://')
+    sent = []
+    monkeypatch.setattr(app.distributed_scrape_task, 'apply_async', lambda args, task_id: sent.append((task_id, args)))
+    return sent
+
+
+def run_task(task, task_id, args):
+    # ワーカーと同じように実行する。retry の再送はキューに入れず、chord への置き換えは送らずに返す
+    # （置き換わらなければ (結果, None)）
+    replaced = []
+
+    def replace(sig):
+        replaced.append(sig)
+        raise Ignore()
+    task.push_request(id=task_id, retries=0, is_eager=False, called_directly=False)
+    try:
+        with mock.patch.object(task, 'replace', replace), mock.patch('celery.canvas.Signature.apply_async'):
+            return task.run(*args), None
+    except Ignore:
+        return None, replaced[0]
+    finally:
+        task.pop_request()
+
+
+def test_distributed_jobs_go_through_job_registry(site, celery_app):
+    url = site.base_url + '/page/0'
+    args = [url, [], False, False, [], False, 'docx']
+    # 同じホストのジョブが実行中なら、分散クロールも実行待ちになる（同じリクエストは1つにまとまる）
+    app.job_registry().register('scrape', ['other'], 'other-task', urlparse(url).netloc)
+    assert app.job_registry().admit('other-task', urlparse(url).netloc)
+    job_id, status = app.submit_job('distributed', app.distributed_scrape_task, args, url)
+    assert status == 'queued' and celery_app == [(job_id, args)]
+    with mock.patch.object(app, 'task_alive', return_value=True):
+        assert app.submit_job('distributed', app.distributed_scrape_task, args, url) == (job_id, 'coalesced')
+    with pytest.raises(Retry):
+        run_task(app.distributed_scrape_task, job_id, args)
+    assert app.job_registry().position(job_id) == 1
+    assert not job_keys(app.redis_client(), job_id)
+
+    # 枠が空けばフロンティアを作って chord に置き換わり、枠はジョブが終わるまで持ち続ける
+    app.job_registry().finish('other-task', True)
+    _, sig = run_task(app.distributed_scrape_task, job_id, args)
+    assert sig.body.id == job_id
+    assert len(sig.tasks) == app.DISTRIBUTED_WORKERS
+    assert job_keys(app.redis_client(), job_id)
+    assert app.job_registry().snapshot()['running'] == 1
+
+    # ワーカータスクが失敗して chord が reduce_scrape_task を実行しなかったとき（Celery のバックエンドが errback を呼ぶ）、
+    # ジョブを失敗として終え、フロンティアを消して枠を返す
+    try:
+        raise ChordError('worker failed')
+    except ChordError as exc:
+        app.celery.backend.chord_error_from_stack(sig.body, exc)
+    assert job_keys(app.redis_client(), job_id) == []
+    assert app.celery.AsyncResult(job_id).state == states.FAILURE
+    assert app.load_job(job_id)['result']['status'] == 'failed'
+    assert app.job_registry().snapshot()['running'] == 0
+    events = app.redis_client().xrange(app.events_key(job_id))
+    assert events[-1][1][b'event'] == b'done'
+
+    # 失敗したジョブにはまとめずに実行し直す
+    new_job_id, status = app.submit_job('distributed', app.distributed_scrape_task, args, url)
+    assert status == 'queued' and new_job_id != job_id
+
+
+def test_completed_distributed_job_is_reused(site, celery_app, monkeypatch):
+    monkeypatch.setattr(scrape, 'MIN_DELAY', 0)
+    url = site.base_url + '/page/0'
+    args = [url, [], False, False, [], True, 'jsonl']
+    job_id, _ = app.submit_job('distributed', app.distributed_scrape_task, args, url)
+    _, sig = run_task(app.distributed_scrape_task, job_id, args)
+    worker_pages = [app.crawl_worker_task(job_id) for _ in sig.tasks]
+    assert sum(worker_pages) == site.page_count
+    assert app.job_registry().snapshot()['running'] == 1
+
+    result, _ = run_task(app.reduce_scrape_task, job_id, [worker_pages] + list(sig.body.args))
+    assert result['status'] == 'completed', result
+    assert os.path.exists(result['file_path']) and os.path.exists(result['csv_path'])
+    assert job_keys(app.redis_client(), job_id) == []
+    assert app.job_registry().snapshot()['running'] == 0
+    assert app.submit_job('distributed', app.distributed_scrape_task, args, url) == (job_id, 'cached')
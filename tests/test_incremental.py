@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import scrape  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+# 同じサイトをページ一覧（軽量取得・PDFも記録）とWord出力で差分クロールしても、
+# 互いの前回の記録を使わない（PDFが削除扱いになったり、本文のないファイルが更新扱いになったりしない）こと
+
+
+@pytest.fixture
+def site():
+    with StubServer(5, 2, 0) as server:
+        server.asset_bytes = 1024  # 各ページから /files/<n>.zip と /files/<n>.pdf にリンクする
+        yield server
+
+
+def written_urls(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line)['url'] for line in f]
+
+
+def test_list_then_scrape_keep_separate_manifests(site, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    start_url = site.base_url + '/page/0'
+    options = {'crawl_mode': 'serial', 'min_delay': 0, 'cache_dir': cache_dir}
+
+    list_report = {}
+    scrape.list_all_urls_with_stats(start_url, str(tmp_path / 'list1.csv'), incremental=True, report=list_report,
+                                    **options)
+    assert list_report['delta'] == {'new': 15, 'changed': 0, 'unchanged': 0, 'removed': 0}
+
+    # ページ一覧の記録があっても、Word出力としては初回のクロール
+    scrape_report = {}
+    scrape.scrape_website(start_url, str(tmp_path / 'scrape1.jsonl'), incremental=True, report=scrape_report,
+                          output_format='jsonl', dedup='off', **options)
+    assert scrape_report['delta'] == {'new': 10, 'changed': 0, 'unchanged': 0, 'removed': 0}
+    assert not any(url.endswith('.pdf') for url in written_urls(tmp_path / 'scrape1.jsonl'))
+
+    # どちらも自分の前回の記録と比べるので、サイトが変わらなければ差分はない
+    scrape_report = {}
+    scrape.scrape_website(start_url, str(tmp_path / 'scrape2.jsonl'), incremental=True, report=scrape_report,
+                          output_format='jsonl', dedup='off', **options)
+    assert scrape_report['delta'] == {'new': 0, 'changed': 0, 'unchanged': 10, 'removed': 0}
+    assert written_urls(tmp_path / 'scrape2.jsonl') == []
+
+    list_report = {}
+    scrape.list_all_urls_with_stats(start_url, str(tmp_path / 'list2.csv'), incremental=True, report=list_report,
+                                    **options)
+    assert list_report['delta'] == {'new': 0, 'changed': 0, 'unchanged': 15, 'removed': 0}
@@ -0,0 +1,67 @@
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+fakeredis = pytest.importorskip('fakeredis')
+
+import app  # noqa: E402
+import scrape  # noqa: E402
+from celery.exceptions import Retry  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+# ワーカーが落ちて再配信されたタスクが、落ちたワーカーの TaskLock が残っている間に届いたとき、
+# 捨てられずに（ジョブが「処理中」のまま残らずに）ロックの期限後に再試行され、続きから完了すること
+
+
+@pytest.fixture
+def worker(monkeypatch, tmp_path):
+    monkeypatch.setattr(app, '_redis', fakeredis.FakeRedis())
+    monkeypatch.setattr(app, '_job_registry', None)
+    monkeypatch.setattr(app, 'UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setattr(app, 'CACHE_FOLDER', '')
+    monkeypatch.setattr(scrape, 'MIN_DELAY', 0)
+    app.celery.conf.update(result_backend='cache+memory://')
+    with StubServer(20, 3, 0) as server:
+        yield server
+
+
+def run_redelivered(task, task_id, args):
+    # 再配信されたメッセージとしてワーカーと同じように実行する（retry の再送はキューに入れずに記録する）
+    # (結果, 再試行したときの Retry) を返す
+    task.push_request(id=task_id, retries=0, is_eager=False, called_directly=False, delivery_info={'redelivered': True})
+    try:
+        with mock.patch('celery.canvas.Signature.apply_async') as resend:
+            try:
+                return task.run(*args), None
+            except Retry as retry:
+                assert resend.called
+                return None, retry
+    finally:
+        task.pop_request()
+
+
+def test_redelivered_task_retries_while_stale_lock_is_held(worker):
+    task_id = 'redelivered-task'
+    args = [worker.base_url + '/page/0', [], [], False, 'crawl']
+    # 落ちたワーカーのロック（延長されないので LOCK_TTL 秒後に切れる）
+    app.redis_client().set(app.lock_key(task_id), 'dead-worker', ex=app.LOCK_TTL)
+
+    result, resend = run_redelivered(app.list_urls_task, task_id, args)
+    assert result is None
+    assert resend is not None
+    assert resend.when == app.LOCK_TTL
+    assert resend.sig.id == task_id
+
+    # ロックの期限が切れた後の再試行では実行して完了する
+    app.redis_client().delete(app.lock_key(task_id))
+    result, resend = run_redelivered(app.list_urls_task, task_id, args)
+    assert resend is None
+    assert result['status'] == 'completed'
+    assert os.path.exists(result['file_path'])
+    assert app.load_job(task_id)['result']['status'] == 'completed'
+    assert not app.redis_client().exists(app.lock_key(task_id))
@@ -0,0 +1,171 @@
+import json
+import os
+
+from docx_stream import StreamingDocx
+
+# === JSONL / Markdown の逐次書き出し ===
+# docx_stream.StreamingDocx と同じ書き方（add_heading / add_paragraph / add_page_break / commit / save）で、
+# 1ページ分を commit() のたびに出力先へ直接追記する。zip にまとめる必要がないので、
+# クロール中でも出力先をそのまま読み出してクライアントに流せる（app.py の /stream/<task_id>）
+# - JSONL    : 1ページ1行の JSON（PageRecorder の辞書）
+# - Markdown : 見出しは #、箇条書きは -、ページの区切りは ---
+# commit した位置は <出力先>.pages.log に記録し、resume=True なら書きかけのページを捨てて続きから書く
+
+OUTPUT_FORMATS = ('docx', 'jsonl', 'markdown')
+OUTPUT_EXTENSIONS = {'docx': 'docx', 'jsonl': 'jsonl', 'markdown': 'md'}
+STREAMABLE_FORMATS = ('jsonl', 'markdown')
+
+
+class PageRecorder:
+    # 書き込まれた段落を1ページ分の辞書にまとめる
+    # {'url': ページ, 'title': 最初の見出し, 'blocks': [{'type': 'heading' / 'paragraph' / 'bullet', 'text', 'level'}]}
+    def __init__(self):
+        self.blocks = []
+        self.page_break = False
+
+    def add_paragraph(self, text='', style=None):
+        self.blocks.append({'type': 'bullet' if style == 'List Bullet' else 'paragraph', 'text': text})
+
+    def add_heading(self, text='', level=1):
+        self.blocks.append({'type': 'heading', 'level': level, 'text': text})
+
+    def add_page_break(self):
+        self.page_break = True
+
+    def take(self, key):
+        title = next((block['text'] for block in self.blocks if block['type'] == 'heading'), None)
+        record = {'url': key, 'title': title, 'blocks': self.blocks}
+        page_break = self.page_break
+        self.blocks = []
+        self.page_break = False
+        return record, page_break
+
+
+def render_jsonl(record, page_break):
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def render_markdown(record, page_break):
+    lines = ['---', ''] if page_break else []
+    previous = None
+    for block in record['blocks']:
+        text = block['text']
+        if block['type'] == 'bullet':
+            # 続く箇条書きは1つのリストにする
+            if previous == 'bullet':
+                lines.pop()
+            lines.append('- ' + text.replace('\n', '\n  '))
+        elif block['type'] == 'heading':
+            lines.append('#' * max(block['level'], 1) + ' ' + ' '.join(text.split()))
+        else:
+            lines.append(text)
+        lines.append('')
+        previous = block['type']
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+RENDERERS = {'jsonl': render_jsonl, 'markdown': render_markdown}
+
+
+class StreamingText:
+    def __init__(self, output_file, output_format, resume=False):
+        self.output_file = output_file
+        self.render = RENDERERS[output_format]
+        self.log_path = output_file + '.pages.log'
+        self.written_keys = set()  # commit 済みのページ（resume 時に書き込みを省略するため）
+        self.recorder = PageRecorder()
+
+        committed = 0
+        if resume and os.path.exists(self.log_path) and os.path.exists(output_file):
+            with open(self.log_path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break  # 書き込み途中の行
+                    offset, key = line.rstrip('\n').split('\t', 1)
+                    committed = int(offset)
+                    self.written_keys.add(key)
+        elif os.path.exists(self.log_path):
+            os.remove(self.log_path)
+
+        # 最後に commit した位置より後ろ（書きかけのページ）は捨てる
+        self.output = open(output_file, 'ab' if resume else 'wb', buffering=0)
+        self.output.truncate(committed)
+        self.log = open(self.log_path, 'a', encoding='utf-8')
+
+    def add_paragraph(self, text='', style=None):
+        self.recorder.add_paragraph(text, style)
+
+    def add_heading(self, text='', level=1):
+        self.recorder.add_heading(text, level)
+
+    def add_page_break(self):
+        self.recorder.add_page_break()
+
+    def _write(self, key):
+        record, page_break = self.recorder.take(key)
+        if record['blocks']:
+            # 1ページ分を1回の write で書く
+            self.output.write(self.render(record, page_break).encode('utf-8'))
+
+    def commit(self, key):
+        # ここまでの内容を1ページ分として確定させる
+        self._write(key)
+        self.log.write(f'{self.output.tell()}\t{key}\n')
+        self.log.flush()
+        self.written_keys.add(key)
+
+    def save(self):
+        # commit していない内容（削除されたページの一覧など）は url なしの1件として書く
+        self._write(None)
+        self.output.close()
+        self.log.close()
+        os.remove(self.log_path)
+        return self.output_file
+
+    def close(self):
+        # save せずに閉じる（commit 済みの内容とログは resume 用に残す）
+        self.output.close()
+        self.log.close()
+
+
+class RecordingDocument:
+    # 出力先の文書（StreamingDocx / StreamingText）に書きながら、ページごとの辞書を on_page_written に渡す
+    def __init__(self, doc, on_page_written):
+        self.doc = doc
+        self.on_page_written = on_page_written
+        self.recorder = PageRecorder()
+
+    @property
+    def written_keys(self):
+        return self.doc.written_keys
+
+    def add_paragraph(self, text='', style=None):
+        self.recorder.add_paragraph(text, style)
+        self.doc.add_paragraph(text, style)
+
+    def add_heading(self, text='', level=1):
+        self.recorder.add_heading(text, level)
+        self.doc.add_heading(text, level)
+
+    def add_page_break(self):
+        self.recorder.add_page_break()
+        self.doc.add_page_break()
+
+    def commit(self, key):
+        self.doc.commit(key)
+        record, _ = self.recorder.take(key)
+        self.on_page_written(record)
+
+    def save(self):
+        return self.doc.save()
+
+    def close(self):
+        self.doc.close()
+
+
+def open_document(output_file, output_format='docx', resume=False):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不明な出力形式: {output_format}")
+    if output_format == 'docx':
+        return StreamingDocx(output_file, resume=resume)
+    return StreamingText(output_file, output_format, resume=resume)
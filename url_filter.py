@@ -0,0 +1,115 @@
+import re
+from fnmatch import translate
+from urllib.parse import urljoin, urlparse, parse_qsl, urlencode
+
+# === リンクの正規化と対象URLの判定 ===
+# クロール開始時に1回だけ組み立て、同じジョブのクローラー（分散クロールのワーカーを含む）で共有する
+# exclude_paths / include_only_prefix のルールはパスに対して判定する
+#   '/en'            : 前方一致（従来どおり）
+#   '/news/*/print'  : * ? [] を含むものはグロブ（パス全体に一致。* は / もまたぐ）
+#   're:^/tag/\d+$'  : re: で始まるものは正規表現（パスの先頭から re.match）
+# 前方一致は startswith にタプルで渡して一度に、グロブと正規表現は1つの正規表現にまとめて判定する
+# クエリは従来どおり取り除く。keep_query_params に挙げた名前（グロブ可）のパラメータだけは残す（名前順に並べる）
+# robots（discovery.RobotsRules）を渡すと robots.txt で禁止されたURLも対象外にする
+
+REGEX_PREFIX = 're:'
+GLOB_CHARS = '*?['
+ORIGIN_PATTERN = re.compile(r'[^:/?#]+://[^/?#]*')
+MAX_CACHE_SIZE = 100000  # 相対パスでないリンクの解決結果を覚えておく件数（ナビゲーションなど全ページ共通のリンク用）
+
+
+def get_directory(path):
+    # 例: /service/abc → /service/
+    if not path or path == '/':
+        return '/'
+    parts = path.strip('/').split('/')
+    return '/' + parts[0] + '/'
+
+
+def _rule_pattern(rule):
+    if rule.startswith(REGEX_PREFIX):
+        return rule[len(REGEX_PREFIX):]
+    return translate(rule)
+
+
+class PathRules:
+    def __init__(self, rules):
+        rules = list(rules or [])
+        self.prefixes = tuple(rule for rule in rules if not rule.startswith(REGEX_PREFIX) and
+                              not any(char in rule for char in GLOB_CHARS))
+        patterns = [_rule_pattern(rule) for rule in rules if rule not in self.prefixes]
+        self.pattern = re.compile('|'.join(f'(?:{pattern})' for pattern in patterns)) if patterns else None
+        self.empty = not rules
+
+    def match(self, path):
+        if self.prefixes and path.startswith(self.prefixes):
+            return True
+        return self.pattern is not None and self.pattern.match(path) is not None
+
+
+class UrlFilter:
+    def __init__(self, domain, exclude_paths=None, include_only_prefix=None, keep_query_params=None, robots=None):
+        self.domain = domain
+        self.robots = robots
+        self.exclude = PathRules(exclude_paths)
+        self.include = PathRules(include_only_prefix)
+        keep_query_params = list(keep_query_params or [])
+        self.keep_query = re.compile('|'.join(translate(name) for name in keep_query_params)) if keep_query_params else None
+        self.cache = {}
+
+    def allows_path(self, path):
+        if self.exclude.match(path):
+            return False
+        return self.include.empty or self.include.match(path)
+
+    def normalize(self, url):
+        # 末尾の / とフラグメントを除き、クエリは残す設定のパラメータだけにする
+        return self._normalize(urlparse(url))
+
+    def _normalize(self, parsed):
+        normalized = f'{parsed.scheme}://{parsed.netloc}{parsed.path.rstrip("/")}'
+        if self.keep_query is not None and parsed.query:
+            params = sorted((name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+                            if self.keep_query.match(name))
+            if params:
+                normalized += '?' + urlencode(params)
+        return normalized
+
+    def allows(self, url):
+        # 正規化済みのURLが対象（同じドメインで、除外されていない）なら True
+        parsed = urlparse(url)
+        return (parsed.netloc == self.domain and self.allows_path(parsed.path.rstrip('/')) and
+                self._robots_allows(parsed))
+
+    def _robots_allows(self, parsed):
+        if self.robots is None:
+            return True
+        return self.robots.allowed(parsed.path + ('?' + parsed.query if parsed.query else '') or '/')
+
+    def resolve(self, base_url, href):
+        # ページ内のリンクを正規化したURLにする。対象外なら None
+        if href.startswith(('http://', 'https://')):
+            key = href
+        elif href.startswith('/') and not href.startswith('//'):
+            # ルートからのパスは取得元のスキーム+ホストだけで決まる
+            origin = ORIGIN_PATTERN.match(base_url)
+            key = (origin.group() if origin else base_url, href)
+        else:
+            return self._resolve(urljoin(base_url, href))
+        try:
+            return self.cache[key]
+        except KeyError:
+            pass
+        resolved = self._resolve(urljoin(base_url, href))
+        if len(self.cache) >= MAX_CACHE_SIZE:
+            self.cache.clear()
+        self.cache[key] = resolved
+        return resolved
+
+    def _resolve(self, url):
+        parsed = urlparse(url)
+        if parsed.netloc != self.domain:
+            return None
+        if not self.allows_path(parsed.path.rstrip('/')) or not self._robots_allows(parsed):
+            return None
+        return self._normalize(parsed)